@@ -54,7 +54,7 @@ contract Strategy is BaseStrategy {
     // minimum maturity for the market to enter
     uint256 private minTimeToMaturity;
     // minimum amount of want to act on
-    uint16 public minAmountWant;
+    uint256 public minAmountWant;
     // Initialize WETH interface
     IWETH public constant weth = IWETH(0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2);
     // Constant necessary to accept ERC1155 fcash tokens (for migration purposes) 
@@ -63,8 +63,33 @@ contract Strategy is BaseStrategy {
     bool internal toggleRealizeLosses;
     // Base for percentage calculations. BPS (10000 = 100%, 100 = 1%)
     uint256 private constant MAX_BPS = 10_000;
-    // Current maturity invested
+    // Current maturity invested, the shortest one when lending into several markets
     uint256 private maturity;
+    // Share of every deposit lent into each eligible market (in BPS, summing MAX_BPS), starting from the
+    // shortest one. Empty lends everything into the shortest eligible market
+    uint256[] private ladderWeights;
+
+    // In-memory snapshot of the strategy's Notional positions, built once per harvest and passed along its
+    // internal functions so that each Notional view is called once instead of on every valuation
+    struct PortfolioSnapshot {
+        PortfolioAsset[] portfolio;
+        MarketParameters[] activeMarkets;
+        // Market index of each position, 0 if its maturity is not an active market anymore
+        uint256[] marketIndexes;
+        // 'want' value of each position, including the cost of closing it early
+        uint256[] values;
+        // Sum of values
+        uint256 totalValue;
+        // Strategy's total debt with the vault
+        uint256 totalDebt;
+    }
+
+    // One strategy to deploy with cloneStrategies
+    struct CloneParams {
+        address vault;
+        uint16 currencyID;
+        address keeper;
+    }
 
     // EVENTS
     event Cloned(address indexed clone);
@@ -165,6 +190,44 @@ contract Strategy is BaseStrategy {
         NotionalProxy _nProxy,
         uint16 _currencyID
     ) external returns (address payable newStrategy) {
+        newStrategy = _clone(_vault, _strategist, _rewards, _keeper, _nProxy, _currencyID);
+    }
+
+    /*
+     * @notice Clones and initializes one strategy per (vault, currencyID, keeper) in a single transaction, all
+     * sharing the same strategist, rewards and Notional proxy. The clones still have to be added to their vaults
+     * by each vault's governance
+     * @param _clones List of CloneParams, one per strategy to deploy
+     * @param _strategist Strategist managing the strategies
+     * @param _rewards Rewards address
+     * @param _nProxy Notional proxy used to interact with the protocol
+     * @return newStrategies, the addresses of the clones in the order of _clones
+     */
+    function cloneStrategies(
+        CloneParams[] calldata _clones,
+        address _strategist,
+        address _rewards,
+        NotionalProxy _nProxy
+    ) external returns (address[] memory newStrategies) {
+        newStrategies = new address[](_clones.length);
+        for (uint256 i; i < _clones.length; i++) {
+            newStrategies[i] = _clone(
+                _clones[i].vault, _strategist, _rewards, _clones[i].keeper, _nProxy, _clones[i].currencyID
+            );
+        }
+    }
+
+    /*
+     * @notice Deploys an EIP-1167 clone of this strategy and initializes it
+     */
+    function _clone(
+        address _vault,
+        address _strategist,
+        address _rewards,
+        address _keeper,
+        NotionalProxy _nProxy,
+        uint16 _currencyID
+    ) internal returns (address payable newStrategy) {
         // Copied from https://github.com/optionality/clone-factory/blob/master/contracts/CloneFactory.sol
         bytes20 addressBytes = bytes20(address(this));
 
@@ -250,12 +313,37 @@ contract Strategy is BaseStrategy {
         minTimeToMaturity = _newTime;
     }
 
+    /*
+     * @notice
+     *  Getter function for the weights deposits are split with across markets
+     * @return uint256[], current ladderWeights state variable
+     */
+    function getLadderWeights() external view returns(uint256[] memory) {
+        return ladderWeights;
+    }
+
+    /*
+     * @notice
+     *  Setter function for the weights deposits are split with across markets, accesible only to strategist,
+     * governance, guardian and management. The i-th weight goes to the i-th market with at least minTimeToMaturity
+     * left, weights past the last active market go to the last one. An empty array lends into a single market
+     * @param _newWeights, new weights in BPS, summing MAX_BPS
+     */
+    function setLadderWeights(uint256[] calldata _newWeights) external onlyEmergencyAuthorized {
+        uint256 total;
+        for (uint256 i; i < _newWeights.length; i++) {
+            total = total.add(_newWeights[i]);
+        }
+        require(_newWeights.length == 0 || total == MAX_BPS, "Weights must sum MAX_BPS");
+        ladderWeights = _newWeights;
+    }
+
     /*
      * @notice
      *  Setter function for the minimum amount of want to invest, accesible only to strategist, governance, guardian and management
      * @param _newMinAmount, new minimum amount of want to invest
      */
-    function setMinAmountWant(uint16 _newMinAmount) external onlyEmergencyAuthorized {
+    function setMinAmountWant(uint256 _newMinAmount) external onlyEmergencyAuthorized {
         minAmountWant = _newMinAmount;
     }
 
@@ -275,6 +363,59 @@ contract Strategy is BaseStrategy {
         ;
     }
 
+    /*
+     * @notice
+     *  Function telling keepers whether a harvest would do any work: settle matured positions, invest idle
+     * funds or roll the position over to a new maturity. Cheaper than the default trigger, it does not value the
+     * portfolio
+     * @param callCostInWei, cost of the harvest call for the keeper, in wei
+     * @return bool, true if the strategy should be harvested
+     */
+    function harvestTrigger(uint256 callCostInWei) public view override returns (bool) {
+        StrategyParams memory params = vault.strategies(address(this));
+
+        // Should not trigger if the strategy is not activated
+        if (params.activation == 0) return false;
+
+        // Should not trigger if we haven't waited long enough since previous harvest
+        if (block.timestamp.sub(params.lastReport) < minReportDelay) return false;
+
+        // Should trigger if hasn't been called in a while
+        if (block.timestamp.sub(params.lastReport) >= maxReportDelay) return true;
+
+        // If some amount is owed, pay it back
+        uint256 outstanding = vault.debtOutstanding();
+        if (outstanding > debtThreshold) return true;
+
+        // Work of a harvest is weighted against its cost, in 'want'
+        uint256 callCost = profitFactor.mul(ethToWant(callCostInWei));
+
+        // A position matured: settling it realizes the whole position in the strategy's balance
+        uint256 nextSettleTime = uint256(nProxy.getAccountContext(address(this)).nextSettleTime);
+        if (nextSettleTime > 0 && nextSettleTime < block.timestamp) {
+            return callCost < params.totalDebt;
+        }
+
+        // Otherwise adjustPosition only acts on idle funds over minAmountWant
+        uint256 idleWant = balanceOfWant().add(vault.creditAvailable());
+        if (idleWant <= outstanding) return false;
+        idleWant = idleWant.sub(outstanding);
+        if (idleWant < minAmountWant) return false;
+
+        // The shortest market moved past our maturity: the harvest rolls the whole position over
+        uint256 _maturity = maturity;
+        (, uint256 minMarketMaturity) = _getMinimumMarketIndex(nProxy.getActiveMarkets(currencyID));
+        if (_maturity > 0 && minMarketMaturity > _maturity) {
+            return callCost < params.totalDebt;
+        }
+
+        // adjustPosition only lends the FCASH_SCALING share of what it deposits, the rest comes back as
+        // idle want: balances within that share of the debt (plus one BPS for rounding) are its dust
+        if (idleWant <= params.totalDebt.mul(MAX_BPS.sub(FCASH_SCALING).add(1)).div(MAX_BPS)) return false;
+
+        return callCost < idleWant;
+    }
+
     /*
      * @notice
      *  Accounting function preparing the reporting to the vault taking into acccount the standing debt
@@ -295,8 +436,11 @@ contract Strategy is BaseStrategy {
         // Withdraw from terms that already matured
         _checkPositionsAndWithdraw();
 
+        // Positions are valued once for the whole harvest
+        PortfolioSnapshot memory _snapshot = _getHarvestSnapshot();
+
         // We only need profit for decision making
-        (_profit, ) = getUnrealisedPL();
+        (_profit, ) = getUnrealisedPL(_snapshot);
         // free funds to repay debt + profit to the strategy
         uint256 wantBalance = balanceOfWant();
         
@@ -316,7 +460,7 @@ contract Strategy is BaseStrategy {
 
             // If the toggle to realize losses is off, do not close any position
             if(toggleRealizeLosses) {
-                (amountAvailable, realisedLoss) = liquidatePosition(amountRequired);
+                (amountAvailable, realisedLoss) = _liquidatePosition(amountRequired, _snapshot);
             }
             _loss = realisedLoss;
             
@@ -371,12 +515,15 @@ contract Strategy is BaseStrategy {
         uint16 _currencyID = currencyID;
         uint256 _maturity = maturity;
 
-        // Use the market index with the shortest maturity
-        (uint256 minMarketIndex, uint256 minMarketMaturity) = _getMinimumMarketIndex();
-        // If the new position enters a different market than the current maturity, roll the current position into
-        // the next maturity market
+        // Use the market index with the shortest maturity. The active markets are the ones of prepareReturn's
+        // snapshot (they do not change within the transaction), but BaseStrategy.harvest calls adjustPosition
+        // itself and handing them over would go through storage, which costs more than this view
+        MarketParameters[] memory _activeMarkets = nProxy.getActiveMarkets(_currencyID);
+        (uint256 minMarketIndex, uint256 minMarketMaturity) = _getMinimumMarketIndex(_activeMarkets);
+        // If the new position enters a different market than the current maturity, roll the positions that are
+        // now too short into the next maturity markets
         if(minMarketMaturity > _maturity && _maturity > 0) {
-            availableWantBalance += _rollOverTrade(_maturity);
+            availableWantBalance += _rollOverTrade(minMarketMaturity, _activeMarkets);
         }
 
         if (_currencyID == 1) {
@@ -387,29 +534,14 @@ contract Strategy is BaseStrategy {
         }
         // Amount to trade is the available want balance, changed to 8 decimals and
         // scaled down by FCASH_SCALING to ensure it does not revert
-        int88 amountTrade = int88(
-                availableWantBalance.mul(MAX_BPS).div(DECIMALS_DIFFERENCE).mul(FCASH_SCALING).div(MAX_BPS)
-            );
-        // NOTE: May revert if the availableWantBalance is too high and interest rates get to < 0
-        int256 fCashAmountToTrade = nProxy.getfCashAmountGivenCashAmount(
-            _currencyID, 
-            -amountTrade, 
-            minMarketIndex, 
-            block.timestamp
-            );
-
-        if (fCashAmountToTrade <= 0) {
+        uint256 amountTrade = availableWantBalance.mul(MAX_BPS).div(DECIMALS_DIFFERENCE).mul(FCASH_SCALING).div(MAX_BPS);
+        // Trade the shortest maturity market with at least minAmountToMaturity time left, or every market of the
+        // ladder
+        (bytes32[] memory trades, uint256 newMaturity) = _getLendTrades(amountTrade, _activeMarkets, minMarketIndex);
+        if (trades.length == 0) {
             return;
         }
 
-        // Trade the shortest maturity market with at least minAmountToMaturity time left
-        bytes32[] memory trades = new bytes32[](1);
-        trades[0] = getTradeFrom(
-            0, 
-            minMarketIndex, 
-            uint256(fCashAmountToTrade)
-            );
-
         executeBalanceActionWithTrades(
             DepositActionType.DepositUnderlying,
             availableWantBalance,
@@ -419,7 +551,66 @@ contract Strategy is BaseStrategy {
             trades
         );
 
-        maturity = minMarketMaturity;
+        // Positions that were not rolled over may still be the shortest
+        if (_maturity >= minMarketMaturity && _maturity < newMaturity) {
+            newMaturity = _maturity;
+        }
+        maturity = newMaturity;
+    }
+
+    /*
+     * @notice
+     *  Internal function building the lend trades of adjustPosition: one per weight of the ladder (a single one
+     * into the shortest eligible market by default), priced with one getfCashAmountGivenCashAmount each
+     * @param _amountTrade, cash to lend in Notional's 8 decimals
+     * @param _activeMarkets, All current active markets for the currencyID
+     * @param _minMarketIndex, index of the shortest market with at least minTimeToMaturity left
+     * @return bytes32[] trades, the non-empty lend trades
+     * @return uint256 shortestMaturity, the shortest maturity traded into
+     */
+    function _getLendTrades(
+        uint256 _amountTrade,
+        MarketParameters[] memory _activeMarkets,
+        uint256 _minMarketIndex
+    ) internal returns (bytes32[] memory trades, uint256 shortestMaturity) {
+        uint256[] memory _weights = ladderWeights;
+        if (_weights.length == 0) {
+            _weights = new uint256[](1);
+            _weights[0] = MAX_BPS;
+        }
+        // Every market from the minimum market index on is eligible, the last one takes the remaining amount
+        uint256 legs = Math.min(_weights.length, _activeMarkets.length.add(1).sub(_minMarketIndex));
+        bytes32[] memory legTrades = new bytes32[](legs);
+        uint256 tradesToExecute = 0;
+        uint256 allocated = 0;
+        for (uint256 i; i < legs; i++) {
+            uint256 legAmount = i == legs - 1 ? _amountTrade.sub(allocated) : _amountTrade.mul(_weights[i]).div(MAX_BPS);
+            allocated = allocated.add(legAmount);
+            if (legAmount == 0) {
+                continue;
+            }
+            uint256 _marketIndex = _minMarketIndex + i;
+            // NOTE: May revert if the amount is too high and interest rates get to < 0
+            int256 fCashAmountToTrade = nProxy.getfCashAmountGivenCashAmount(
+                currencyID, 
+                -int88(legAmount), 
+                _marketIndex, 
+                block.timestamp
+                );
+            if (fCashAmountToTrade <= 0) {
+                continue;
+            }
+            legTrades[tradesToExecute] = getTradeFrom(0, _marketIndex, uint256(fCashAmountToTrade));
+            tradesToExecute++;
+            if (shortestMaturity == 0) {
+                shortestMaturity = _activeMarkets[_marketIndex - 1].maturity;
+            }
+        }
+
+        trades = new bytes32[](tradesToExecute);
+        for (uint256 j=0; j<tradesToExecute; j++) {
+            trades[j] = legTrades[j];
+        }
     }
 
     /*
@@ -449,14 +640,18 @@ contract Strategy is BaseStrategy {
     /*
      * @notice
      *  Internal function to assess the unrealised P&L of the Notional's positions
+     * @param _snapshot, valuation of the positions and total debt of the strategy
      * @return uint256 result, the encoded trade ready to be used in Notional's 'BatchTradeAction'
      */
-    function getUnrealisedPL() internal view returns (uint256 _unrealisedProfit, uint256 _unrealisedLoss) {
+    function getUnrealisedPL(PortfolioSnapshot memory _snapshot)
+        internal
+        view
+        returns (uint256 _unrealisedProfit, uint256 _unrealisedLoss)
+    {
         // Calculate assets. This includes profit and cost of closing current position. 
         // Due to cost of closing position, If called just after opening the position, assets < invested want
-        uint256 totalAssets = estimatedTotalAssets();
-        // Get total debt from vault
-        uint256 totalDebt = vault.strategies(address(this)).totalDebt;
+        uint256 totalAssets = balanceOfWant().add(_snapshot.totalValue);
+        uint256 totalDebt = _snapshot.totalDebt;
         // Calculate current P&L
         if(totalDebt > totalAssets) {
             // we have losses
@@ -483,20 +678,40 @@ contract Strategy is BaseStrategy {
     {
         _checkPositionsAndWithdraw();
 
+        if (balanceOfWant() >= _amountNeeded) {
+            return (_amountNeeded, 0);
+        }
+
+        return _liquidatePosition(_amountNeeded, _getHarvestSnapshot());
+    }
+
+    /*
+     * @notice
+     *  Internal function liquidating enough Notional positions to liberate _amountNeeded 'want' tokens, using
+     * a snapshot of the positions taken after they were settled
+     * @param _amountNeeded, The total amount of tokens needed to pay the vault back
+     * @param _snapshot, valuation of the positions and total debt of the strategy
+     * @return uint256 _liquidatedAmount, Amount freed
+     * @return uint256 _loss, Losses incurred due to early closing of positions
+     */
+    function _liquidatePosition(uint256 _amountNeeded, PortfolioSnapshot memory _snapshot)
+        internal
+        returns (uint256 _liquidatedAmount, uint256 _loss)
+    {
         uint256 wantBalance = balanceOfWant();
         if (wantBalance >= _amountNeeded) {
             return (_amountNeeded, 0);
         }
         
         // Get current position's P&L
-        (, uint256 unrealisedLosses) = getUnrealisedPL();
+        (, uint256 unrealisedLosses) = getUnrealisedPL(_snapshot);
         // We only need to withdraw what we don't currently have
         uint256 amountToLiquidate = _amountNeeded.sub(wantBalance);
         
         // Losses are realised IFF we withdraw from the position, as they will come from breaking our "promise"
         // of lending at a certain %
         // The strategy will only realise losses proportional to the amount we are liquidating
-        uint256 totalDebt = vault.strategies(address(this)).totalDebt;
+        uint256 totalDebt = _snapshot.totalDebt;
         uint256 lossesToBeRealised = unrealisedLosses.mul(amountToLiquidate).div(totalDebt.sub(wantBalance));
 
         // Due to how Notional works, we need to substract losses from the amount to liquidate
@@ -505,7 +720,7 @@ contract Strategy is BaseStrategy {
         amountToLiquidate = amountToLiquidate.sub(lossesToBeRealised);
 
         // Retrieve info of portfolio (summary of our position/s)
-        PortfolioAsset[] memory _accountPortfolio = nProxy.getAccountPortfolio(address(this));
+        PortfolioAsset[] memory _accountPortfolio = _snapshot.portfolio;
         // The maximum amount of trades we are doing is the number of terms (aka markets) we are in
         bytes32[] memory trades = new bytes32[](_accountPortfolio.length);
 
@@ -516,18 +731,9 @@ contract Strategy is BaseStrategy {
         uint256 tradesToExecute = 0;
         for(uint256 i; i < _accountPortfolio.length; i++) {
             if (remainingAmount > 0) {
-                uint256 _marketIndex = _getMarketIndexForMaturity(
-                    _accountPortfolio[i].maturity
-                );
-                // Retrieve size of position in this market (underlyingInternalNotation)
-                (, int256 underlyingInternalNotation) = nProxy.getCashAmountGivenfCashAmount(
-                    currencyID,
-                    int88(-_accountPortfolio[i].notional),
-                    _marketIndex,
-                    block.timestamp
-                );
-                // Adjust for decimals (Notional uses 8 decimals regardless of underlying)
-                uint256 underlyingPosition = uint256(underlyingInternalNotation).mul(DECIMALS_DIFFERENCE).div(MAX_BPS);
+                uint256 _marketIndex = _snapshot.marketIndexes[i];
+                // Size of position in this market, already in 'want' decimals
+                uint256 underlyingPosition = _snapshot.values[i];
                 // If we can withdraw what we need from this market, we do and stop iterating over markets
                 // If we can't, we create the trade to withdraw maximum amount and try in the next market / term
                 if(underlyingPosition > remainingAmount) {
@@ -548,7 +754,8 @@ contract Strategy is BaseStrategy {
                     trades[i] = getTradeFrom(1, _marketIndex, uint256(_accountPortfolio[i].notional));
                     tradesToExecute++;
                     remainingAmount -= underlyingPosition;
-                    maturity = 0;
+                    // The next position (by maturity) is now the shortest one
+                    maturity = i + 1 < _accountPortfolio.length ? _accountPortfolio[i + 1].maturity : 0;
                 }
             }
         }
@@ -594,8 +801,10 @@ contract Strategy is BaseStrategy {
      * @return uint256 amountLiquidated, the total amount liquidated
      */
     function liquidateAllPositions() internal override returns (uint256) {
-        
-        (uint256 amountLiquidated, ) = liquidatePosition(estimatedTotalAssets());
+        _checkPositionsAndWithdraw();
+        PortfolioSnapshot memory _snapshot = _getHarvestSnapshot();
+
+        (uint256 amountLiquidated, ) = _liquidatePosition(balanceOfWant().add(_snapshot.totalValue), _snapshot);
 
         return amountLiquidated;
     }
@@ -734,7 +943,9 @@ contract Strategy is BaseStrategy {
                     // Only necessary for wETH/ ETH pair
                     weth.deposit{value: address(this).balance}();
                 }
-                maturity = 0;
+                // Longer positions (of a ladder, even if its weights were cleared since) may be left, the
+                // shortest of them is the next maturity
+                maturity = _getShortestMaturity(nProxy.getAccountPortfolio(address(this)));
             }
         }
 
@@ -747,31 +958,51 @@ contract Strategy is BaseStrategy {
      * @return uint256 _totalWantValue, the total amount of 'want' tokens of the strategy's positions
      */
     function _getTotalValueFromPortfolio() internal view returns(uint256 _totalWantValue) {
-        PortfolioAsset[] memory _accountPortfolio = nProxy.getAccountPortfolio(address(this));
-        MarketParameters[] memory _activeMarkets = nProxy.getActiveMarkets(currencyID);
-        // Iterate over all active markets and sum value of each position 
-        for(uint256 i = 0; i < _accountPortfolio.length; i++) {
-            for(uint256 j = 0; j < _activeMarkets.length; j++){
-                if(_accountPortfolio[i].maturity < block.timestamp) {
-                    // Convert the fcash amount of the position to underlying assuming a 1:1 conversion rate
-                    // (taking into account decimals difference)
-                    _totalWantValue += uint256(_accountPortfolio[i].notional).mul(DECIMALS_DIFFERENCE).div(MAX_BPS);
-                    break;
-                }
-                if(_accountPortfolio[i].maturity == _activeMarkets[j].maturity) {
-                    (, int256 underlyingPosition) = nProxy.getCashAmountGivenfCashAmount(
-                        currencyID,
-                        int88(-_accountPortfolio[i].notional),
-                        j+1,
-                        block.timestamp
-                    );
-                    _totalWantValue += uint256(underlyingPosition).mul(DECIMALS_DIFFERENCE).div(MAX_BPS);
-                    break;
-                }
+        return _getPortfolioSnapshot().totalValue;
+    }
+
+    /*
+     * @notice
+     *  Internal function reading the strategy's portfolio and the active markets once and valuing every position
+     * @return PortfolioSnapshot _snapshot, positions, active markets and valuations, without the total debt
+     */
+    function _getPortfolioSnapshot() internal view returns(PortfolioSnapshot memory _snapshot) {
+        _snapshot.portfolio = nProxy.getAccountPortfolio(address(this));
+        _snapshot.activeMarkets = nProxy.getActiveMarkets(currencyID);
+        _snapshot.marketIndexes = new uint256[](_snapshot.portfolio.length);
+        _snapshot.values = new uint256[](_snapshot.portfolio.length);
+        // Iterate over all positions and sum the value of each of them
+        for(uint256 i = 0; i < _snapshot.portfolio.length; i++) {
+            PortfolioAsset memory _asset = _snapshot.portfolio[i];
+            uint256 _marketIndex = _getMarketIndexForMaturity(_asset.maturity, _snapshot.activeMarkets);
+            _snapshot.marketIndexes[i] = _marketIndex;
+            if(_asset.maturity < block.timestamp) {
+                // Convert the fcash amount of the position to underlying assuming a 1:1 conversion rate
+                // (taking into account decimals difference)
+                _snapshot.values[i] = uint256(_asset.notional).mul(DECIMALS_DIFFERENCE).div(MAX_BPS);
+            } else if(_marketIndex > 0) {
+                (, int256 underlyingPosition) = nProxy.getCashAmountGivenfCashAmount(
+                    currencyID,
+                    int88(-_asset.notional),
+                    _marketIndex,
+                    block.timestamp
+                );
+                _snapshot.values[i] = uint256(underlyingPosition).mul(DECIMALS_DIFFERENCE).div(MAX_BPS);
             }
+            _snapshot.totalValue = _snapshot.totalValue.add(_snapshot.values[i]);
         }
     }
 
+    /*
+     * @notice
+     *  Internal function building the snapshot a harvest works with: the positions' valuation and the total debt
+     * @return PortfolioSnapshot _snapshot, positions, active markets, valuations and total debt
+     */
+    function _getHarvestSnapshot() internal view returns(PortfolioSnapshot memory _snapshot) {
+        _snapshot = _getPortfolioSnapshot();
+        _snapshot.totalDebt = vault.strategies(address(this)).totalDebt;
+    }
+
     // CALCS
     /*
      * @notice
@@ -790,30 +1021,26 @@ contract Strategy is BaseStrategy {
      * @return uint256 result, market index of the position to value
      */
     function _getMarketIndexForMaturity(
-        uint256 _maturity
-    ) internal view returns(uint256) {
-        MarketParameters[] memory _activeMarkets = nProxy.getActiveMarkets(currencyID);
-        bool success = false;
+        uint256 _maturity,
+        MarketParameters[] memory _activeMarkets
+    ) internal pure returns(uint256) {
         for(uint256 j=0; j<_activeMarkets.length; j++){
             if(_maturity == _activeMarkets[j].maturity) {
                 return j+1;
             }
         }
-        
-        if (success == false) {
-            return 0;
-        }
+        return 0;
     }
 
     /*
      * @notice
      *  Internal function calculating the market index with the shortest maturity that was at 
      * least minAmountToMaturity seconds still 
+     * @param _activeMarkets, All current active markets for the currencyID
      * @return uint256 result, the minimum market index the strategy should be entering positions into
      * @return uint256 maturity, the minimum market index's maturity the strategy should be entering positions into
      */
-    function _getMinimumMarketIndex() internal view returns(uint256, uint256) {
-        MarketParameters[] memory _activeMarkets = nProxy.getActiveMarkets(currencyID);
+    function _getMinimumMarketIndex(MarketParameters[] memory _activeMarkets) internal view returns(uint256, uint256) {
         for(uint256 i = 0; i<_activeMarkets.length; i++) {
             if (_activeMarkets[i].maturity - block.timestamp >= minTimeToMaturity) {
                 return (i+1, uint256(_activeMarkets[i].maturity));
@@ -864,29 +1091,61 @@ contract Strategy is BaseStrategy {
 
     /*
      * @notice
-     *  Internal function Closing a current non-mature position to re-invest the amount into a new 
-     * higher maturity market
-     * @param _currentMaturity, current maturity the strategy is invested in
+     *  Internal function closing the current non-mature positions that are shorter than the minimum market, to
+     * re-invest the amount into new higher maturity markets
+     * @param _minMarketMaturity, maturity of the shortest market the strategy can enter
+     * @param _activeMarkets, All current active markets for the currencyID
      * @return uint256, liberated amount, now existing in want balance to add up to the availableWantBalance
      * to trade into in adjustPosition()
      */
-    function _rollOverTrade(uint256 _currentMaturity) internal returns(uint256) {
+    function _rollOverTrade(uint256 _minMarketMaturity, MarketParameters[] memory _activeMarkets) internal returns(uint256) {
         uint256 prevBalance = balanceOfWant();
         PortfolioAsset[] memory _accountPortfolio = nProxy.getAccountPortfolio(address(this));
-        uint256 _currentIndex = _getMarketIndexForMaturity(_currentMaturity);
-        
-        bytes32[] memory rollTrade = new bytes32[](1);
-        rollTrade[0] = getTradeFrom(1, _currentIndex, uint256(_accountPortfolio[0].notional));
+
+        bytes32[] memory trades = new bytes32[](_accountPortfolio.length);
+        uint256 tradesToExecute = 0;
+        for (uint256 i; i < _accountPortfolio.length; i++) {
+            if (_accountPortfolio[i].maturity >= _minMarketMaturity) {
+                continue;
+            }
+            uint256 _marketIndex = _getMarketIndexForMaturity(_accountPortfolio[i].maturity, _activeMarkets);
+            if (_marketIndex > 0) {
+                trades[tradesToExecute] = getTradeFrom(1, _marketIndex, uint256(_accountPortfolio[i].notional));
+                tradesToExecute++;
+            }
+        }
+        if (tradesToExecute == 0) {
+            return 0;
+        }
+
+        bytes32[] memory rollTrades = new bytes32[](tradesToExecute);
+        for (uint256 j=0; j<tradesToExecute; j++) {
+            rollTrades[j] = trades[j];
+        }
         executeBalanceActionWithTrades(
             DepositActionType.None, 
             0,
             0, 
             true,
             true,
-            rollTrade
+            rollTrades
         );
         
         return (balanceOfWant() - prevBalance);
     }
 
-}
\ No newline at end of file
+    /*
+     * @notice
+     *  Internal function returning the shortest maturity of a portfolio
+     * @param _accountPortfolio, the strategy's portfolio
+     * @return uint256, the shortest maturity, 0 if the portfolio is empty
+     */
+    function _getShortestMaturity(PortfolioAsset[] memory _accountPortfolio) internal pure returns(uint256 shortest) {
+        for (uint256 i; i < _accountPortfolio.length; i++) {
+            if (shortest == 0 || _accountPortfolio[i].maturity < shortest) {
+                shortest = _accountPortfolio[i].maturity;
+            }
+        }
+    }
+
+}
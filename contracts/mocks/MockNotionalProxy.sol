@@ -0,0 +1,445 @@
+// SPDX-License-Identifier: AGPL-3.0
+
+pragma solidity 0.6.12;
+pragma experimental ABIEncoderV2;
+
+import {
+    SafeERC20,
+    SafeMath,
+    IERC20,
+    Address
+} from "@openzeppelin/contracts/token/ERC20/SafeERC20.sol";
+
+import {
+    AccountBalance,
+    AccountContext,
+    AssetRateAdapter,
+    AssetRateParameters,
+    AssetStorageState,
+    BalanceActionWithTrades,
+    DepositActionType,
+    ETHRate,
+    MarketParameters,
+    PortfolioAsset,
+    Token,
+    TokenType
+} from "../../interfaces/notional/Types.sol";
+
+interface IERC1155Receiver {
+    function onERC1155Received(address _operator, address _from, uint256 _id, uint256 _amount, bytes calldata _data)
+        external returns (bytes4);
+}
+
+/*
+     * @notice
+     *  Stand-in for the Notional V2 proxy implementing the subset of NotionalProxy the strategy and the tests use,
+     *  so the strategy logic can be exercised on a plain local chain.
+     *
+     *  Markets mature on Notional's quarterly calendar (or on maturities set with setMaturities) and trade at
+     *  rates set with setRates, without slippage: fCash = cash * (1 + rate * timeToMaturity / YEAR). Asset cash is
+     *  the underlying in 8 decimals, lending interest is paid out of the contract's own balance so it has to be
+     *  funded, and accounts cannot borrow beyond the fCash they hold.
+*/
+contract MockNotionalProxy {
+    using SafeERC20 for IERC20;
+    using SafeMath for uint256;
+    using Address for address;
+
+    event CashBalanceChange(address indexed account, uint16 indexed currencyId, int256 netCashChange);
+    event MarketsInitialized(uint16 currencyId);
+    event LendBorrowTrade(
+        address indexed account,
+        uint16 indexed currencyId,
+        uint40 maturity,
+        int256 netAssetCash,
+        int256 netfCash
+    );
+    event AccountSettled(address indexed account);
+
+    struct Currency {
+        // address(0) for ETH
+        address underlying;
+        // 10 ** decimals of the underlying, as in Notional's Token struct
+        int256 decimals;
+        // Underlying to ETH exchange rate, 18 decimals
+        int256 ethRate;
+        bool listed;
+    }
+
+    struct Position {
+        uint16 currencyId;
+        uint40 maturity;
+        int256 notional;
+    }
+
+    int256 internal constant INTERNAL_TOKEN_PRECISION = 1e8;
+    int256 internal constant RATE_PRECISION = 1e9;
+    uint256 internal constant QUARTER = 90 days;
+    uint256 internal constant YEAR = 360 days;
+    uint256 internal constant FCASH_ASSET_TYPE = 1;
+    bytes4 internal constant ERC1155_ACCEPTED = bytes4(keccak256("onERC1155Received(address,address,uint256,uint256,bytes)"));
+
+    mapping(uint16 => Currency) public currencies;
+    uint16[] internal currencyIds;
+    // Annualized rate of every market, by market index - 1, in RATE_PRECISION
+    mapping(uint16 => uint256[]) internal rates;
+    // Maturities overriding the quarterly calendar when set
+    mapping(uint16 => uint256[]) internal maturities;
+
+    mapping(address => mapping(uint16 => int256)) internal cashBalances;
+    mapping(address => Position[]) internal portfolios;
+
+    receive() external payable {}
+
+    // SETUP
+
+    function listCurrency(
+        uint16 _currencyId,
+        address _underlying,
+        uint8 _decimals,
+        int256 _ethRate,
+        uint256[] calldata _rates
+    ) external {
+        if (!currencies[_currencyId].listed) {
+            currencyIds.push(_currencyId);
+        }
+        currencies[_currencyId] = Currency(_underlying, int256(10 ** uint256(_decimals)), _ethRate, true);
+        rates[_currencyId] = _rates;
+    }
+
+    function setRates(uint16 _currencyId, uint256[] calldata _rates) external {
+        rates[_currencyId] = _rates;
+    }
+
+    function setMaturities(uint16 _currencyId, uint256[] calldata _maturities) external {
+        // An empty array goes back to the quarterly calendar
+        require(_maturities.length == 0 || _maturities.length == rates[_currencyId].length, "One rate per market");
+        maturities[_currencyId] = _maturities;
+    }
+
+    function initializeMarkets(uint16 _currencyId, bool) external {
+        // Markets roll with the calendar on their own
+        emit MarketsInitialized(_currencyId);
+    }
+
+    // VIEWS
+
+    function getCurrency(uint16 _currencyId) public view returns (Token memory assetToken, Token memory underlyingToken) {
+        Currency memory currency = _getCurrency(_currencyId);
+        assetToken = Token(address(this), false, INTERNAL_TOKEN_PRECISION, TokenType.cToken, 0);
+        underlyingToken = Token(
+            currency.underlying,
+            false,
+            currency.decimals,
+            currency.underlying == address(0) ? TokenType.Ether : TokenType.UnderlyingToken,
+            0
+        );
+    }
+
+    function getCurrencyAndRates(uint16 _currencyId)
+        external
+        view
+        returns (
+            Token memory assetToken,
+            Token memory underlyingToken,
+            ETHRate memory ethRate,
+            AssetRateParameters memory assetRate
+        )
+    {
+        (assetToken, underlyingToken) = getCurrency(_currencyId);
+        ethRate = ETHRate(1e18, currencies[_currencyId].ethRate, 100, 100, 100);
+        assetRate = AssetRateParameters(AssetRateAdapter(address(0)), 1e18, underlyingToken.decimals);
+    }
+
+    function getActiveMarkets(uint16 _currencyId) external view returns (MarketParameters[] memory _markets) {
+        uint256[] memory _maturities = _activeMaturities(_currencyId);
+        _markets = new MarketParameters[](_maturities.length);
+        for (uint256 i = 0; i < _maturities.length; i++) {
+            _markets[i].maturity = _maturities[i];
+            _markets[i].totalfCash = 1e18;
+            _markets[i].totalAssetCash = 1e18;
+            _markets[i].totalLiquidity = 1e18;
+            _markets[i].lastImpliedRate = rates[_currencyId][i];
+            _markets[i].oracleRate = rates[_currencyId][i];
+            _markets[i].previousTradeTime = block.timestamp;
+        }
+    }
+
+    function getfCashAmountGivenCashAmount(
+        uint16 _currencyId,
+        int88 _netCashToAccount,
+        uint256 _marketIndex,
+        uint256 _blockTime
+    ) external view returns (int256) {
+        (, uint256 _exchangeRate) = _market(_currencyId, _marketIndex, _blockTime);
+        return -int256(_netCashToAccount) * int256(_exchangeRate) / RATE_PRECISION;
+    }
+
+    function getCashAmountGivenfCashAmount(
+        uint16 _currencyId,
+        int88 _fCashAmount,
+        uint256 _marketIndex,
+        uint256 _blockTime
+    ) external view returns (int256, int256) {
+        (, uint256 _exchangeRate) = _market(_currencyId, _marketIndex, _blockTime);
+        int256 _cash = -int256(_fCashAmount) * RATE_PRECISION / int256(_exchangeRate);
+        return (_cash, _cash);
+    }
+
+    function getAccountContext(address _account) public view returns (AccountContext memory _context) {
+        Position[] storage _positions = portfolios[_account];
+        _context.assetArrayLength = uint8(_positions.length);
+        for (uint256 i = 0; i < _positions.length; i++) {
+            if (_context.nextSettleTime == 0 || _positions[i].maturity < _context.nextSettleTime) {
+                _context.nextSettleTime = _positions[i].maturity;
+            }
+        }
+    }
+
+    function getAccountBalance(uint16 _currencyId, address _account)
+        external
+        view
+        returns (int256 cashBalance, int256 nTokenBalance, uint256 lastClaimTime)
+    {
+        cashBalance = cashBalances[_account][_currencyId];
+    }
+
+    function getAccountPortfolio(address _account) public view returns (PortfolioAsset[] memory _portfolio) {
+        Position[] storage _positions = portfolios[_account];
+        _portfolio = new PortfolioAsset[](_positions.length);
+        for (uint256 i = 0; i < _positions.length; i++) {
+            PortfolioAsset memory _asset = PortfolioAsset(
+                _positions[i].currencyId,
+                _positions[i].maturity,
+                FCASH_ASSET_TYPE,
+                _positions[i].notional,
+                0,
+                AssetStorageState.NoChange
+            );
+            // Sorted by maturity, as Notional returns them
+            uint256 j = i;
+            while (j > 0 && _portfolio[j - 1].maturity > _asset.maturity) {
+                _portfolio[j] = _portfolio[j - 1];
+                j--;
+            }
+            _portfolio[j] = _asset;
+        }
+    }
+
+    function getAccount(address _account)
+        external
+        view
+        returns (
+            AccountContext memory accountContext,
+            AccountBalance[] memory accountBalances,
+            PortfolioAsset[] memory portfolio
+        )
+    {
+        accountContext = getAccountContext(_account);
+        portfolio = getAccountPortfolio(_account);
+        accountBalances = new AccountBalance[](currencyIds.length);
+        for (uint256 i = 0; i < currencyIds.length; i++) {
+            accountBalances[i].currencyId = currencyIds[i];
+            accountBalances[i].cashBalance = cashBalances[_account][currencyIds[i]];
+        }
+    }
+
+    function nTokenAddress(uint16) external view returns (address) {
+        return address(this);
+    }
+
+    function getNTokenPortfolio(address)
+        external
+        view
+        returns (PortfolioAsset[] memory liquidityTokens, PortfolioAsset[] memory netfCashAssets)
+    {
+        // The mock nToken never holds residuals: one empty fCash asset per market
+        netfCashAssets = new PortfolioAsset[](7);
+    }
+
+    function encodeToId(uint16 _currencyId, uint40 _maturity, uint8 _assetType) public pure returns (uint256) {
+        return uint256(_currencyId) << 48 | uint256(_maturity) << 8 | uint256(_assetType);
+    }
+
+    // ACTIONS
+
+    function settleAccount(address _account) external {
+        Position[] storage _positions = portfolios[_account];
+        uint256 i = 0;
+        while (i < _positions.length) {
+            if (_positions[i].maturity <= block.timestamp) {
+                _updateCash(_account, _positions[i].currencyId, _positions[i].notional);
+                _positions[i] = _positions[_positions.length - 1];
+                _positions.pop();
+            } else {
+                i++;
+            }
+        }
+        emit AccountSettled(_account);
+    }
+
+    function withdraw(uint16 _currencyId, uint88 _amountInternalPrecision, bool) external returns (uint256) {
+        // Asset cash is the underlying, every withdrawal is redeemed to it
+        return _withdraw(msg.sender, _currencyId, int256(_amountInternalPrecision));
+    }
+
+    function batchBalanceAndTradeAction(address _account, BalanceActionWithTrades[] memory _actions)
+        external
+        payable
+    {
+        require(msg.sender == _account, "Unauthorized");
+        for (uint256 i = 0; i < _actions.length; i++) {
+            BalanceActionWithTrades memory _action = _actions[i];
+            Currency memory _currency = _getCurrency(_action.currencyId);
+
+            if (_action.actionType == DepositActionType.DepositUnderlying) {
+                if (_currency.underlying == address(0)) {
+                    require(msg.value == _action.depositActionAmount, "Invalid ETH amount");
+                } else {
+                    IERC20(_currency.underlying).safeTransferFrom(_account, address(this), _action.depositActionAmount);
+                }
+                _updateCash(
+                    _account,
+                    _action.currencyId,
+                    int256(_action.depositActionAmount) * INTERNAL_TOKEN_PRECISION / _currency.decimals
+                );
+            } else {
+                require(_action.actionType == DepositActionType.None, "Unsupported deposit");
+            }
+
+            for (uint256 j = 0; j < _action.trades.length; j++) {
+                _executeTrade(_account, _action.currencyId, _action.trades[j]);
+            }
+
+            int256 _withdrawAmount = _action.withdrawEntireCashBalance
+                ? cashBalances[_account][_action.currencyId]
+                : int256(_action.withdrawAmountInternalPrecision);
+            if (_withdrawAmount > 0) {
+                _withdraw(_account, _action.currencyId, _withdrawAmount);
+            }
+            require(cashBalances[_account][_action.currencyId] >= 0, "Insufficient cash");
+        }
+    }
+
+    function safeTransferFrom(address _from, address _to, uint256 _id, uint256 _amount, bytes calldata _data)
+        external
+        payable
+    {
+        require(msg.sender == _from, "Unauthorized");
+        uint16 _currencyId = uint16(_id >> 48);
+        uint40 _maturity = uint40(_id >> 8);
+        require(uint8(_id) == FCASH_ASSET_TYPE, "Unsupported asset");
+
+        _updatePosition(_from, _currencyId, _maturity, -int256(_amount));
+        _updatePosition(_to, _currencyId, _maturity, int256(_amount));
+        if (_to.isContract()) {
+            require(
+                IERC1155Receiver(_to).onERC1155Received(msg.sender, _from, _id, _amount, _data) == ERC1155_ACCEPTED,
+                "Not accepted"
+            );
+        }
+    }
+
+    // INTERNAL FUNCTIONS
+
+    function _getCurrency(uint16 _currencyId) internal view returns (Currency memory _currency) {
+        _currency = currencies[_currencyId];
+        require(_currency.listed, "Invalid currency id");
+    }
+
+    function _activeMaturities(uint16 _currencyId) internal view returns (uint256[] memory _maturities) {
+        if (maturities[_currencyId].length > 0) {
+            return maturities[_currencyId];
+        }
+        // Notional's traded market offsets from the start of the current quarter
+        uint256[7] memory _offsets = [QUARTER, 2 * QUARTER, YEAR, 2 * YEAR, 5 * YEAR, 10 * YEAR, 20 * YEAR];
+        uint256 _referenceTime = block.timestamp - (block.timestamp % QUARTER);
+        _maturities = new uint256[](rates[_currencyId].length);
+        for (uint256 i = 0; i < _maturities.length; i++) {
+            _maturities[i] = _referenceTime + _offsets[i];
+        }
+    }
+
+    function _market(uint16 _currencyId, uint256 _marketIndex, uint256 _blockTime)
+        internal
+        view
+        returns (uint256 _maturity, uint256 _exchangeRate)
+    {
+        _getCurrency(_currencyId);
+        uint256[] memory _maturities = _activeMaturities(_currencyId);
+        require(0 < _marketIndex && _marketIndex <= _maturities.length, "Invalid market");
+        _maturity = _maturities[_marketIndex - 1];
+        require(_blockTime < _maturity, "Invalid block time");
+        _exchangeRate = uint256(RATE_PRECISION).add(
+            rates[_currencyId][_marketIndex - 1].mul(_maturity - _blockTime).div(YEAR)
+        );
+    }
+
+    function _executeTrade(address _account, uint16 _currencyId, bytes32 _trade) internal {
+        uint8 _tradeType = uint8(bytes1(_trade));
+        if (_tradeType == 4) {
+            // PurchaseNTokenResidual: there are never residuals to buy
+            return;
+        }
+        require(_tradeType <= 1, "Unsupported trade");
+
+        uint256 _marketIndex = uint256(uint8(uint256(_trade >> 240)));
+        int256 _fCash = int256(uint88(uint256(_trade >> 152)));
+        (uint256 _maturity, uint256 _exchangeRate) = _market(_currencyId, _marketIndex, block.timestamp);
+
+        int256 _netCash;
+        if (_tradeType == 0) {
+            // Lend: pay cash now for fCash at maturity, rounding the cost up
+            _netCash = -((_fCash * RATE_PRECISION + int256(_exchangeRate) - 1) / int256(_exchangeRate));
+        } else {
+            // Borrow: sell fCash held for cash now
+            _netCash = _fCash * RATE_PRECISION / int256(_exchangeRate);
+            _fCash = -_fCash;
+        }
+        _updateCash(_account, _currencyId, _netCash);
+        _updatePosition(_account, _currencyId, uint40(_maturity), _fCash);
+        emit LendBorrowTrade(_account, _currencyId, uint40(_maturity), _netCash, _fCash);
+    }
+
+    function _updateCash(address _account, uint16 _currencyId, int256 _netCashChange) internal {
+        cashBalances[_account][_currencyId] += _netCashChange;
+        emit CashBalanceChange(_account, _currencyId, _netCashChange);
+    }
+
+    function _updatePosition(address _account, uint16 _currencyId, uint40 _maturity, int256 _notional) internal {
+        Position[] storage _positions = portfolios[_account];
+        for (uint256 i = 0; i < _positions.length; i++) {
+            if (_positions[i].currencyId == _currencyId && _positions[i].maturity == _maturity) {
+                int256 _newNotional = _positions[i].notional + _notional;
+                // The mock does not support debt
+                require(_newNotional >= 0, "Insufficient fCash");
+                if (_newNotional == 0) {
+                    _positions[i] = _positions[_positions.length - 1];
+                    _positions.pop();
+                } else {
+                    _positions[i].notional = _newNotional;
+                }
+                return;
+            }
+        }
+        require(_notional >= 0, "Insufficient fCash");
+        if (_notional > 0) {
+            _positions.push(Position(_currencyId, _maturity, _notional));
+        }
+    }
+
+    function _withdraw(address _account, uint16 _currencyId, int256 _amountInternal) internal returns (uint256) {
+        Currency memory _currency = _getCurrency(_currencyId);
+        _updateCash(_account, _currencyId, -_amountInternal);
+        require(cashBalances[_account][_currencyId] >= 0, "Insufficient cash");
+
+        uint256 _amountExternal = uint256(_amountInternal * _currency.decimals / INTERNAL_TOKEN_PRECISION);
+        if (_currency.underlying == address(0)) {
+            (bool _success, ) = _account.call{value: _amountExternal}("");
+            require(_success, "ETH transfer failed");
+        } else {
+            IERC20(_currency.underlying).safeTransfer(_account, _amountExternal);
+        }
+        return _amountExternal;
+    }
+}
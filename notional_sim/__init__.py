@@ -0,0 +1,2 @@
+# Off-chain tooling to price, simulate and analyse the Notional lending strategy without a forked node
+from .market import MarketModel
@@ -0,0 +1,579 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import calendar
+from . import market as m
+from .constants import (
+    DAY,
+    FCASH_SCALING,
+    INTERNAL_TOKEN_PRECISION,
+    MAX_BPS,
+    QUARTER,
+    RATE_PRECISION,
+    YEAR,
+)
+from .market import MarketModel
+
+# Monte Carlo replay of the strategy's harvest lifecycle. SimulatedStrategy mirrors Strategy.sol
+# line by line (integer 'want' accounting, SafeMath reverts, FCASH_SCALING, proportional loss
+# realisation, toggleRealizeLosses...) and SimulatedVault mirrors the parts of Vault.report the
+# strategy depends on. Markets are priced with the off-chain model in notional_sim.market.
+
+
+class TradeReverted(Exception):
+    pass
+
+
+def _sub(a, b):
+    # SafeMath.sub
+    if b > a:
+        raise TradeReverted("SafeMath: subtraction overflow")
+    return a - b
+
+
+def _div(a, b):
+    # SafeMath.div
+    if b == 0:
+        raise TradeReverted("SafeMath: division by zero")
+    return a // b
+
+
+def _to_int(value):
+    if math.isnan(value):
+        raise TradeReverted("Invalid trade")
+    return int(value)
+
+
+class SimulatedMarkets:
+    # Active markets of one currency at one point in time. Trades update the market state so several
+    # trades within the same harvest see each other's slippage
+
+    def __init__(self, cash_group, maturities, total_fcash, total_cash, rates):
+        self.cash_group = cash_group
+        self.maturities = [int(x) for x in maturities]
+        self.total_fcash = [float(x) for x in total_fcash]
+        self.total_cash = [float(x) for x in total_cash]
+        self.rates = [float(x) for x in rates]
+
+    @classmethod
+    def from_model(cls, model, currency_id):
+        # Markets exactly as snapshotted by the model
+        cash_group = model.cash_groups[currency_id]
+        markets = model.getActiveMarkets(currency_id)
+        total_cash = m.convert_to_underlying(
+            np.array([mk.total_asset_cash for mk in markets], dtype=float),
+            cash_group["asset_rate"],
+            cash_group["underlying_decimals"],
+        )
+        return cls(
+            cash_group,
+            [mk.maturity for mk in markets],
+            [mk.total_fcash for mk in markets],
+            total_cash,
+            [mk.last_implied_rate for mk in markets],
+        )
+
+    @classmethod
+    def at_time(cls, model, currency_id, block_time, rates):
+        # Markets rolled to the quarter of block_time, keeping the snapshot's liquidity per market index
+        # and trading at the given implied rates
+        base = cls.from_model(model, currency_id)
+        return cls(
+            base.cash_group,
+            calendar.active_maturities(block_time, len(base.maturities)),
+            base.total_fcash,
+            base.total_cash,
+            rates,
+        )
+
+    def copy(self):
+        return SimulatedMarkets(self.cash_group, self.maturities, self.total_fcash, self.total_cash, self.rates)
+
+    def index_for_maturity(self, maturity):
+        # Strategy._getMarketIndexForMaturity
+        for (j, market_maturity) in enumerate(self.maturities):
+            if market_maturity == maturity:
+                return j + 1
+        return 0
+
+    def _params(self, market_index, block_time):
+        if market_index < 1 or market_index > len(self.maturities):
+            raise TradeReverted("Invalid market index")
+        i = market_index - 1
+        time_to_maturity = self.maturities[i] - block_time
+        if time_to_maturity <= 0:
+            raise TradeReverted("Invalid block time")
+        return i, time_to_maturity
+
+    def cash_given_fcash(self, fcash_to_account, market_index, block_time):
+        # getCashAmountGivenfCashAmount, underlying part. Returns 0 for failed trades like the view
+        i, time_to_maturity = self._params(market_index, block_time)
+        cash, _, _ = m.calculate_trade(
+            self.total_fcash[i], self.total_cash[i], self.rates[i], self.cash_group["rate_scalars"][i],
+            time_to_maturity, fcash_to_account, self.cash_group["total_fee_bps"],
+            self.cash_group["reserve_fee_share"],
+        )
+        return 0 if np.isnan(cash) else int(cash)
+
+    def fcash_given_cash(self, cash_to_account, market_index, block_time):
+        # getfCashAmountGivenCashAmount, reverts if the Newton's method fails
+        i, time_to_maturity = self._params(market_index, block_time)
+        fcash = m.fcash_given_cash(
+            self.total_fcash[i], self.total_cash[i], self.rates[i], self.cash_group["rate_scalars"][i],
+            time_to_maturity, cash_to_account, self.cash_group["total_fee_bps"],
+        )
+        return _to_int(float(fcash))
+
+    def trade(self, fcash_to_account, market_index, block_time):
+        # Executes a Lend/Borrow trade and returns the underlying cash to the account
+        i, time_to_maturity = self._params(market_index, block_time)
+        cash, reserve, new_rate = m.calculate_trade(
+            self.total_fcash[i], self.total_cash[i], self.rates[i], self.cash_group["rate_scalars"][i],
+            time_to_maturity, fcash_to_account, self.cash_group["total_fee_bps"],
+            self.cash_group["reserve_fee_share"],
+        )
+        cash = _to_int(float(cash))
+        self.total_fcash[i] -= fcash_to_account
+        self.total_cash[i] -= cash + float(reserve)
+        self.rates[i] = float(new_rate)
+        return cash
+
+
+class SimulatedVault:
+    # Vault.vy accounting for a single strategy, with no fees and no per-harvest debt limits
+
+    def __init__(self, debt_ratio=MAX_BPS):
+        self.idle = 0
+        self.debt_ratio = debt_ratio
+        self.total_debt = 0
+        self.total_gain = 0
+        self.total_loss = 0
+
+    def deposit(self, amount):
+        self.idle += amount
+
+    def total_assets(self):
+        return self.idle + self.total_debt
+
+    def debt_outstanding(self):
+        if self.debt_ratio == 0:
+            return self.total_debt
+        limit = self.debt_ratio * self.total_assets() // MAX_BPS
+        return max(self.total_debt - limit, 0)
+
+    def credit_available(self):
+        limit = self.debt_ratio * self.total_assets() // MAX_BPS
+        if limit <= self.total_debt:
+            return 0
+        return min(limit - self.total_debt, self.idle)
+
+    def report(self, strategy, gain, loss, debt_payment):
+        if gain + debt_payment > strategy.want:
+            raise TradeReverted("Vault: insufficient want to report")
+        if loss > 0:
+            if loss > self.total_debt:
+                raise TradeReverted("Vault: loss over total debt")
+            if self.total_debt > 0:
+                self.debt_ratio -= min(loss * self.debt_ratio // self.total_debt, self.debt_ratio)
+            self.total_loss += loss
+            self.total_debt -= loss
+        self.total_gain += gain
+
+        credit = self.credit_available()
+        debt = self.debt_outstanding()
+        debt_payment = min(debt_payment, debt)
+        if debt_payment > 0:
+            self.total_debt -= debt_payment
+            debt -= debt_payment
+        if credit > 0:
+            self.total_debt += credit
+
+        total_available = gain + debt_payment
+        if total_available < credit:
+            self.idle -= credit - total_available
+            strategy.want += credit - total_available
+        elif total_available > credit:
+            self.idle += total_available - credit
+            strategy.want -= total_available - credit
+        return debt
+
+
+class SimulatedStrategy:
+    # Strategy.sol state and accounting. 'want' amounts use the token's decimals, fCash the 8
+    # decimals of Notional
+
+    def __init__(self, vault, decimals_difference, min_time_to_maturity=30 * DAY, min_amount_want=0,
+        toggle_realize_losses=False, fcash_scaling=FCASH_SCALING, ladder_weights=()):
+        self.vault = vault
+        self.decimals_difference = int(decimals_difference)
+        self.min_time_to_maturity = min_time_to_maturity
+        self.min_amount_want = min_amount_want
+        self.toggle_realize_losses = toggle_realize_losses
+        self.fcash_scaling = fcash_scaling
+        # setLadderWeights, empty lends into the shortest eligible market
+        self.ladder_weights = list(ladder_weights)
+        self.want = 0
+        self.cash_balance = 0
+        # maturity => fCash notional
+        self.portfolio = {}
+        self.maturity = 0
+        self.markets = None
+        self.now = 0
+        # Notional trades and settlements of the successful harvests, to estimate their gas
+        self.trades = 0
+        self.settlements = 0
+
+    @classmethod
+    def for_cash_group(cls, vault, cash_group, **kwargs):
+        # DECIMALS_DIFFERENCE = underlying decimals * MAX_BPS / asset token decimals (8 for cTokens)
+        return cls(vault, cash_group["underlying_decimals"] * MAX_BPS // INTERNAL_TOKEN_PRECISION, **kwargs)
+
+    def _state(self):
+        return (self.want, self.cash_balance, dict(self.portfolio), self.maturity, self.toggle_realize_losses,
+                self.trades, self.settlements)
+
+    def _restore(self, state):
+        (self.want, self.cash_balance, portfolio, self.maturity, self.toggle_realize_losses, self.trades,
+         self.settlements) = state
+        self.portfolio = dict(portfolio)
+
+    def _sorted_portfolio(self):
+        # getAccountPortfolio returns assets sorted by maturity
+        return sorted(self.portfolio.items())
+
+    def _to_want(self, internal_amount):
+        return internal_amount * self.decimals_difference // MAX_BPS
+
+    def harvest(self, markets, now):
+        # BaseStrategy.harvest: a revert leaves the strategy, the vault and the markets untouched.
+        # Returns (profit, loss, debtPayment) or None if the harvest reverted
+        self.markets, self.now = markets, now
+        strategy_state = self._state()
+        vault_state = dict(self.vault.__dict__)
+        market_state = (list(markets.total_fcash), list(markets.total_cash), list(markets.rates))
+        try:
+            debt_outstanding = self.vault.debt_outstanding()
+            (profit, loss, debt_payment) = self.prepare_return(debt_outstanding)
+            debt_outstanding = self.vault.report(self, profit, loss, debt_payment)
+            self.adjust_position(debt_outstanding)
+            return (profit, loss, debt_payment)
+        except TradeReverted:
+            self._restore(strategy_state)
+            self.vault.__dict__.update(vault_state)
+            (markets.total_fcash, markets.total_cash, markets.rates) = market_state
+            return None
+
+    def estimated_total_assets(self):
+        return self.want + self._get_total_value_from_portfolio()
+
+    def _get_total_value_from_portfolio(self):
+        total = 0
+        for (maturity, notional) in self._sorted_portfolio():
+            for (j, market_maturity) in enumerate(self.markets.maturities):
+                if maturity < self.now:
+                    # Matured fCash is valued 1:1
+                    total += self._to_want(notional)
+                    break
+                if maturity == market_maturity:
+                    underlying = self.markets.cash_given_fcash(-notional, j + 1, self.now)
+                    total += self._to_want(underlying)
+                    break
+        return total
+
+    def get_unrealised_pl(self):
+        total_assets = self.estimated_total_assets()
+        total_debt = self.vault.total_debt
+        if total_debt > total_assets:
+            return (0, total_debt - total_assets)
+        return (total_assets - total_debt, 0)
+
+    def prepare_return(self, debt_outstanding):
+        self._check_positions_and_withdraw()
+        (profit, _) = self.get_unrealised_pl()
+        want_balance = self.want
+        loss = 0
+        if profit > want_balance:
+            profit = 0
+        amount_required = debt_outstanding + profit
+        if amount_required > want_balance:
+            amount_available = 0
+            realised_loss = 0
+            if self.toggle_realize_losses:
+                (amount_available, realised_loss) = self._liquidate_position(amount_required)
+            loss = realised_loss
+            if amount_available >= amount_required:
+                debt_payment = debt_outstanding
+                if amount_required - debt_payment < profit:
+                    profit = amount_required - debt_payment
+            elif amount_available < debt_outstanding:
+                profit = 0
+                debt_payment = amount_available
+            else:
+                debt_payment = debt_outstanding
+                profit = amount_available - debt_payment
+        else:
+            debt_payment = debt_outstanding
+            if amount_required - debt_payment < profit:
+                profit = amount_required - debt_payment
+        return (profit, loss, debt_payment)
+
+    def adjust_position(self, debt_outstanding):
+        available = self.want
+        if available <= debt_outstanding:
+            return
+        available -= debt_outstanding
+        if available < self.min_amount_want:
+            return
+
+        (min_market_index, min_market_maturity) = self._get_minimum_market_index()
+        if min_market_maturity > self.maturity and self.maturity > 0:
+            available += self._roll_over_trade(min_market_maturity)
+
+        amount_trade = available * MAX_BPS // self.decimals_difference * self.fcash_scaling // MAX_BPS
+        trades = self._lend_trades(amount_trade, min_market_index)
+        if not trades:
+            return
+        self._lend(trades, available)
+        new_maturity = trades[0][1]
+        if min_market_maturity <= self.maturity < new_maturity:
+            new_maturity = self.maturity
+        self.maturity = new_maturity
+
+    def liquidate_position(self, amount_needed):
+        self._check_positions_and_withdraw()
+        if self.want >= amount_needed:
+            return (amount_needed, 0)
+        return self._liquidate_position(amount_needed)
+
+    def _liquidate_position(self, amount_needed):
+        # Positions were already settled by prepare_return or liquidate_position, like the harvest snapshot
+        # of Strategy._liquidatePosition
+        want_balance = self.want
+        if want_balance >= amount_needed:
+            return (amount_needed, 0)
+
+        (_, unrealised_losses) = self.get_unrealised_pl()
+        amount_to_liquidate = amount_needed - want_balance
+        total_debt = self.vault.total_debt
+        losses_to_be_realised = _div(unrealised_losses * amount_to_liquidate, _sub(total_debt, want_balance))
+        amount_to_liquidate = _sub(amount_to_liquidate, losses_to_be_realised)
+
+        remaining = amount_to_liquidate
+        trades = []
+        portfolio = self._sorted_portfolio()
+        for (i, (maturity, notional)) in enumerate(portfolio):
+            if remaining > 0:
+                market_index = self.markets.index_for_maturity(maturity)
+                underlying = self.markets.cash_given_fcash(-notional, market_index, self.now)
+                underlying_position = self._to_want(underlying)
+                if underlying_position > remaining:
+                    fcash = -self.markets.fcash_given_cash(
+                        _div(remaining * MAX_BPS, self.decimals_difference) + 1, market_index, self.now
+                    )
+                    trades.append((market_index, maturity, fcash))
+                    remaining = 0
+                    break
+                trades.append((market_index, maturity, notional))
+                remaining -= underlying_position
+                self.maturity = portfolio[i + 1][0] if i + 1 < len(portfolio) else 0
+
+        for (market_index, maturity, fcash) in trades:
+            self._borrow(market_index, maturity, fcash)
+
+        total_assets = self.want
+        if amount_needed > total_assets:
+            liquidated, loss = total_assets, amount_needed - total_assets
+        else:
+            liquidated, loss = amount_needed, 0
+        self.toggle_realize_losses = False
+        return (liquidated, loss)
+
+    def liquidate_all_positions(self):
+        self._check_positions_and_withdraw()
+        (liquidated, _) = self._liquidate_position(self.estimated_total_assets())
+        return liquidated
+
+    def _check_positions_and_withdraw(self):
+        next_settle_time = min(self.portfolio) if self.portfolio else 0
+        if next_settle_time < self.now:
+            # settleAccount: matured fCash becomes cash 1:1. Only settling a matured position is charged the
+            # gas of a settlement, an empty portfolio (nextSettleTime 0) has nothing to settle
+            matured = [mat for mat in self.portfolio if mat <= self.now]
+            if matured:
+                self.settlements += 1
+            for maturity in matured:
+                self.cash_balance += self.portfolio.pop(maturity)
+            if self.cash_balance > 0:
+                self.want += self._to_want(self.cash_balance)
+                self.cash_balance = 0
+                # Longer positions of a ladder may be left
+                self.maturity = min(self.portfolio) if self.portfolio else 0
+
+    def _get_minimum_market_index(self):
+        for (i, maturity) in enumerate(self.markets.maturities):
+            if maturity - self.now >= self.min_time_to_maturity:
+                return (i + 1, maturity)
+        return (0, 0)
+
+    def _roll_over_trade(self, min_market_maturity):
+        # Closes every position shorter than the minimum market
+        prev_balance = self.want
+        for (maturity, notional) in self._sorted_portfolio():
+            if maturity < min_market_maturity:
+                market_index = self.markets.index_for_maturity(maturity)
+                if market_index > 0:
+                    self._borrow(market_index, maturity, notional)
+        return self.want - prev_balance
+
+    def _lend_trades(self, amount_trade, min_market_index):
+        # _getLendTrades: (market_index, maturity, fcash) per ladder weight, priced before trading
+        weights = self.ladder_weights or [MAX_BPS]
+        legs = min(len(weights), len(self.markets.maturities) + 1 - min_market_index)
+        (trades, allocated) = ([], 0)
+        for i in range(legs):
+            leg_amount = amount_trade - allocated if i == legs - 1 else amount_trade * weights[i] // MAX_BPS
+            allocated += leg_amount
+            if leg_amount == 0:
+                continue
+            market_index = min_market_index + i
+            fcash = self.markets.fcash_given_cash(-leg_amount, market_index, self.now)
+            if fcash > 0:
+                trades.append((market_index, self.markets.maturities[market_index - 1], fcash))
+        return trades
+
+    def _lend(self, trades, deposit):
+        # DepositUnderlying + Lend trades, withdrawing the entire cash balance left to the strategy
+        cash = 0
+        for (market_index, maturity, fcash) in trades:
+            cash += self.markets.trade(fcash, market_index, self.now)
+            self.trades += 1
+            self.portfolio[maturity] = self.portfolio.get(maturity, 0) + fcash
+        deposit_internal = deposit * MAX_BPS // self.decimals_difference
+        if -cash > deposit_internal:
+            raise TradeReverted("Insufficient free collateral")
+        self.want += self._to_want(deposit_internal + cash) - deposit
+
+    def _borrow(self, market_index, maturity, fcash):
+        # Closes (part of) a lending position by borrowing the same fCash
+        if self.portfolio.get(maturity, 0) < fcash:
+            raise TradeReverted("Insufficient free collateral")
+        cash = self.markets.trade(-fcash, market_index, self.now)
+        self.trades += 1
+        self.want += self._to_want(cash)
+        self.portfolio[maturity] -= fcash
+        if self.portfolio[maturity] == 0:
+            del self.portfolio[maturity]
+
+
+def simulate_rate_paths(initial_rates, n_paths, n_steps, dt, mean_reversion=2.0, volatility=0.01,
+    floor=0.0005, rng=None):
+    # Ornstein-Uhlenbeck shock on the whole curve: rates[path, step, market] in RATE_PRECISION.
+    # volatility and floor are annualised rates (0.01 = 1%), dt is in seconds
+    rng = np.random.default_rng(rng)
+    dt_years = dt / YEAR
+    shocks = rng.standard_normal((n_paths, n_steps))
+    x = np.zeros((n_paths, n_steps))
+    for step in range(1, n_steps):
+        x[:, step] = x[:, step - 1] * (1 - mean_reversion * dt_years) \
+            + volatility * math.sqrt(dt_years) * shocks[:, step]
+    rates = np.asarray(initial_rates, dtype=float)[None, None, :] + x[:, :, None] * RATE_PRECISION
+    return np.maximum(rates, floor * RATE_PRECISION)
+
+
+def run_path(model, currency_id, rates, start_time, deposit, harvest_interval, withdraw_probability,
+    realize_losses, rng, markets=None, **strategy_kwargs):
+    # One harvest lifecycle over rates[step, market], exiting at the end. markets: SimulatedMarkets of
+    # every step to start from (they are copied), instead of rolling the model to each step.
+    # Returns (vault, strategy, harvests, reverted harvests)
+    n_steps = len(rates)
+    vault = SimulatedVault()
+    strategy = SimulatedStrategy.for_cash_group(vault, model.cash_groups[currency_id], **strategy_kwargs)
+    vault.deposit(deposit)
+    (harvests, reverted) = (0, 0)
+    for step in range(n_steps + 1):
+        now = start_time + step * harvest_interval
+        last = step == n_steps
+        if markets is None:
+            step_markets = SimulatedMarkets.at_time(model, currency_id, now, rates[min(step, n_steps - 1)])
+        else:
+            step_markets = markets[step].copy()
+        if last:
+            # Exit: pay back everything, realising losses if needed
+            vault.debt_ratio = 0
+            strategy.toggle_realize_losses = True
+        elif step > 0 and rng.random() < withdraw_probability:
+            vault.debt_ratio = int(vault.debt_ratio * rng.random())
+            strategy.toggle_realize_losses = realize_losses
+        harvests += 1
+        if strategy.harvest(step_markets, now) is None:
+            reverted += 1
+    return (vault, strategy, harvests, reverted)
+
+
+def _run_paths(model_data, currency_id, rates, start_time, deposit, harvest_interval, min_time_to_maturity,
+    min_amount_want, withdraw_probability, realize_losses, seed):
+    model = MarketModel.from_dict(model_data)
+    rng = np.random.default_rng(seed)
+    n_paths = rates.shape[0]
+    results = {
+        "pnl": np.zeros(n_paths),
+        "realised_loss": np.zeros(n_paths),
+        "total_gain": np.zeros(n_paths),
+        "harvests": np.zeros(n_paths, dtype=int),
+        "reverted_harvests": np.zeros(n_paths, dtype=int),
+    }
+    for p in range(n_paths):
+        (vault, _, harvests, reverted) = run_path(
+            model, currency_id, rates[p], start_time, deposit, harvest_interval, withdraw_probability,
+            realize_losses, rng, min_time_to_maturity=min_time_to_maturity, min_amount_want=min_amount_want,
+        )
+        results["harvests"][p] = harvests
+        results["reverted_harvests"][p] = reverted
+        results["pnl"][p] = vault.total_gain - vault.total_loss
+        results["realised_loss"][p] = vault.total_loss
+        results["total_gain"][p] = vault.total_gain
+    return results
+
+
+def run_backtest(model, currency_id, n_paths, deposit, start_time, n_quarters=4, harvest_interval=7 * DAY,
+    min_time_to_maturity=30 * DAY, min_amount_want=0, withdraw_probability=0.0, realize_losses=False,
+    mean_reversion=2.0, volatility=0.01, processes=None, chunk_size=1000, seed=0):
+    """
+    Runs n_paths simulated harvest lifecycles of the strategy over n_quarters, harvesting every
+    harvest_interval seconds, across a process pool. Each path deposits `deposit` want, may lower the
+    debt ratio at random harvests and exits at the end. Returns a dict of arrays, one value per path:
+    pnl (vault gain - loss), realised_loss, total_gain, harvests and reverted_harvests.
+    """
+    n_steps = int(n_quarters * QUARTER // harvest_interval)
+    initial_rates = [mk.last_implied_rate for mk in model.getActiveMarkets(currency_id)]
+    seeds = np.random.SeedSequence(seed).spawn(math.ceil(n_paths / chunk_size))
+    jobs = []
+    for (i, chunk_seed) in enumerate(seeds):
+        n = min(chunk_size, n_paths - i * chunk_size)
+        rng = np.random.default_rng(chunk_seed)
+        rates = simulate_rate_paths(
+            initial_rates, n, n_steps, harvest_interval, mean_reversion, volatility, rng=rng
+        )
+        jobs.append((
+            model.to_dict(), currency_id, rates, start_time, deposit, harvest_interval, min_time_to_maturity,
+            min_amount_want, withdraw_probability, realize_losses, rng.integers(2 ** 32),
+        ))
+
+    if processes == 1:
+        chunks = [_run_paths(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            chunks = list(pool.map(_run_paths, *zip(*jobs)))
+    return {key: np.concatenate([c[key] for c in chunks]) for key in chunks[0]}
+
+
+def summarize(results, percentiles=(1, 5, 50, 95, 99)):
+    # Distribution of every result: mean and the requested percentiles
+    return {
+        key: {"mean": float(np.mean(values)), **{
+            f"p{q}": float(v) for (q, v) in zip(percentiles, np.percentile(values, percentiles))
+        }}
+        for key, values in results.items()
+    }
@@ -0,0 +1,52 @@
+from .constants import QUARTER, TRADED_MARKET_OFFSETS
+
+# Notional's maturity and settlement calendar (DateTime.sol), computed offline. Every market
+# matures on a quarter boundary and markets are re-initialised once the quarter turns, so the
+# time-travel steps of a fork scenario are known before touching the chain:
+#
+#   for (timestamp, settlement) in calendar.plan(chain.time(), maturity):
+#       chain.mine(1, timestamp=timestamp)
+#       if settlement is not None:
+#           n_proxy.initializeMarkets(currencyID, 0)
+
+
+def reference_time(block_time):
+    # DateTime.getReferenceTime: start of the quarter of block_time
+    return block_time - block_time % QUARTER
+
+
+def next_settlement(block_time):
+    return reference_time(block_time) + QUARTER
+
+
+def active_maturities(block_time, max_market_index):
+    # Maturities of the markets getActiveMarkets returns at block_time, by market index
+    reference = reference_time(block_time)
+    return [reference + TRADED_MARKET_OFFSETS[i] for i in range(1, max_market_index + 1)]
+
+
+def market_index(maturity, block_time, max_market_index):
+    # Market index trading the maturity at block_time, None if it is not an active market
+    maturities = active_maturities(block_time, max_market_index)
+    return maturities.index(maturity) + 1 if maturity in maturities else None
+
+
+def settlements_between(start, end):
+    # Quarter boundaries in (start, end)
+    return list(range(next_settlement(start), end, QUARTER))
+
+
+def plan(start, target, settle_delay=1):
+    # (timestamp, settlement) jumps from start to target: one settle_delay seconds past every quarter
+    # boundary before target, where markets have to be initialised before time can move on, and a
+    # last one to target itself. settlement is the boundary a jump crosses, None if it crosses none
+    jumps = []
+    settlement = None
+    for boundary in range(next_settlement(start), target + 1, QUARTER):
+        if boundary + settle_delay < target:
+            jumps.append((boundary + settle_delay, boundary))
+        else:
+            settlement = boundary
+    jumps.append((target, settlement))
+    return jumps
+
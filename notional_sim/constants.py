@@ -0,0 +1,50 @@
+# Constants mirrored from Notional V2 (Constants.sol / DateTime.sol) and from Strategy.sol
+
+# Notional internal precisions
+INTERNAL_TOKEN_PRECISION = 10 ** 8
+RATE_PRECISION = 10 ** 9
+BASIS_POINT = RATE_PRECISION // 10_000
+PERCENTAGE_DECIMALS = 100
+ASSET_RATE_DECIMAL_DIFFERENCE = 10 ** 10
+# Markets cannot trade with a proportion of fCash over 99%
+MAX_MARKET_PROPORTION = 99 * RATE_PRECISION // 100
+
+# Notional's calendar: a year has 360 days and a quarter 90 days
+DAY = 86400
+QUARTER = 90 * DAY
+YEAR = 360 * DAY
+IMPLIED_RATE_TIME = YEAR
+
+# Offset from the reference time (start of the quarter) to each market's maturity, by market index
+TRADED_MARKET_OFFSETS = {
+    1: QUARTER,
+    2: 2 * QUARTER,
+    3: YEAR,
+    4: 2 * YEAR,
+    5: 5 * YEAR,
+    6: 10 * YEAR,
+    7: 20 * YEAR,
+}
+
+# Strategy.sol constants
+MAX_BPS = 10_000
+FCASH_SCALING = 9_995
+
+# Gas of a harvest that neither trades nor settles, and what each trade and settlement adds to it,
+# for when tests/gas_baselines.json has no baselines yet (see notional_sim.gas)
+HARVEST_GAS = 250_000
+TRADE_GAS = 180_000
+SETTLE_GAS = 120_000
+
+# Trade action types (TradeActionType enum in Types.sol)
+LEND = 0
+BORROW = 1
+ADD_LIQUIDITY = 2
+REMOVE_LIQUIDITY = 3
+PURCHASE_NTOKEN_RESIDUAL = 4
+SETTLE_CASH_DEBT = 5
+
+# Deposit action types (DepositActionType enum in Types.sol)
+DEPOSIT_NONE = 0
+DEPOSIT_ASSET = 1
+DEPOSIT_UNDERLYING = 2
@@ -0,0 +1,143 @@
+import numpy as np
+
+from . import rpc
+from .constants import RATE_PRECISION, YEAR
+from .types import MarketArrays, decode_markets
+from .valuation import LRUCache
+
+# Continuous yield curves built from Notional's active markets, for any number of blocks at once.
+#
+# A curve goes through each market's (time to maturity, rate), lastImpliedRate or oracleRate, and
+# interpolates linearly in rate * time (the log of the growth factor, Notional compounds
+# continuously over its 360 day year), so forward rates are constant between two maturities.
+# Rates are flat before the first and after the last market. Curves are stored as padded
+# (n_curves, n_markets) arrays and every query is vectorized over curves and horizons:
+#
+#   curves = YieldCurves.from_markets([n_proxy_views.getActiveMarkets(2, block_identifier=b) for b in blocks],
+#                                     block_times)
+#   curves.rates([30 * DAY, 200 * DAY])          # (n_blocks, 2) in RATE_PRECISION
+#   curves.forward_rates(90 * DAY, 180 * DAY)
+
+RATE_FIELDS = {"last_implied": "last_implied_rate", "oracle": "oracle_rate"}
+
+
+class YieldCurves:
+    def __init__(self, times_to_maturity, rates):
+        # (n, m) arrays sorted by time to maturity on every row, nan padded
+        self.times = np.atleast_2d(np.asarray(times_to_maturity, dtype=float))
+        self.knot_rates = np.atleast_2d(np.asarray(rates, dtype=float))
+        self.counts = (~np.isnan(self.times)).sum(axis=1)
+        if np.any(self.counts == 0):
+            raise ValueError("Every curve needs at least one market")
+        self._growth = self.knot_rates * self.times
+
+    @classmethod
+    def from_markets(cls, markets, block_times, rate="oracle"):
+        # markets: a getActiveMarkets result per curve (or a MarketArrays), block_times: the time of
+        # each curve
+        if not isinstance(markets, MarketArrays):
+            markets = MarketArrays.decode(markets)
+        block_times = np.broadcast_to(np.asarray(block_times, dtype=float), len(markets))
+        order = np.argsort(np.where(markets.valid, markets.maturity, np.iinfo(np.int64).max), axis=1, kind="stable")
+        valid = np.take_along_axis(markets.valid, order, axis=1)
+        maturities = np.take_along_axis(markets.maturity, order, axis=1)
+        rates = np.take_along_axis(getattr(markets, RATE_FIELDS[rate]), order, axis=1)
+        times = np.where(valid, maturities - block_times[:, None], np.nan)
+        return cls(times, np.where(valid, rates, np.nan))
+
+    @classmethod
+    def from_model(cls, model, currency_id, block_times, rate="oracle"):
+        # Curves of one MarketModel snapshot seen at several times
+        block_times = np.atleast_1d(block_times)
+        markets = [model.getActiveMarkets(currency_id)] * len(block_times)
+        return cls.from_markets(markets, block_times, rate)
+
+    def __len__(self):
+        return len(self.times)
+
+    def _queries(self, horizons):
+        # Horizons as an (n, k) array: the same for every curve, or one row per curve
+        horizons = np.asarray(horizons, dtype=float)
+        if horizons.ndim < 2:
+            horizons = np.broadcast_to(np.atleast_1d(horizons), (len(self), np.atleast_1d(horizons).size))
+        return horizons
+
+    def growth(self, horizons):
+        # rate * time (RATE_PRECISION * seconds) at the horizons
+        q = self._queries(horizons)
+        rows = np.arange(len(self))[:, None]
+        last = (self.counts - 1)[:, None]
+        # Number of markets at or before every horizon
+        index = np.sum(self.times[:, :, None] <= q[:, None, :], axis=1)
+        lower = np.clip(index - 1, 0, last)
+        upper = np.clip(index, 0, last)
+        (t0, t1) = (self.times[rows, lower], self.times[rows, upper])
+        (g0, g1) = (self._growth[rows, lower], self._growth[rows, upper])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inside = g0 + (g1 - g0) * (q - t0) / (t1 - t0)
+        before = self.knot_rates[rows, 0] * q
+        after = self.knot_rates[rows, last] * q
+        return np.where(index == 0, before, np.where(index > last, after, np.where(upper == lower, g0, inside)))
+
+    def rates(self, horizons):
+        # Continuously compounded annualised rates in RATE_PRECISION (1e9 = 100%), (n, k)
+        q = self._queries(horizons)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.growth(q) / q
+
+    def rates_at_maturities(self, maturities, block_times):
+        # Rates for absolute maturities, block_times the time of every curve
+        q = np.asarray(maturities, dtype=float)[None, :] - np.asarray(block_times, dtype=float).reshape(-1, 1)
+        return self.rates(np.broadcast_to(q, (len(self), q.shape[1])))
+
+    def discount_factors(self, horizons):
+        # Present value of 1 at the horizons
+        return np.exp(-self.growth(horizons) / RATE_PRECISION / YEAR)
+
+    def forward_rates(self, start, end):
+        # Annualised rates between two horizons, (n, k)
+        (start, end) = (self._queries(start), self._queries(end))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (self.growth(end) - self.growth(start)) / (end - start)
+
+
+class CurveCache:
+    # YieldCurves per (block, currency), fetched from the views on a miss. The missing blocks are
+    # fetched in one JSON-RPC batch (getActiveMarkets and the block of each), and built as one batch
+
+    def __init__(self, n_proxy_views, max_entries=4096, rate="oracle"):
+        self.n_proxy_views = n_proxy_views
+        self.rate = rate
+        # (block, currency) => (markets, block time)
+        self.entries = LRUCache(max_entries)
+
+    def _fetch(self, currency_id, blocks):
+        # {block: (markets, block time)} of the blocks
+        from brownie import web3
+
+        method = self.n_proxy_views.getActiveMarkets
+        call = {"to": self.n_proxy_views.address, "data": method.encode_input(currency_id)}
+        requests = []
+        for block in blocks:
+            requests += [("eth_call", [call, hex(block)]), ("eth_getBlockByNumber", [hex(block), False])]
+        values = rpc.results(rpc.batch(web3.provider, requests))
+        return {
+            block: (decode_markets(method.decode_output(values[2 * i])), int(values[2 * i + 1]["timestamp"], 16))
+            for (i, block) in enumerate(blocks)
+        }
+
+    def curves(self, currency_id, blocks):
+        # YieldCurves with one curve per block, in order
+        blocks = [int(block) for block in blocks]
+        entries = {}
+        for block in dict.fromkeys(blocks):
+            entry = self.entries.get((block, currency_id))
+            if entry is not None:
+                entries[block] = entry
+        missing = [block for block in dict.fromkeys(blocks) if block not in entries]
+        if missing:
+            fetched = self._fetch(currency_id, missing)
+            for (block, entry) in fetched.items():
+                self.entries.put((block, currency_id), entry)
+            entries.update(fetched)
+        return YieldCurves.from_markets([entries[b][0] for b in blocks], [entries[b][1] for b in blocks], self.rate)
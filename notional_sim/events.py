@@ -0,0 +1,304 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from .constants import YEAR
+
+# Columnar on-disk store of the strategy's history: yearn's Harvested / StrategyReported and
+# Notional's LendBorrowTrade events. scripts/indexer.py fills it from eth_getLogs in block-range
+# batches, this module decodes the raw logs for whole batches at once and queries the stored
+# columns as memory-mapped NumPy arrays.
+#
+# Layout of a store directory:
+#   meta.json              last indexed block, committed row count of every table, address book
+#   <table>/<column>.bin   raw little-endian column, one value per event
+#
+# Columns are appended in place and meta.json is replaced atomically afterwards, so an interrupted
+# sync leaves the store at its previous block (rows past the committed count are dropped on the
+# next append). Addresses are stored as indexes into the address book. Token amounts are float64:
+# exact up to 2**53 wei, within 1e-16 relative beyond, which is plenty for yields.
+
+STORE_VERSION = 1
+
+# Columns every table has, from the log itself
+LOG_COLUMNS = {"block": "<i8", "log_index": "<i4", "timestamp": "<i8", "emitter": "<i4"}
+
+# Kinds of event fields and the dtype they are stored with
+KINDS = {"address": "<i4", "uint": "<i8", "amount": "<f8", "signed_amount": "<f8"}
+
+# name => (event signature, indexed fields, data fields), fields are (column, kind)
+TABLES = {
+    "harvested": (
+        "Harvested(uint256,uint256,uint256,uint256)",
+        [],
+        [("profit", "amount"), ("loss", "amount"), ("debt_payment", "amount"), ("debt_outstanding", "amount")],
+    ),
+    "strategy_reported": (
+        "StrategyReported(address,uint256,uint256,uint256,uint256,uint256,uint256,uint256,uint256)",
+        [("strategy", "address")],
+        [
+            ("gain", "amount"), ("loss", "amount"), ("debt_paid", "amount"), ("total_gain", "amount"),
+            ("total_loss", "amount"), ("total_debt", "amount"), ("debt_added", "amount"), ("debt_ratio", "uint"),
+        ],
+    ),
+    "lend_borrow_trade": (
+        "LendBorrowTrade(address,uint16,uint40,int256,int256)",
+        [("account", "address"), ("currency_id", "uint")],
+        [("maturity", "uint"), ("net_asset_cash", "signed_amount"), ("net_fcash", "signed_amount")],
+    ),
+}
+
+
+def schema(table):
+    (_, indexed, data) = TABLES[table]
+    columns = dict(LOG_COLUMNS)
+    columns.update((name, KINDS[kind]) for (name, kind) in indexed + data)
+    return columns
+
+
+def _words(hex_values, n_words):
+    # Hex strings of n_words 32 byte words each to an (n, n_words, 32) uint8 array
+    data = bytes.fromhex("".join(h[2:] if h.startswith("0x") else h for h in hex_values))
+    return np.frombuffer(data, dtype=np.uint8).reshape(len(hex_values), n_words, 32)
+
+
+def _to_float(words, signed=False):
+    # (..., 32) big-endian uint256 / int256 words to float64
+    limbs = np.ascontiguousarray(words).view(">u8").astype(np.uint64)
+    negative = (limbs[..., 0] >> np.uint64(63)).astype(bool) if signed else False
+    # |x| of a negative two's complement is ~x + 1
+    limbs = np.where(np.expand_dims(negative, -1), ~limbs, limbs)
+    scale = 2.0 ** np.array([192, 128, 64, 0])
+    values = (limbs.astype(np.float64) * scale).sum(axis=-1)
+    return np.where(negative, -(values + 1), values)
+
+
+def _to_int(words):
+    # Low 64 bits of (..., 32) words, for fields that fit (timestamps, ids, ratios)
+    return np.ascontiguousarray(words[..., 24:]).view(">u8")[..., 0].astype(np.int64)
+
+
+def _addresses(words):
+    # Unique 0x addresses of (n, 32) words, and the position of every row in them
+    raw = np.ascontiguousarray(words[:, 12:]).view("V20").ravel()
+    (unique, inverse) = np.unique(raw, return_inverse=True)
+    return ["0x" + bytes(u).hex() for u in unique], inverse
+
+
+def decode_logs(table, logs, timestamps, address_book):
+    # Raw eth_getLogs entries of one event to its columns. timestamps: {block: timestamp},
+    # address_book(addresses) returns the store indexes of a list of addresses
+    (_, indexed, data) = TABLES[table]
+    n = len(logs)
+    columns = {
+        "block": np.array([int(log["blockNumber"]) for log in logs], dtype=np.int64),
+        "log_index": np.array([int(log["logIndex"]) for log in logs], dtype=np.int32),
+    }
+    columns["timestamp"] = np.array([timestamps[b] for b in columns["block"].tolist()], dtype=np.int64)
+    (emitters, inverse) = np.unique([log["address"].lower() for log in logs], return_inverse=True)
+    columns["emitter"] = address_book(list(emitters))[inverse].astype(np.int32)
+
+    fields = []
+    if indexed:
+        topics = _words([b"".join(_topic(t) for t in log["topics"][1:len(indexed) + 1]).hex() for log in logs],
+                        len(indexed))
+        fields += [(name, kind, topics[:, i]) for (i, (name, kind)) in enumerate(indexed)]
+    if data:
+        words = _words([_hex(log["data"]) for log in logs], len(data))
+        fields += [(name, kind, words[:, i]) for (i, (name, kind)) in enumerate(data)]
+
+    for (name, kind, values) in fields:
+        if kind == "address":
+            (addresses, inverse) = _addresses(values)
+            columns[name] = address_book(addresses)[inverse].astype(np.int32)
+        elif kind == "uint":
+            columns[name] = _to_int(values)
+        else:
+            columns[name] = _to_float(values, signed=kind == "signed_amount")
+    assert all(len(c) == n for c in columns.values())
+    return columns
+
+
+def _hex(value):
+    return value if isinstance(value, str) else "0x" + bytes(value).hex()
+
+
+def _topic(value):
+    return bytes.fromhex(value[2:]) if isinstance(value, str) else bytes(value)
+
+
+def _write_json_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as fp:
+        json.dump(data, fp, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+class EventStore:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as fp:
+                self.meta = json.load(fp)
+            if self.meta.get("version") != STORE_VERSION:
+                raise ValueError(f"Unsupported event store version in {path}")
+        else:
+            self.meta = {
+                "version": STORE_VERSION,
+                "last_block": None,
+                "addresses": [],
+                "currencies": {},
+                "rows": {table: 0 for table in TABLES},
+            }
+        self._address_index = {a: i for (i, a) in enumerate(self.meta["addresses"])}
+        # Row counts of the tables appended to since the last commit
+        self._pending = {}
+
+    @property
+    def last_block(self):
+        return self.meta["last_block"]
+
+    def address_book(self, addresses):
+        # Store indexes of addresses, new ones are added to the book
+        indexes = []
+        for address in addresses:
+            address = address.lower()
+            if address not in self._address_index:
+                self._address_index[address] = len(self.meta["addresses"])
+                self.meta["addresses"].append(address)
+            indexes.append(self._address_index[address])
+        return np.array(indexes, dtype=np.int64)
+
+    def address_of(self, index):
+        return self.meta["addresses"][index]
+
+    def index_of(self, address):
+        return self._address_index.get(address.lower(), -1)
+
+    def set_currency(self, strategy, currency_id):
+        self.meta["currencies"][strategy.lower()] = int(currency_id)
+
+    def _column_path(self, table, column):
+        return os.path.join(self.path, table, f"{column}.bin")
+
+    def append(self, table, columns):
+        # Appends decoded columns, visible once commit() is called
+        os.makedirs(os.path.join(self.path, table), exist_ok=True)
+        # Rows written so far: the committed ones and the appends waiting for the next commit
+        rows = self._pending.get(table, self.meta["rows"][table])
+        for (column, dtype) in schema(table).items():
+            values = np.ascontiguousarray(columns[column], dtype=dtype)
+            path = self._column_path(table, column)
+            with open(path, "ab") as fp:
+                # Drops what an interrupted sync wrote past those rows
+                fp.truncate(rows * np.dtype(dtype).itemsize)
+                fp.write(values.tobytes())
+        self._pending[table] = rows + len(columns["block"])
+
+    def commit(self, last_block):
+        for (table, rows) in self._pending.items():
+            self.meta["rows"][table] = rows
+        self._pending = {}
+        self.meta["last_block"] = int(last_block)
+        _write_json_atomic(os.path.join(self.path, "meta.json"), self.meta)
+
+    def table(self, table):
+        # {column: read-only memory-mapped array} of the committed rows
+        rows = self.meta["rows"][table]
+        columns = {}
+        for (column, dtype) in schema(table).items():
+            path = self._column_path(table, column)
+            if rows == 0 or not os.path.exists(path):
+                columns[column] = np.zeros(0, dtype=dtype)
+            else:
+                columns[column] = np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+        return columns
+
+    # QUERIES
+
+    def _strategy_column(self, table):
+        return {"harvested": "emitter", "strategy_reported": "strategy", "lend_borrow_trade": "account"}[table]
+
+    def select(self, table, strategy=None, currency=None, start=None, end=None):
+        # Rows of a table, optionally for one strategy, the strategies of a currency and a
+        # [start, end) timestamp range, in chain order
+        columns = self.table(table)
+        mask = np.ones(len(columns["block"]), dtype=bool)
+        owners = columns[self._strategy_column(table)]
+        if strategy is not None:
+            mask &= owners == self.index_of(strategy)
+        if currency is not None:
+            strategies = [self.index_of(s) for (s, c) in self.meta["currencies"].items() if c == currency]
+            mask &= np.isin(owners, strategies)
+        if start is not None:
+            mask &= columns["timestamp"] >= start
+        if end is not None:
+            mask &= columns["timestamp"] < end
+        order = np.lexsort((columns["log_index"][mask], columns["block"][mask]))
+        return {name: np.asarray(values[mask])[order] for (name, values) in columns.items()}
+
+    def series(self, table, column, strategy=None, currency=None, cumulative=False):
+        # (timestamps, values) of one column over time, e.g. profit of a strategy or total_debt of
+        # a currency's strategies
+        rows = self.select(table, strategy, currency)
+        values = rows[column]
+        return rows["timestamp"], np.cumsum(values) if cumulative else values
+
+    def realised_returns(self, strategy=None, currency=None):
+        # Every StrategyReported with the return it realised over the time since the previous
+        # report of the strategy, and the maturity the strategy was lent to over that time (its
+        # last lend before the report). apr is annualised over Notional's 360 day year
+        reports = self.select("strategy_reported", strategy, currency)
+        trades = self.select("lend_borrow_trade", strategy, currency)
+        n = len(reports["block"])
+        owners = reports["strategy"]
+
+        # Previous report of the same strategy
+        order = np.lexsort((reports["log_index"], reports["block"], owners))
+        previous = np.full(n, -1)
+        same = owners[order][1:] == owners[order][:-1]
+        previous[order[1:][same]] = order[:-1][same]
+        has_previous = previous >= 0
+
+        debt = np.where(has_previous, reports["total_debt"][previous], np.nan)
+        elapsed = np.where(has_previous, reports["timestamp"] - reports["timestamp"][previous], 0)
+        net = reports["gain"] - reports["loss"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            apr = np.where(has_previous & (debt > 0) & (elapsed > 0), net / debt * YEAR / elapsed, np.nan)
+
+        # Last lend of the strategy before each report, by (block, log index)
+        maturity = np.zeros(n, dtype=np.int64)
+        lends = trades["net_fcash"] > 0
+        report_key = reports["block"] * (1 << 20) + reports["log_index"]
+        trade_key = trades["block"] * (1 << 20) + trades["log_index"]
+        for owner in np.unique(owners):
+            rows = owners == owner
+            owned = lends & (trades["account"] == owner)
+            last = np.searchsorted(trade_key[owned], report_key[rows]) - 1
+            maturity[rows] = np.where(last >= 0, trades["maturity"][owned][np.maximum(last, 0)], 0)
+
+        return {
+            "timestamp": reports["timestamp"],
+            "strategy": owners,
+            "maturity": maturity,
+            "net": net,
+            "debt": debt,
+            "elapsed": elapsed,
+            "apr": apr,
+        }
+
+    def apr_by_maturity(self, strategy=None, currency=None):
+        # Realised APR per maturity: net result over debt-time of all the reports in that maturity
+        returns = self.realised_returns(strategy, currency)
+        valid = ~np.isnan(returns["apr"]) & (returns["maturity"] > 0)
+        (maturities, inverse) = np.unique(returns["maturity"][valid], return_inverse=True)
+        net = np.bincount(inverse, weights=returns["net"][valid], minlength=len(maturities))
+        debt_time = np.bincount(
+            inverse, weights=returns["debt"][valid] * returns["elapsed"][valid], minlength=len(maturities)
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return {"maturity": maturities, "apr": net / debt_time * YEAR, "net": net}
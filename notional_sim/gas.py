@@ -0,0 +1,62 @@
+import json
+import os
+
+from .constants import HARVEST_GAS, SETTLE_GAS, TRADE_GAS
+
+# Gas estimates of the strategy's harvests, shared by the sweep (gas charged to every grid point)
+# and the keeper (gas that prices harvestTrigger's callCostInWei). They are derived from the
+# baselines tests/test_gas.py records
+#
+#   brownie test tests/test_gas.py --gas-benchmark --gas-update
+#
+# in tests/gas_baselines.json ({network: {path: {currency symbol: gas_used}}}), and fall back to
+# the constants of notional_sim.constants for what is not recorded:
+#   harvest: the "idle" path, a harvest that neither trades nor settles (tests/test_gas.py checks it
+#            emits no LendBorrowTrade)
+#   trade: "lend" minus "idle"
+#   settle: "settle_withdraw" minus "idle"
+# Each is the highest over the recorded currencies, so that one estimate covers every clone. "idle"
+# also values the position "lend" opens, so the differences are floored at 0.
+
+BASELINES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "tests", "gas_baselines.json")
+NETWORK = "mainnet-fork"
+
+
+def load_baselines(path=BASELINES, network=NETWORK):
+    # {path: {currency: gas_used}} recorded on the network, empty without a baselines file
+    if not os.path.exists(path):
+        return {}
+    with open(path) as fp:
+        return json.load(fp).get("baselines", {}).get(network, {})
+
+
+def _highest(baselines, path, base=None):
+    # Highest gas of the path over the currencies, minus the base path's gas of the same currency (at
+    # least 0)
+    costs = [
+        max(0, gas - (0 if base is None else baselines[base][currency]))
+        for (currency, gas) in baselines.get(path, {}).items()
+        if base is None or currency in baselines.get(base, {})
+    ]
+    return max(costs) if costs else None
+
+
+def harvest_costs(baselines=None):
+    # {"harvest", "trade", "settle"} gas
+    baselines = load_baselines() if baselines is None else baselines
+    costs = {
+        "harvest": _highest(baselines, "idle"),
+        "trade": _highest(baselines, "lend", base="idle"),
+        "settle": _highest(baselines, "settle_withdraw", base="idle"),
+    }
+    defaults = {"harvest": HARVEST_GAS, "trade": TRADE_GAS, "settle": SETTLE_GAS}
+    return {name: defaults[name] if gas is None else gas for (name, gas) in costs.items()}
+
+
+def max_harvest_gas(baselines=None):
+    # Upper bound of a harvest's gas: the most expensive recorded path, and at least a harvest that
+    # settles and rolls over (closing the matured position and lending again is two trades)
+    baselines = load_baselines() if baselines is None else baselines
+    costs = harvest_costs(baselines)
+    recorded = [gas for path in baselines.values() for gas in path.values()]
+    return max([costs["harvest"] + costs["settle"] + 2 * costs["trade"]] + recorded)
@@ -0,0 +1,123 @@
+import numpy as np
+
+from .constants import MAX_BPS, RATE_PRECISION, YEAR
+
+# Liquidation planning for the strategy's fCash positions, priced with MarketModel.
+#
+# Closing fCash before maturity returns less cash than its fair value at the market's oracle rate;
+# the difference (slippage and fees) is what a liquidation realises as loss. liquidatePosition
+# closes positions greedily in portfolio (maturity) order, fully, until the last one is closed
+# partially. optimal_plan instead spreads the amount over all positions to realise the least
+# slippage: every position is cut into slices, the cumulative cash of every slice boundary is
+# priced in one batched call, and the slices are taken by decreasing cash per unit of fair value
+# (concave cash curves make this optimal up to the slice size). compare() runs both:
+#
+#   plans = compare(portfolio, model, 2, chain.time(), amount, strategy.DECIMALS_DIFFERENCE())
+#   plans["gap"]   # extra slippage of the contract's greedy choice, in want
+
+SLICES = 64
+
+
+def _positions(portfolio, model, currency_id, block_time):
+    # (maturities, notionals, market indexes, fair values) of a [(maturity, notional)] portfolio,
+    # sorted by maturity like getAccountPortfolio. Amounts in Notional's 8 decimals
+    portfolio = sorted(portfolio)
+    maturities = np.array([p[0] for p in portfolio], dtype=float)
+    notionals = np.array([p[1] for p in portfolio], dtype=float)
+    market_maturities = model._maturity[currency_id]
+    matches = market_maturities[None, :] == maturities[:, None]
+    market_indexes = np.where(matches.any(axis=1), matches.argmax(axis=1) + 1, 0)
+    oracle_rates = np.where(market_indexes > 0, model._oracle_rate[currency_id][market_indexes - 1], 0)
+    time_to_maturity = np.maximum(maturities - block_time, 0)
+    fair = notionals * np.exp(-oracle_rates / RATE_PRECISION * time_to_maturity / YEAR)
+    return maturities, notionals, market_indexes, fair
+
+
+def _cash(model, currency_id, fcash, market_indexes, maturities, block_time):
+    # Cash from closing fcash of each position: 1:1 once matured, market price otherwise, nan if the
+    # trade fails
+    (_, underlying) = model.batch_cash_given_fcash(currency_id, -fcash, market_indexes, block_time)
+    return np.where(maturities < block_time, fcash, np.where(fcash == 0, 0, underlying))
+
+
+def _result(fcash, cash, fair_per_fcash, maturities, decimals_difference):
+    fair = fcash * fair_per_fcash
+    to_want = decimals_difference / MAX_BPS
+    return {
+        "maturities": maturities.astype(np.int64),
+        "fcash": fcash,
+        "cash": float(np.nansum(cash)) * to_want,
+        "fair_value": float(fair.sum()) * to_want,
+        "slippage": float(np.nansum(fair - cash)) * to_want,
+        "feasible": not np.any(np.isnan(cash)),
+    }
+
+
+def greedy_plan(portfolio, model, currency_id, block_time, amount, decimals_difference):
+    # liquidatePosition's loop: close positions in order, the last one only as much as needed
+    # (getfCashAmountGivenCashAmount of the remaining amount + 1). amount is in want, the
+    # amountToLiquidate left after the proportional losses are taken off
+    (maturities, notionals, market_indexes, fair) = _positions(portfolio, model, currency_id, block_time)
+    fcash = np.zeros(len(notionals))
+    full_cash = _cash(model, currency_id, notionals, market_indexes, maturities, block_time)
+    remaining = amount
+    to_want = decimals_difference / MAX_BPS
+    for i in range(len(notionals)):
+        if remaining <= 0:
+            break
+        position = np.floor(np.nan_to_num(full_cash[i])) * to_want
+        if position > remaining:
+            needed = remaining * MAX_BPS // decimals_difference + 1
+            fcash[i] = -model.batch_fcash_given_cash(currency_id, needed, market_indexes[i], block_time)
+            if maturities[i] < block_time:
+                fcash[i] = needed
+            break
+        fcash[i] = notionals[i]
+        remaining -= position
+    cash = _cash(model, currency_id, fcash, market_indexes, maturities, block_time)
+    return _result(fcash, cash, fair / notionals, maturities, decimals_difference)
+
+
+def optimal_plan(portfolio, model, currency_id, block_time, amount, decimals_difference, slices=SLICES):
+    # The fCash to close in every position raising amount (want) with the least slippage
+    (maturities, notionals, market_indexes, fair) = _positions(portfolio, model, currency_id, block_time)
+    n = len(notionals)
+    fair_per_fcash = fair / notionals
+
+    # Cumulative cash at every slice boundary of every position, one batch
+    boundaries = notionals[:, None] * np.linspace(0, 1, slices + 1)[None, :]
+    cumulative = _cash(
+        model, currency_id, boundaries.ravel(), np.repeat(market_indexes, slices + 1),
+        np.repeat(maturities, slices + 1), block_time,
+    ).reshape(n, slices + 1)
+    # A slice that cannot trade stops its position there
+    cumulative = np.where(np.isnan(cumulative), -np.inf, cumulative)
+    cumulative = np.maximum.accumulate(cumulative, axis=1)
+    slice_cash = np.diff(cumulative, axis=1)
+    slice_cash = np.where(np.isfinite(slice_cash), slice_cash, 0)
+    slice_fcash = np.diff(boundaries, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        efficiency = slice_cash / (slice_fcash * fair_per_fcash[:, None])
+    efficiency = np.where(slice_cash > 0, efficiency, -np.inf)
+
+    # Slices by decreasing efficiency, the last one taken partially
+    order = np.argsort(-efficiency, axis=None, kind="stable")
+    target = amount * MAX_BPS / decimals_difference
+    ordered_cash = slice_cash.ravel()[order]
+    taken_cash = np.cumsum(ordered_cash)
+    # Not enough cash in the portfolio: everything is closed
+    count = min(int(np.searchsorted(taken_cash, target)) + 1, len(order))
+    fraction = np.zeros(n * slices)
+    fraction[order[:count]] = 1.0
+    before = taken_cash[count - 2] if count > 1 else 0
+    if ordered_cash[count - 1] > 0:
+        fraction[order[count - 1]] = min(1.0, (target - before) / ordered_cash[count - 1])
+    fcash = (fraction.reshape(n, slices) * slice_fcash).sum(axis=1)
+    cash = _cash(model, currency_id, fcash, market_indexes, maturities, block_time)
+    return _result(fcash, cash, fair_per_fcash, maturities, decimals_difference)
+
+
+def compare(portfolio, model, currency_id, block_time, amount, decimals_difference, slices=SLICES):
+    greedy = greedy_plan(portfolio, model, currency_id, block_time, amount, decimals_difference)
+    optimal = optimal_plan(portfolio, model, currency_id, block_time, amount, decimals_difference, slices)
+    return {"greedy": greedy, "optimal": optimal, "gap": greedy["slippage"] - optimal["slippage"]}
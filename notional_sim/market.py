@@ -0,0 +1,347 @@
+import numpy as np
+
+from .constants import (
+    ASSET_RATE_DECIMAL_DIFFERENCE,
+    BASIS_POINT,
+    IMPLIED_RATE_TIME,
+    MAX_MARKET_PROPORTION,
+    PERCENTAGE_DECIMALS,
+    RATE_PRECISION,
+)
+from .types import decode_markets
+
+# Off-chain model of Notional V2's fCash AMM (Market.sol), vectorized with numpy.
+# Cash and fCash amounts are in Notional's internal 8 decimal precision, rates in RATE_PRECISION.
+# Notional computes exp/ln with 64x64 fixed point and truncating integer divisions, so results
+# match the on-chain views up to rounding. Failed trades come back as nan instead of reverting.
+
+
+def exchange_rate_from_implied_rate(implied_rate, time_to_maturity):
+    return np.exp(
+        np.asarray(implied_rate, dtype=float) / RATE_PRECISION * time_to_maturity / IMPLIED_RATE_TIME
+    ) * RATE_PRECISION
+
+
+def implied_rate_from_exchange_rate(exchange_rate, time_to_maturity):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.log(np.asarray(exchange_rate, dtype=float) / RATE_PRECISION) \
+            * RATE_PRECISION * IMPLIED_RATE_TIME / time_to_maturity
+
+
+def rate_scalar(scalar, time_to_maturity):
+    # Cash group rate scalars are stored as uint8 and scaled by the time to maturity
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.asarray(scalar, dtype=float) * RATE_PRECISION * IMPLIED_RATE_TIME / time_to_maturity
+
+
+def _log_proportion(proportion):
+    # ln(p / (1 - p)) in RATE_PRECISION, nan if the proportion is outside of (0, 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = np.log(proportion / (RATE_PRECISION - proportion)) * RATE_PRECISION
+    return np.where((proportion > 0) & (proportion < RATE_PRECISION), result, np.nan)
+
+
+def rate_anchor(total_fcash, last_implied_rate, total_cash, scalar, time_to_maturity):
+    new_exchange_rate = exchange_rate_from_implied_rate(last_implied_rate, time_to_maturity)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        proportion = total_fcash * RATE_PRECISION / (total_fcash + total_cash)
+        anchor = new_exchange_rate - _log_proportion(proportion) * RATE_PRECISION / scalar
+    return np.where(new_exchange_rate >= RATE_PRECISION, anchor, np.nan)
+
+
+def exchange_rate(total_fcash, total_cash, scalar, anchor, fcash_to_account):
+    numerator = total_fcash - fcash_to_account
+    with np.errstate(divide="ignore", invalid="ignore"):
+        proportion = numerator * RATE_PRECISION / (total_fcash + total_cash)
+        rate = _log_proportion(proportion) * RATE_PRECISION / scalar + anchor
+    valid = (numerator >= 0) & (proportion <= MAX_MARKET_PROPORTION) & (rate >= RATE_PRECISION)
+    return np.where(valid, rate, np.nan)
+
+
+def implied_rate(total_fcash, total_cash, scalar, anchor, time_to_maturity):
+    rate = implied_rate_from_exchange_rate(
+        exchange_rate(total_fcash, total_cash, scalar, anchor, 0), time_to_maturity
+    )
+    # Implied rates over uint32 overflow on chain
+    return np.where(rate <= 2 ** 32 - 1, rate, np.nan)
+
+
+def net_cash_amounts(pre_fee_exchange_rate, fcash_to_account, time_to_maturity, total_fee_bps,
+    reserve_fee_share):
+    # Returns (netCashToAccount, netCashToMarket, netCashToReserve) after fees, as in
+    # Market._getNetCashAmountsUnderlying
+    pre_fee_cash_to_account = -(fcash_to_account * RATE_PRECISION / pre_fee_exchange_rate)
+    fee_rate = exchange_rate_from_implied_rate(total_fee_bps * BASIS_POINT, time_to_maturity)
+    lending = fcash_to_account > 0
+    # Fees can push the lending exchange rate below 1, the trade fails in that case
+    post_fee_exchange_rate = pre_fee_exchange_rate * RATE_PRECISION / fee_rate
+    fee = np.where(
+        lending,
+        pre_fee_cash_to_account * (RATE_PRECISION - fee_rate) / RATE_PRECISION,
+        -(pre_fee_cash_to_account * (RATE_PRECISION - fee_rate) / fee_rate),
+    )
+    fee = np.where(lending & (post_fee_exchange_rate < RATE_PRECISION), np.nan, fee)
+    cash_to_reserve = fee * reserve_fee_share / PERCENTAGE_DECIMALS
+    cash_to_account = pre_fee_cash_to_account - fee
+    return cash_to_account, -(cash_to_account + cash_to_reserve), cash_to_reserve
+
+
+def calculate_trade(total_fcash, total_cash, last_implied_rate, scalar, time_to_maturity,
+    fcash_to_account, total_fee_bps, reserve_fee_share):
+    # Underlying cash side of Market.calculateTrade. Returns (netCashToAccount, netCashToReserve,
+    # newImpliedRate), all nan where the trade would fail
+    total_fcash, total_cash, fcash_to_account = np.broadcast_arrays(
+        np.asarray(total_fcash, dtype=float),
+        np.asarray(total_cash, dtype=float),
+        np.asarray(fcash_to_account, dtype=float),
+    )
+    scalar = rate_scalar(scalar, time_to_maturity)
+    anchor = rate_anchor(total_fcash, last_implied_rate, total_cash, scalar, time_to_maturity)
+    pre_fee_rate = exchange_rate(total_fcash, total_cash, scalar, anchor, fcash_to_account)
+    cash_to_account, cash_to_market, cash_to_reserve = net_cash_amounts(
+        pre_fee_rate, fcash_to_account, time_to_maturity, total_fee_bps, reserve_fee_share
+    )
+    new_rate = implied_rate(
+        total_fcash - fcash_to_account, total_cash + cash_to_market, scalar, anchor, time_to_maturity
+    )
+    failed = (
+        (total_fcash - fcash_to_account <= 0)
+        | (cash_to_account == 0)
+        | np.isnan(new_rate)
+        | (new_rate == 0)
+        | ~(np.asarray(time_to_maturity) > 0)
+    )
+    return (
+        np.where(failed, np.nan, cash_to_account),
+        np.where(failed, np.nan, cash_to_reserve),
+        np.where(failed, np.nan, new_rate),
+    )
+
+
+def fcash_given_cash(total_fcash, total_cash, last_implied_rate, scalar, time_to_maturity,
+    net_cash_to_account, total_fee_bps, max_iterations=250, rel_tolerance=1e-12):
+    # Newton's method from Market.getfCashGivenCashAmount, run on every element at once.
+    # Elements that fail (invalid rates or no convergence) are nan, they revert on chain
+    total_fcash, total_cash, cash = np.broadcast_arrays(
+        np.asarray(total_fcash, dtype=float),
+        np.asarray(total_cash, dtype=float),
+        np.asarray(net_cash_to_account, dtype=float),
+    )
+    scalar = np.broadcast_to(rate_scalar(scalar, time_to_maturity), cash.shape)
+    anchor = np.broadcast_to(
+        rate_anchor(total_fcash, last_implied_rate, total_cash, scalar, time_to_maturity), cash.shape
+    )
+    fee_rate = np.broadcast_to(
+        exchange_rate_from_implied_rate(
+            np.asarray(total_fee_bps, dtype=float) * BASIS_POINT, time_to_maturity
+        ),
+        cash.shape,
+    )
+
+    shape = cash.shape
+    total_fcash, total_cash, cash, scalar, anchor, fee_rate = (
+        np.ravel(a) for a in (total_fcash, total_cash, cash, scalar, anchor, fee_rate)
+    )
+
+    guess = -(cash * anchor / RATE_PRECISION)
+    active = ~np.isnan(guess)
+    converged = np.zeros(cash.shape, dtype=bool)
+    for _ in range(max_iterations):
+        if not active.any():
+            break
+        tf, tc, g, c = total_fcash[active], total_cash[active], guess[active], cash[active]
+        fee = fee_rate[active]
+        rate = exchange_rate(tf, tc, scalar[active], anchor[active], g)
+        lending = g > 0
+        # f(fCash) = cash * exchangeRate (after fees) + fCash
+        post_fee_rate = np.where(lending, rate * RATE_PRECISION / fee, rate * fee / RATE_PRECISION)
+        fee_factor = np.where(lending, RATE_PRECISION / fee, fee / RATE_PRECISION)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            derivative = 1 - c * (tf + tc) * fee_factor / (
+                scalar[active] / RATE_PRECISION * (tf - g) * (tc + g)
+            )
+            delta = (c * post_fee_rate / RATE_PRECISION + g) / derivative
+        delta = np.where(post_fee_rate >= RATE_PRECISION, delta, np.nan)
+
+        idx = np.flatnonzero(active)
+        done = np.abs(delta) <= np.maximum(1.0, np.abs(g) * rel_tolerance)
+        failed = np.isnan(delta)
+        converged[idx[done]] = True
+        guess[idx[failed]] = np.nan
+        guess[idx] = np.where(done | failed, guess[idx], g - delta)
+        active[idx[done | failed]] = False
+
+    return np.where(converged, guess, np.nan).reshape(shape)
+
+
+def convert_to_underlying(asset_cash, asset_rate, underlying_decimals):
+    return asset_cash * asset_rate / ASSET_RATE_DECIMAL_DIFFERENCE / underlying_decimals
+
+
+def convert_from_underlying(underlying_cash, asset_rate, underlying_decimals):
+    return underlying_cash * ASSET_RATE_DECIMAL_DIFFERENCE * underlying_decimals / asset_rate
+
+
+class MarketModel:
+    """
+    Drop-in for the Notional views used by the strategy and the tests, priced off-chain from a
+    snapshot of the markets. Scalar calls mirror the views; the batch_* functions take arrays of
+    (currencyID, marketIndex, amount, blockTime) and price all of them in one go.
+
+    markets: {currencyID: [MarketParameters as returned by getActiveMarkets, see notional_sim.types]}
+    cash_groups: {currencyID: {"rate_scalars", "total_fee_bps", "reserve_fee_share", "asset_rate",
+                               "underlying_decimals"}}
+    """
+
+    def __init__(self, markets, cash_groups):
+        self.markets = {int(c): decode_markets(ms) for c, ms in markets.items()}
+        self.cash_groups = {int(c): dict(cg) for c, cg in cash_groups.items()}
+        self._build_tables()
+
+    @classmethod
+    def from_views(cls, n_proxy_views, currency_ids, block_identifier=None):
+        # Snapshot the markets and cash groups of a (forked) Notional deployment, at the latest block
+        # unless block_identifier is given
+        markets = {}
+        cash_groups = {}
+        for currency_id in currency_ids:
+            markets[currency_id] = decode_markets(
+                n_proxy_views.getActiveMarkets(currency_id, block_identifier=block_identifier)
+            )
+            (settings, asset_rate) = n_proxy_views.getCashGroupAndAssetRate(
+                currency_id, block_identifier=block_identifier
+            )
+            cash_groups[currency_id] = {
+                "rate_scalars": [int(s) for s in settings[10]],
+                "total_fee_bps": int(settings[2]),
+                "reserve_fee_share": int(settings[3]),
+                "asset_rate": int(asset_rate[1]),
+                "underlying_decimals": int(asset_rate[2]),
+            }
+        return cls(markets, cash_groups)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            {int(c): ms for c, ms in data["markets"].items()},
+            {int(c): cg for c, cg in data["cash_groups"].items()},
+        )
+
+    def to_dict(self):
+        return {
+            "markets": {
+                str(c): [[v.hex() if isinstance(v, bytes) else v for v in m] for m in ms]
+                for c, ms in self.markets.items()
+            },
+            "cash_groups": {str(c): cg for c, cg in self.cash_groups.items()},
+        }
+
+    def _build_tables(self):
+        # Pad every currency to the same number of markets so lookups are a single fancy index
+        n_currencies = max(list(self.markets) + list(self.cash_groups) + [0]) + 1
+        n_markets = max([len(ms) for ms in self.markets.values()] + [1])
+        shape = (n_currencies, n_markets)
+        self._maturity = np.full(shape, np.nan)
+        self._total_fcash = np.full(shape, np.nan)
+        self._total_asset_cash = np.full(shape, np.nan)
+        self._last_implied_rate = np.full(shape, np.nan)
+        self._oracle_rate = np.full(shape, np.nan)
+        self._scalar = np.full(shape, np.nan)
+        self._fee_bps = np.full(n_currencies, np.nan)
+        self._reserve_share = np.full(n_currencies, np.nan)
+        self._asset_rate = np.full(n_currencies, np.nan)
+        self._underlying_decimals = np.full(n_currencies, np.nan)
+
+        for currency_id, markets in self.markets.items():
+            for i, market in enumerate(markets):
+                self._maturity[currency_id, i] = market.maturity
+                self._total_fcash[currency_id, i] = market.total_fcash
+                self._total_asset_cash[currency_id, i] = market.total_asset_cash
+                self._last_implied_rate[currency_id, i] = market.last_implied_rate
+                self._oracle_rate[currency_id, i] = market.oracle_rate
+        for currency_id, cash_group in self.cash_groups.items():
+            scalars = cash_group["rate_scalars"][:n_markets]
+            self._scalar[currency_id, :len(scalars)] = scalars
+            self._fee_bps[currency_id] = cash_group["total_fee_bps"]
+            self._reserve_share[currency_id] = cash_group["reserve_fee_share"]
+            self._asset_rate[currency_id] = cash_group["asset_rate"]
+            self._underlying_decimals[currency_id] = cash_group["underlying_decimals"]
+        self._total_cash = convert_to_underlying(
+            self._total_asset_cash, self._asset_rate[:, None], self._underlying_decimals[:, None]
+        )
+
+    def _lookup(self, currency_ids, market_indexes):
+        currency_ids = np.asarray(currency_ids, dtype=int)
+        market_indexes = np.asarray(market_indexes, dtype=int)
+        valid = (
+            (currency_ids >= 0) & (currency_ids < self._maturity.shape[0])
+            & (market_indexes >= 1) & (market_indexes <= self._maturity.shape[1])
+        )
+        c = np.where(valid, currency_ids, 0)
+        m = np.where(valid, market_indexes - 1, 0)
+
+        def take(table):
+            return np.where(valid, table[c, m], np.nan)
+
+        def take_currency(table):
+            return np.where(valid, table[c], np.nan)
+
+        return {
+            "maturity": take(self._maturity),
+            "total_fcash": take(self._total_fcash),
+            "total_cash": take(self._total_cash),
+            "last_implied_rate": take(self._last_implied_rate),
+            "oracle_rate": take(self._oracle_rate),
+            "scalar": take(self._scalar),
+            "fee_bps": take_currency(self._fee_bps),
+            "reserve_share": take_currency(self._reserve_share),
+            "asset_rate": take_currency(self._asset_rate),
+            "underlying_decimals": take_currency(self._underlying_decimals),
+        }
+
+    def batch_cash_given_fcash(self, currency_ids, fcash_amounts, market_indexes, block_times):
+        # Vectorized getCashAmountGivenfCashAmount: returns (assetCash, underlyingCash) arrays
+        currency_ids, fcash_amounts, market_indexes, block_times = np.broadcast_arrays(
+            currency_ids, np.asarray(fcash_amounts, dtype=float), market_indexes,
+            np.asarray(block_times, dtype=float)
+        )
+        p = self._lookup(currency_ids, market_indexes)
+        time_to_maturity = p["maturity"] - block_times
+        underlying, _, _ = calculate_trade(
+            p["total_fcash"], p["total_cash"], p["last_implied_rate"], p["scalar"],
+            time_to_maturity, fcash_amounts, p["fee_bps"], p["reserve_share"]
+        )
+        asset = convert_from_underlying(underlying, p["asset_rate"], p["underlying_decimals"])
+        return asset, underlying
+
+    def batch_fcash_given_cash(self, currency_ids, cash_amounts, market_indexes, block_times):
+        # Vectorized getfCashAmountGivenCashAmount
+        currency_ids, cash_amounts, market_indexes, block_times = np.broadcast_arrays(
+            currency_ids, np.asarray(cash_amounts, dtype=float), market_indexes,
+            np.asarray(block_times, dtype=float)
+        )
+        p = self._lookup(currency_ids, market_indexes)
+        time_to_maturity = p["maturity"] - block_times
+        fcash = fcash_given_cash(
+            p["total_fcash"], p["total_cash"], p["last_implied_rate"], p["scalar"],
+            time_to_maturity, cash_amounts, p["fee_bps"]
+        )
+        return np.where(time_to_maturity > 0, fcash, np.nan)
+
+    # Scalar drop-ins for the views
+
+    def getActiveMarkets(self, currencyID):
+        return list(self.markets.get(int(currencyID), []))
+
+    def getfCashAmountGivenCashAmount(self, currencyID, netCashToAccount, marketIndex, blockTime):
+        fcash = self.batch_fcash_given_cash(currencyID, netCashToAccount, marketIndex, blockTime)
+        if np.isnan(fcash):
+            raise ValueError("Invalid trade")
+        return int(fcash)
+
+    def getCashAmountGivenfCashAmount(self, currencyID, fCashAmount, marketIndex, blockTime):
+        asset, underlying = self.batch_cash_given_fcash(currencyID, fCashAmount, marketIndex, blockTime)
+        if np.isnan(underlying):
+            # Views return zeros when the trade fails
+            return (0, 0)
+        return (int(asset), int(underlying))
@@ -0,0 +1,33 @@
+import json
+
+# JSON-RPC batches over the HTTP provider brownie is connected to: many requests sent in one POST
+# (in chunks of BATCH_SIZE), with the responses back in request order. The test suite's cassette
+# records and replays them request by request (tests/utils/cassette.py).
+#
+#   responses = rpc.batch(web3.provider, [("eth_getBlockByNumber", [hex(b), False]) for b in blocks])
+#   blocks = rpc.results(responses)
+
+BATCH_SIZE = 1000
+
+
+def batch(provider, requests, batch_size=BATCH_SIZE):
+    # requests: [(method, params)], returns one response dict per request
+    from web3._utils.request import make_post_request
+
+    responses = []
+    for start in range(0, len(requests), batch_size):
+        chunk = requests[start:start + batch_size]
+        payload = [{"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+                   for (i, (method, params)) in enumerate(chunk)]
+        raw = make_post_request(provider.endpoint_uri, json.dumps(payload).encode(), **provider.get_request_kwargs())
+        by_id = {response["id"]: response for response in json.loads(raw)}
+        responses.extend(by_id[i] for i in range(len(chunk)))
+    return responses
+
+
+def results(responses):
+    # Results of the responses, raising ValueError on the first error like web3 does
+    for response in responses:
+        if "error" in response:
+            raise ValueError(response["error"])
+    return [response["result"] for response in responses]
@@ -0,0 +1,141 @@
+import itertools
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .backtest import SimulatedMarkets, run_path, simulate_rate_paths
+from .constants import DAY, FCASH_SCALING, QUARTER, YEAR
+from .gas import harvest_costs
+from .market import MarketModel
+
+# Grid search over the strategy's knobs (setMinTimeToMaturity, setMinAmountWant and the
+# FCASH_SCALING constant) with the backtester, across currencies and rate scenarios.
+#
+#   scenarios = {"calm": simulated_scenario(model, 2, 100, volatility=0.005),
+#                "shock": simulated_scenario(model, 2, 100, volatility=0.05)}
+#   rows = run_sweep(model, {2: scenarios}, deposit=100_000 * 10 ** 18, start_time=chain.time(),
+#                    min_time_to_maturity=[0, 30 * DAY, 60 * DAY], fcash_scaling=[9_990, 9_995, 9_999])
+#   print(format_table(rows))
+#
+# The pool runs one task per (currency, scenario): the markets of every step of every path are
+# built once in the task and copied by each grid point, instead of being rolled from the model
+# again for every point. Rows are ranked by net yield: the vault's annualised gain minus loss and
+# the estimated gas of the harvests, over the deposit.
+
+# Gas of a harvest, and what each trade and settlement adds to it, from the recorded gas baselines
+# (see notional_sim.gas)
+GAS = harvest_costs()
+
+
+def simulated_scenario(model, currency_id, n_paths, n_quarters=4, harvest_interval=7 * DAY,
+    mean_reversion=2.0, volatility=0.01, seed=0):
+    # rates[path, step, market] around the snapshot's implied rates
+    n_steps = int(n_quarters * QUARTER // harvest_interval)
+    initial_rates = [mk.last_implied_rate for mk in model.getActiveMarkets(currency_id)]
+    return simulate_rate_paths(initial_rates, n_paths, n_steps, harvest_interval, mean_reversion, volatility, rng=seed)
+
+
+def historical_scenario(rates):
+    # One path from observed implied rates, rates[step, market] (e.g. lastImpliedRate of every
+    # market at the harvest blocks, see notional_sim.curve)
+    return np.asarray(rates, dtype=float)[None, :, :]
+
+
+def _step_markets(model, currency_id, rates, start_time, harvest_interval):
+    # SimulatedMarkets of every step of a path, shared by all grid points
+    n_steps = len(rates)
+    return [
+        SimulatedMarkets.at_time(model, currency_id, start_time + step * harvest_interval,
+                                 rates[min(step, n_steps - 1)])
+        for step in range(n_steps + 1)
+    ]
+
+
+def _run_scenario(model_data, currency_id, scenario, rates, grid, start_time, deposit, harvest_interval,
+    withdraw_probability, realize_losses, seed):
+    model = MarketModel.from_dict(model_data)
+    paths = [_step_markets(model, currency_id, path, start_time, harvest_interval) for path in rates]
+    years = rates.shape[1] * harvest_interval / YEAR
+    rows = []
+    for (min_time_to_maturity, min_amount_want, fcash_scaling) in grid:
+        # The same withdrawals on every grid point
+        rng = np.random.default_rng(seed)
+        pnl = []
+        gas = []
+        reverted = []
+        for (path_rates, markets) in zip(rates, paths):
+            (vault, strategy, harvests, reverted_harvests) = run_path(
+                model, currency_id, path_rates, start_time, deposit, harvest_interval, withdraw_probability,
+                realize_losses, rng, markets=markets, min_time_to_maturity=min_time_to_maturity,
+                min_amount_want=min_amount_want, fcash_scaling=fcash_scaling,
+            )
+            pnl.append(vault.total_gain - vault.total_loss)
+            gas.append(harvests * GAS["harvest"] + strategy.trades * GAS["trade"] + strategy.settlements * GAS["settle"])
+            reverted.append(reverted_harvests)
+        rows.append({
+            "currency_id": currency_id,
+            "scenario": scenario,
+            "min_time_to_maturity": min_time_to_maturity,
+            "min_amount_want": min_amount_want,
+            "fcash_scaling": fcash_scaling,
+            "yield": float(np.mean(pnl)) / deposit / years,
+            "gas": float(np.mean(gas)),
+            "reverted": float(np.mean(reverted)),
+            "years": years,
+        })
+    return rows
+
+
+def run_sweep(model, scenarios, deposit, start_time, min_time_to_maturity=(30 * DAY,), min_amount_want=(0,),
+    fcash_scaling=(FCASH_SCALING,), harvest_interval=7 * DAY, withdraw_probability=0.0, realize_losses=False,
+    gas_price=0, want_per_eth=None, processes=None, seed=0):
+    """
+    Backtests every combination of min_time_to_maturity x min_amount_want x fcash_scaling on every
+    scenario of every currency. scenarios: {currencyID: {name: rates[path, step, market]}}.
+    Gas is charged at gas_price (wei) converted with want_per_eth ({currencyID: want per 1e18 wei}),
+    and not deducted for currencies missing from it. Returns rows ranked by net yield, best first.
+    """
+    grid = list(itertools.product(min_time_to_maturity, min_amount_want, fcash_scaling))
+    want_per_eth = dict(want_per_eth or {1: 10 ** 18})
+    tasks = []
+    for (currency_id, currency_scenarios) in scenarios.items():
+        for (name, rates) in currency_scenarios.items():
+            tasks.append((
+                model.to_dict(), currency_id, name, np.asarray(rates, dtype=float), grid, start_time, deposit,
+                harvest_interval, withdraw_probability, realize_losses, seed,
+            ))
+
+    if processes == 1:
+        chunks = [_run_scenario(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            chunks = list(pool.map(_run_scenario, *zip(*tasks)))
+
+    rows = [row for chunk in chunks for row in chunk]
+    for row in rows:
+        price = want_per_eth.get(row["currency_id"])
+        gas_cost = 0 if price is None else row["gas"] * gas_price * price / 10 ** 18
+        row["gas_cost"] = gas_cost
+        row["net_yield"] = row["yield"] - gas_cost / deposit / row.pop("years")
+    return sorted(rows, key=lambda row: -row["net_yield"] if not math.isnan(row["net_yield"]) else math.inf)
+
+
+def format_table(rows):
+    columns = ("currency_id", "scenario", "min_time_to_maturity", "min_amount_want", "fcash_scaling",
+               "net_yield", "yield", "gas", "reverted")
+    lines = ["  ".join(f"{c:>20}" for c in columns)]
+    for row in rows:
+        values = []
+        for c in columns:
+            value = row[c]
+            if c in ("net_yield", "yield"):
+                values.append(f"{value:>20.4%}")
+            elif c == "min_time_to_maturity":
+                values.append(f"{value / DAY:>19.0f}d")
+            elif isinstance(value, float):
+                values.append(f"{value:>20.1f}")
+            else:
+                values.append(f"{value:>20}")
+        lines.append("  ".join(values))
+    return "\n".join(lines)
@@ -0,0 +1,139 @@
+import numpy as np
+
+from .constants import BORROW, DEPOSIT_NONE, LEND, PURCHASE_NTOKEN_RESIDUAL
+
+# bytes32 trades for Notional's batchBalanceAndTradeAction, packed and unpacked for whole arrays at
+# once. A trade is held as 4 big-endian uint64 words (bits 255..192, 191..128, 127..64, 63..0), so
+# an array of n trades is an (n, 4) uint64 array and converting it to bytes is a single tobytes().
+#
+# Lend / Borrow, as Strategy.getTradeFrom packs them:
+#   tradeType << 248 | marketIndex << 240 | fCashAmount (uint88) << 152 | minSlippage (uint32) << 120
+# PurchaseNTokenResidual:
+#   tradeType << 248 | maturity (uint32) << 216 | fCashAmountToPurchase (int88) << 128
+#
+# fCash amounts are in Notional's 8 decimal precision and are handled as int64, which covers any
+# realistic position (over 9e10 tokens).
+
+MASK_8 = (1 << 8) - 1
+MASK_24 = (1 << 24) - 1
+MASK_32 = (1 << 32) - 1
+MASK_40 = (1 << 40) - 1
+MASK_48 = (1 << 48) - 1
+MASK_88 = (1 << 88) - 1
+
+
+def _u64(values):
+    return np.asarray(values, dtype=np.int64).astype(np.uint64)
+
+
+def _check_range(name, values, low, high):
+    values = np.asarray(values, dtype=np.int64)
+    if np.any(values < low) or np.any(values > high):
+        raise ValueError(f"{name} out of range [{low}, {high}]")
+
+
+def encode(trade_type, market_index, fcash, min_slippage=0):
+    # Lend / Borrow trades, arguments broadcast against each other. Returns an (n, 4) uint64 array
+    (trade_type, market_index, fcash, min_slippage) = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(v, dtype=np.int64)) for v in (trade_type, market_index, fcash, min_slippage))
+    )
+    _check_range("trade_type", trade_type, LEND, BORROW)
+    _check_range("market_index", market_index, 0, MASK_8)
+    _check_range("fcash", fcash, 0, np.iinfo(np.int64).max)
+    _check_range("min_slippage", min_slippage, 0, MASK_32)
+    fcash = _u64(fcash)
+    min_slippage = _u64(min_slippage)
+
+    words = np.zeros(fcash.shape + (4,), dtype=np.uint64)
+    words[..., 0] = (_u64(trade_type) << np.uint64(56)) | (_u64(market_index) << np.uint64(48)) | (
+        fcash >> np.uint64(40)
+    )
+    words[..., 1] = ((fcash & np.uint64(MASK_40)) << np.uint64(24)) | (min_slippage >> np.uint64(8))
+    words[..., 2] = (min_slippage & np.uint64(MASK_8)) << np.uint64(56)
+    return words
+
+
+def encode_lend(market_index, fcash, min_slippage=0):
+    return encode(LEND, market_index, fcash, min_slippage)
+
+
+def encode_borrow(market_index, fcash, min_slippage=0):
+    return encode(BORROW, market_index, fcash, min_slippage)
+
+
+def encode_ntoken_residual(maturity, fcash):
+    # PurchaseNTokenResidual trades, fcash is signed (negative to take on a negative residual)
+    (maturity, fcash) = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(v, dtype=np.int64)) for v in (maturity, fcash))
+    )
+    _check_range("maturity", maturity, 0, MASK_32)
+    # Sign extension of the int88 two's complement: its top 24 bits are all ones for negative amounts
+    sign = np.where(fcash < 0, np.uint64(MASK_24), np.uint64(0))
+
+    words = np.zeros(fcash.shape + (4,), dtype=np.uint64)
+    words[..., 0] = (
+        (np.uint64(PURCHASE_NTOKEN_RESIDUAL) << np.uint64(56)) | (_u64(maturity) << np.uint64(24)) | sign
+    )
+    words[..., 1] = fcash.astype(np.uint64)
+    return words
+
+
+def decode(words):
+    # Inverse of encode / encode_ntoken_residual for an (n, 4) array of any mix of trade types.
+    # Returns a dict of arrays, fields that do not apply to a trade type are 0
+    words = np.atleast_2d(np.asarray(words, dtype=np.uint64))
+    trade_type = (words[:, 0] >> np.uint64(56)).astype(np.int64)
+    residual = trade_type == PURCHASE_NTOKEN_RESIDUAL
+
+    market_index = ((words[:, 0] >> np.uint64(48)) & np.uint64(MASK_8)).astype(np.int64)
+    fcash = (((words[:, 0] & np.uint64(MASK_48)) << np.uint64(40)) | (words[:, 1] >> np.uint64(24))).astype(
+        np.int64
+    )
+    min_slippage = (
+        ((words[:, 1] & np.uint64(MASK_24)) << np.uint64(8)) | (words[:, 2] >> np.uint64(56))
+    ).astype(np.int64)
+    maturity = ((words[:, 0] >> np.uint64(24)) & np.uint64(MASK_32)).astype(np.int64)
+
+    return {
+        "trade_type": trade_type,
+        "market_index": np.where(residual, 0, market_index),
+        "maturity": np.where(residual, maturity, 0),
+        "fcash": np.where(residual, words[:, 1].astype(np.int64), fcash),
+        "min_slippage": np.where(residual, 0, min_slippage),
+    }
+
+
+def to_bytes(words):
+    # List of 32 byte trades, ready to be passed to brownie as bytes32[]
+    data = np.atleast_2d(np.asarray(words, dtype=np.uint64)).astype(">u8").tobytes()
+    return [data[i:i + 32] for i in range(0, len(data), 32)]
+
+
+def from_bytes(trades):
+    # bytes32 trades (bytes, or hex strings as returned by brownie) to an (n, 4) uint64 array
+    data = b"".join(bytes.fromhex(t[2:] if t.startswith("0x") else t) if isinstance(t, str) else bytes(t)
+                    for t in trades)
+    return np.frombuffer(data, dtype=">u8").astype(np.uint64).reshape(-1, 4)
+
+
+def get_trade_from(trade_type, market_index, amount):
+    # Strategy.getTradeFrom, including its uint8 / uint88 truncations, as a single bytes32. Packed with
+    # Python ints: the whole uint88 range, not only the int64 one of encode
+    trade = (trade_type & MASK_8) << 248 | (market_index & MASK_8) << 240 | (int(amount) & MASK_88) << 152
+    return trade.to_bytes(32, "big")
+
+
+def balance_action(currency_id, trades, action_type=DEPOSIT_NONE, deposit_amount=0, withdraw_amount=0,
+                   withdraw_entire_cash_balance=False, redeem_to_underlying=False):
+    # BalanceActionWithTrades struct, trades either bytes32s or an (n, 4) array from the encoders
+    if isinstance(trades, np.ndarray):
+        trades = to_bytes(trades)
+    return (
+        action_type,
+        currency_id,
+        deposit_amount,
+        withdraw_amount,
+        withdraw_entire_cash_balance,
+        redeem_to_underlying,
+        list(trades),
+    )
@@ -0,0 +1,217 @@
+import numpy as np
+
+# Records for the Notional structs the views return (interfaces/notional/Types.sol), decoded once
+# from brownie's ReturnValue (or any tuple) into __slots__ objects with named fields. They still
+# index like the tuples they come from, so account.context.next_settle_time and account[0][0]
+# are the same value.
+#
+#   account = Account.decode(n_proxy_views.getAccount(strategy))
+#   account.portfolio[0].notional
+#   markets = decode_markets(n_proxy_views.getActiveMarkets(currencyID))
+#
+# Histories go in the struct-of-arrays containers instead: one (n_snapshots, width) array per
+# field, zero padded with a `valid` mask, so thousands of snapshots are a few NumPy arrays.
+# Times, rates and ids are int64; market totals are float64 like in MarketModel (asset cash in
+# cToken units can outgrow int64).
+#
+#   history = MarketArrays.decode([n_proxy_views.getActiveMarkets(2, block_identifier=b) for b in blocks])
+#   history.oracle_rate[:, 0]
+
+
+def _bytes(value):
+    # bytesN fields, also from the hex strings of MarketModel.to_dict
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    return bytes(value)
+
+
+class _Record:
+    __slots__ = ()
+
+    def __init__(self, *values):
+        if len(values) != len(self.__slots__):
+            raise ValueError(f"{type(self).__name__} takes {len(self.__slots__)} fields, got {len(values)}")
+        for (name, value) in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def decode(cls, value):
+        return cls(*(int(v) for v in value))
+
+    def __getitem__(self, index):
+        return getattr(self, self.__slots__[index])
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __eq__(self, other):
+        return tuple(self) == tuple(other)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class AccountContext(_Record):
+    __slots__ = ("next_settle_time", "has_debt", "asset_array_length", "bitmap_currency_id", "active_currencies")
+
+    @classmethod
+    def decode(cls, value):
+        (next_settle_time, has_debt, asset_array_length, bitmap_currency_id, active_currencies) = value
+        return cls(int(next_settle_time), _bytes(has_debt), int(asset_array_length), int(bitmap_currency_id),
+                   _bytes(active_currencies))
+
+
+class PortfolioAsset(_Record):
+    __slots__ = ("currency_id", "maturity", "asset_type", "notional", "storage_slot", "storage_state")
+
+
+class MarketParameters(_Record):
+    __slots__ = ("storage_slot", "maturity", "total_fcash", "total_asset_cash", "total_liquidity",
+                 "last_implied_rate", "oracle_rate", "previous_trade_time")
+
+    @classmethod
+    def decode(cls, value):
+        (storage_slot, *fields) = value
+        return cls(_bytes(storage_slot), *(int(v) for v in fields))
+
+
+class Account(_Record):
+    # getAccount: (AccountContext, AccountBalance[], PortfolioAsset[]). Balances stay tuples of
+    # (currencyId, cashBalance, nTokenBalance, lastClaimTime, lastClaimIntegralSupply)
+    __slots__ = ("context", "balances", "portfolio")
+
+    @classmethod
+    def decode(cls, value):
+        (context, balances, portfolio) = value
+        return cls(AccountContext.decode(context), [tuple(int(v) for v in b) for b in balances],
+                   decode_portfolio(portfolio))
+
+    def fcash(self, currency_id):
+        # {maturity: notional} of the currency's fCash
+        return {a.maturity: a.notional for a in self.portfolio if a.currency_id == currency_id and a.asset_type == 1}
+
+
+def decode_portfolio(portfolio):
+    return [PortfolioAsset.decode(asset) for asset in portfolio]
+
+
+def decode_markets(markets):
+    return [MarketParameters.decode(market) for market in markets]
+
+
+# Struct of arrays
+
+
+class _Arrays:
+    # One (n, width) array per field, zero padded, valid marks the filled entries
+    record = None
+    fields = ()
+    float_fields = ()
+
+    def __init__(self, valid, **columns):
+        self.valid = np.asarray(valid, dtype=bool)
+        for name in self.fields:
+            setattr(self, name, np.asarray(columns[name], dtype=self._dtype(name)))
+
+    @classmethod
+    def _dtype(cls, name):
+        return np.float64 if name in cls.float_fields else np.int64
+
+    @classmethod
+    def decode(cls, rows):
+        # rows: one list of structs (tuples or records) per snapshot
+        rows = [[s if isinstance(s, cls.record) else cls.record.decode(s) for s in row] for row in rows]
+        width = max([len(row) for row in rows] + [0])
+        valid = np.zeros((len(rows), width), dtype=bool)
+        columns = {name: np.zeros((len(rows), width), dtype=cls._dtype(name)) for name in cls.fields}
+        for (i, row) in enumerate(rows):
+            valid[i, :len(row)] = True
+            for name in cls.fields:
+                columns[name][i, :len(row)] = [getattr(s, name) for s in row]
+        return cls(valid, **columns)
+
+    def __len__(self):
+        return len(self.valid)
+
+    def __getitem__(self, index):
+        # Snapshots as a smaller container, or one snapshot as records
+        if isinstance(index, (int, np.integer)):
+            return [self.record(*self._row(index, j)) for j in np.flatnonzero(self.valid[index])]
+        return type(self)(self.valid[index], **{name: getattr(self, name)[index] for name in self.fields})
+
+    def _row(self, i, j):
+        return tuple(int(getattr(self, name)[i, j]) if name in self.fields else None for name in self.record.__slots__)
+
+    @classmethod
+    def concatenate(cls, containers):
+        width = max(c.valid.shape[1] for c in containers)
+
+        def pad(a):
+            return np.pad(a, ((0, 0), (0, width - a.shape[1])))
+
+        return cls(
+            np.concatenate([pad(c.valid) for c in containers]),
+            **{name: np.concatenate([pad(getattr(c, name)) for c in containers]) for name in cls.fields},
+        )
+
+
+class MarketArrays(_Arrays):
+    # storage_slot is not kept
+    record = MarketParameters
+    fields = ("maturity", "total_fcash", "total_asset_cash", "total_liquidity", "last_implied_rate", "oracle_rate",
+              "previous_trade_time")
+    float_fields = ("total_fcash", "total_asset_cash", "total_liquidity")
+
+
+class PortfolioArrays(_Arrays):
+    # storage_slot and storage_state are not kept
+    record = PortfolioAsset
+    fields = ("currency_id", "maturity", "asset_type", "notional")
+    float_fields = ("notional",)
+
+
+class AccountContextArrays:
+    # One entry per snapshot
+    fields = ("next_settle_time", "has_debt", "asset_array_length", "bitmap_currency_id")
+
+    def __init__(self, next_settle_time, has_debt, asset_array_length, bitmap_currency_id):
+        self.next_settle_time = np.asarray(next_settle_time, dtype=np.int64)
+        self.has_debt = np.asarray(has_debt, dtype=bool)
+        self.asset_array_length = np.asarray(asset_array_length, dtype=np.int64)
+        self.bitmap_currency_id = np.asarray(bitmap_currency_id, dtype=np.int64)
+
+    @classmethod
+    def decode(cls, contexts):
+        contexts = [c if isinstance(c, AccountContext) else AccountContext.decode(c) for c in contexts]
+        return cls(
+            [c.next_settle_time for c in contexts],
+            [c.has_debt != b"\x00" for c in contexts],
+            [c.asset_array_length for c in contexts],
+            [c.bitmap_currency_id for c in contexts],
+        )
+
+    def __len__(self):
+        return len(self.next_settle_time)
+
+
+class AccountArrays:
+    # getAccount at many snapshots: contexts (n,) and portfolios (n, max_assets)
+
+    def __init__(self, contexts, portfolios):
+        self.contexts = contexts
+        self.portfolios = portfolios
+
+    @classmethod
+    def decode(cls, accounts):
+        accounts = [a if isinstance(a, Account) else Account.decode(a) for a in accounts]
+        return cls(
+            AccountContextArrays.decode([a.context for a in accounts]),
+            PortfolioArrays.decode([a.portfolio for a in accounts]),
+        )
+
+    def __len__(self):
+        return len(self.contexts)
@@ -0,0 +1,156 @@
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+
+from .constants import MAX_BPS
+from .market import MarketModel
+from .types import decode_portfolio
+
+# Off-chain Strategy.estimatedTotalAssets: want balance plus the value of every fCash position,
+# computed from fetched portfolio and market state instead of making the node run
+# _getPortfolioSnapshot (one getCashAmountGivenfCashAmount per position) on every call.
+#
+#   service = ValuationService(n_proxy_views)
+#   service.register(strategy, token)
+#   service.estimated_total_assets([strategy], [block_a, block_b])   # (strategies, blocks) array
+#
+# Values are memoized per (block, strategy, timestamp) in an LRU, portfolios per (block, strategy)
+# and market snapshots per (block, currency), so dashboards asking again for the same block cost
+# nothing and a batch over many strategies prices all their positions with one vectorized call per
+# block and currency. A timestamp other than the block's values the positions at that block's
+# markets as if time had moved on (hypothetical valuations, within the same quarter).
+
+
+class LRUCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key not in self.data:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.data.move_to_end(key)
+        return self.data[key]
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.max_entries:
+            self.data.popitem(last=False)
+
+    def __len__(self):
+        return len(self.data)
+
+
+def value_positions(model, currency_ids, maturities, notionals, block_times, decimals_difference):
+    # Value in want of fCash positions, as _getPortfolioSnapshot values them: matured fCash 1:1,
+    # active maturities at what selling them returns now, anything else (or a failed trade) 0
+    (currency_ids, maturities, notionals, block_times, decimals_difference) = np.broadcast_arrays(
+        np.asarray(currency_ids, dtype=int), np.asarray(maturities, dtype=float),
+        np.asarray(notionals, dtype=float), np.asarray(block_times, dtype=float),
+        np.asarray(decimals_difference, dtype=float),
+    )
+    # Market index of every maturity among its currency's active markets, 0 if not there
+    market_maturities = model._maturity[np.clip(currency_ids, 0, model._maturity.shape[0] - 1)]
+    matches = market_maturities == maturities[..., None]
+    market_indexes = np.where(matches.any(axis=-1), matches.argmax(axis=-1) + 1, 0)
+
+    (_, underlying) = model.batch_cash_given_fcash(currency_ids, -notionals, market_indexes, block_times)
+    underlying = np.where(np.isnan(underlying) | (market_indexes == 0), 0, underlying)
+    internal = np.where(maturities < block_times, notionals, underlying)
+    return np.floor(internal) * decimals_difference / MAX_BPS
+
+
+class ValuationService:
+    def __init__(self, n_proxy_views, max_entries=4096):
+        self.n_proxy_views = n_proxy_views
+        # (block, strategy, timestamp) => estimatedTotalAssets
+        self.values = LRUCache(max_entries)
+        # (block, strategy) => (want balance, [(maturity, notional)])
+        self.accounts = LRUCache(max_entries)
+        # (block, currency) => MarketModel, block => timestamp
+        self.models = LRUCache(max(16, max_entries // 16))
+        self.block_times = LRUCache(max_entries)
+        # strategy address => (want, currencyID, DECIMALS_DIFFERENCE), read once
+        self.strategies = {}
+
+    def register(self, strategy, want):
+        self.strategies[strategy.address] = (want, int(strategy.currencyID()), int(strategy.DECIMALS_DIFFERENCE()))
+
+    def _block_number(self, block):
+        from brownie import web3
+
+        return web3.eth.block_number if block in (None, "latest") else int(block)
+
+    def _block_time(self, block):
+        timestamp = self.block_times.get(block)
+        if timestamp is None:
+            from brownie import web3
+
+            timestamp = web3.eth.get_block(block).timestamp
+            self.block_times.put(block, timestamp)
+        return timestamp
+
+    def _account(self, address, block):
+        account = self.accounts.get((block, address))
+        if account is None:
+            want = self.strategies[address][0]
+            portfolio = self.n_proxy_views.getAccountPortfolio(address, block_identifier=block)
+            account = (
+                int(want.balanceOf(address, block_identifier=block)),
+                [(asset.maturity, asset.notional) for asset in decode_portfolio(portfolio)],
+            )
+            self.accounts.put((block, address), account)
+        return account
+
+    def _model(self, block, currency_id):
+        model = self.models.get((block, currency_id))
+        if model is None:
+            model = MarketModel.from_views(self.n_proxy_views, [currency_id], block_identifier=block)
+            self.models.put((block, currency_id), model)
+        return model
+
+    def estimated_total_assets(self, strategies, blocks=(None,), timestamps=None):
+        # (len(strategies), len(blocks)) array of estimatedTotalAssets. timestamps, aligned with
+        # blocks, values the positions at another time than the block's
+        addresses = [getattr(s, "address", s) for s in strategies]
+        blocks = [self._block_number(b) for b in blocks]
+        if timestamps is None:
+            timestamps = [None] * len(blocks)
+        timestamps = [self._block_time(b) if t is None else int(t) for (b, t) in zip(blocks, timestamps)]
+
+        result = np.empty((len(addresses), len(blocks)))
+        # (block, currency) => [(row, column, address, timestamp)] still to value
+        missing = defaultdict(list)
+        for (j, (block, timestamp)) in enumerate(zip(blocks, timestamps)):
+            for (i, address) in enumerate(addresses):
+                value = self.values.get((block, address, timestamp))
+                if value is None:
+                    missing[(block, self.strategies[address][1])].append((i, j, address, timestamp))
+                else:
+                    result[i, j] = value
+
+        for ((block, currency_id), entries) in missing.items():
+            accounts = [self._account(address, block) for (_, _, address, _) in entries]
+            owners = np.repeat(np.arange(len(entries)), [len(portfolio) for (_, portfolio) in accounts])
+            positions = np.array([p for (_, portfolio) in accounts for p in portfolio], dtype=float).reshape(-1, 2)
+            values = value_positions(
+                self._model(block, currency_id),
+                currency_id,
+                positions[:, 0],
+                positions[:, 1],
+                np.array([entries[o][3] for o in owners], dtype=float),
+                np.array([self.strategies[entries[o][2]][2] for o in owners], dtype=float),
+            )
+            totals = np.bincount(owners, weights=values, minlength=len(entries))
+            for ((i, j, address, timestamp), (balance, _), total) in zip(entries, accounts, totals):
+                result[i, j] = balance + total
+                self.values.put((block, address, timestamp), result[i, j])
+        return result
+
+    def estimated_total_asset(self, strategy, block=None, timestamp=None):
+        return float(self.estimated_total_assets([strategy], [block], [timestamp])[0, 0])
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from brownie import Contract, chain, web3
+
+# Persistent, content-addressed ABI store for the contracts we load from the explorer.
+#
+# ABIs are stored once under abis/<sha256>.json and looked up through small index files keyed
+# by (chain id, address, implementation address), so an upgrade of a proxy or of one of Notional's
+# router sub-contracts resolves to a new entry. An ABI file that does not hash to its name (a
+# corrupted or truncated entry) is fetched again. Every write is atomic, which lets several sessions
+# and xdist workers share the same directory. Warm it up once with network access:
+#
+#   brownie run abi_cache
+#
+# and later sessions load every ABI from disk without touching the explorer.
+
+NOTIONAL_PROXY = "0x1344A36A1B56144C3Bc62E7757377D288fDE0369"
+NOTIONAL_ROUTERS = ("VIEWS", "BATCH_ACTION", "ACCOUNT_ACTION")
+# EIP-1967 implementation slot, used by Notional's UUPS proxy
+IMPLEMENTATION_SLOT = 0x360894A13BA1A3210667C828492DB98DCA3E2076CC3735A920A3CA505D382BBC
+CACHE_DIR = Path(
+    os.environ.get("NOTIONAL_ABI_CACHE", Path(__file__).resolve().parents[1] / ".abi_cache")
+)
+
+# In-process memo: index key => (name, abi)
+_loaded = {}
+
+
+def _write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as fp:
+        json.dump(data, fp, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _digest(abi):
+    return hashlib.sha256(json.dumps(abi, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def _read_abi(digest):
+    # The stored ABI, None if it is missing or does not match its digest
+    try:
+        abi = json.loads((CACHE_DIR / "abis" / f"{digest}.json").read_text())
+    except (OSError, ValueError):
+        return None
+    return abi if _digest(abi) == digest else None
+
+
+def _index_path(address, implementation):
+    return CACHE_DIR / "index" / f"{chain.id}-{address.lower()}-{implementation.lower()}.json"
+
+
+def implementation_of(address):
+    # Address of the implementation behind an EIP-1967 proxy, the address itself otherwise
+    slot = web3.eth.get_storage_at(address, IMPLEMENTATION_SLOT)
+    if int.from_bytes(bytes(slot), "big") == 0:
+        return address
+    return web3.toChecksumAddress("0x" + bytes(slot)[-20:].hex())
+
+
+def load(address, implementation, fetch):
+    # Returns (name, abi) for the entry, calling fetch() -> (name, abi) only on a cache miss
+    key = (chain.id, address.lower(), implementation.lower())
+    if key in _loaded:
+        return _loaded[key]
+
+    index_path = _index_path(address, implementation)
+    if index_path.exists():
+        entry = json.loads(index_path.read_text())
+        abi = _read_abi(entry["abi"])
+        if abi is not None:
+            _loaded[key] = (entry["name"], abi)
+            return _loaded[key]
+
+    (name, abi) = fetch()
+    digest = _digest(abi)
+    if _read_abi(digest) is None:
+        _write_atomic(CACHE_DIR / "abis" / f"{digest}.json", abi)
+    _write_atomic(index_path, {"name": name, "abi": digest})
+    _loaded[key] = (name, abi)
+    return _loaded[key]
+
+
+def contract(address, implementation=None):
+    # Drop-in for Contract.from_explorer(address)
+    implementation = implementation or implementation_of(address)
+
+    def fetch():
+        explorer_contract = Contract.from_explorer(address)
+        return (explorer_contract._name, explorer_contract.abi)
+
+    (name, abi) = load(address, implementation, fetch)
+    return Contract.from_abi(name, address, abi)
+
+
+def router(n_proxy, getter):
+    # One of Notional's router sub-contracts (VIEWS, BATCH_ACTION, ACCOUNT_ACTION...) called through
+    # the proxy, as in Contract.from_abi(getter, n_proxy.address, Contract(n_proxy.VIEWS()).abi)
+    implementation = getattr(n_proxy, getter)()
+
+    def fetch():
+        return (getter, Contract.from_explorer(implementation).abi)
+
+    (_, abi) = load(n_proxy.address, implementation, fetch)
+    return Contract.from_abi(getter, n_proxy.address, abi)
+
+
+def main(*addresses):
+    # Warm up the cache with the Notional proxy, its routers and any extra addresses
+    n_proxy = contract(NOTIONAL_PROXY)
+    print(f"Cached {n_proxy._name} at {n_proxy.address}")
+    for getter in NOTIONAL_ROUTERS:
+        router(n_proxy, getter)
+        print(f"Cached {getter} router at {getattr(n_proxy, getter)()}")
+    for address in addresses:
+        cached = contract(address)
+        print(f"Cached {cached._name} at {cached.address}")
+    print(f"ABI cache: {CACHE_DIR}")
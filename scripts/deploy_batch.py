@@ -0,0 +1,108 @@
+import json
+import os
+
+from brownie import Strategy, accounts, network
+
+from scripts.deploy import API_VERSION, Vault
+
+# Non-interactive deployment of the strategy for several vaults at once, through
+# Strategy.cloneStrategies (one transaction for every clone).
+#
+#   DEPLOY_CONFIG=deploy.json DEPLOY_PASSWORD=... brownie run deploy_batch --network mainnet
+#
+# deploy.json:
+#   {
+#     "account": "deployer",                  # brownie account alias
+#     "original": "0x...",                    # strategy to clone, if missing it is deployed as the
+#                                             # first entry's strategy and the other entries are cloned
+#     "nProxy": "0x1344A36A1B56144C3Bc62E7757377D288fDE0369",
+#     "strategist": "0x...", "rewards": "0x...",
+#     "debtRatio": 1000,                      # optional, used when the account governs the vaults
+#     "clones": [{"vault": "0x...", "currencyID": 1, "keeper": "0x..."}, ...]
+#   }
+#
+# Every vault must run the vaults API the strategy is built against. Clones are added to the vaults
+# the account governs; the addStrategy calls for the others are printed for their governance.
+
+
+def check_vaults(clones):
+    # Every vault's apiVersion, before anything is sent
+    vaults = []
+    for clone in clones:
+        vault = Vault.at(clone["vault"])
+        api_version = vault.apiVersion()
+        if api_version != API_VERSION:
+            raise ValueError(f"Vault {vault.address} runs API {api_version}, the strategy needs {API_VERSION}")
+        vaults.append(vault)
+    return vaults
+
+
+def clone_params(clones):
+    return [(clone["vault"], clone["currencyID"], clone["keeper"]) for clone in clones]
+
+
+def deploy(config, dev):
+    clones = config["clones"]
+    vaults = check_vaults(clones)
+    params = clone_params(clones)
+
+    strategies = []
+    if config.get("original"):
+        original = Strategy.at(config["original"])
+    else:
+        # The original is the first entry's strategy, set up like the clones cloneStrategies initialises
+        (vault, currency_id, keeper) = params.pop(0)
+        original = Strategy.deploy(vault, config["nProxy"], currency_id, {"from": dev})
+        original.setKeeper(keeper, {"from": dev})
+        original.setRewards(config["rewards"], {"from": dev})
+        original.setStrategist(config["strategist"], {"from": dev})
+        strategies.append(original)
+        print(f"Deployed the original strategy at {original.address}")
+
+    # What the same clones cost one transaction each, None for the original
+    single_gas = [None] * len(strategies) + [
+        original.cloneStrategy.estimate_gas(
+            vault, config["strategist"], config["rewards"], keeper, config["nProxy"], currency_id, {"from": dev}
+        )
+        for (vault, currency_id, keeper) in params
+    ]
+    tx = None
+    if params:
+        tx = original.cloneStrategies(params, config["strategist"], config["rewards"], config["nProxy"], {"from": dev})
+        strategies += [Strategy.at(event["clone"]) for event in tx.events["Cloned"]]
+    return original, vaults, strategies, tx, single_gas
+
+
+def report(vaults, strategies, tx, single_gas):
+    print(f"\n{'vault':<44}{'currency':>10}{'strategy':>44}{'single tx gas':>16}")
+    for (vault, strategy, gas) in zip(vaults, strategies, single_gas):
+        gas = "original" if gas is None else gas
+        print(f"{vault.address:<44}{strategy.currencyID():>10}{strategy.address:>44}{gas:>16}")
+    if tx is None:
+        return
+    clone_gas = [gas for gas in single_gas if gas is not None]
+    print(f"\ncloneStrategies: {tx.gas_used} gas for {len(clone_gas)} clones, {tx.gas_used // len(clone_gas)} per clone")
+    print(f"one transaction per clone: {sum(clone_gas)} gas")
+
+
+def register(config, dev, vaults, strategies):
+    debt_ratio = config.get("debtRatio", 0)
+    for (vault, strategy) in zip(vaults, strategies):
+        if vault.governance() == dev.address:
+            vault.addStrategy(strategy, debt_ratio, 0, 2 ** 256 - 1, 0, {"from": dev})
+            print(f"Added {strategy.address} to {vault.address} with debt ratio {debt_ratio}")
+        else:
+            print(f"For {vault.governance()}: {vault.address}.addStrategy({strategy.address}, {debt_ratio}, 0, "
+                  f"{2 ** 256 - 1}, 0)")
+
+
+def main():
+    print(f"You are using the '{network.show_active()}' network")
+    with open(os.environ.get("DEPLOY_CONFIG", "deploy.json")) as fp:
+        config = json.load(fp)
+    dev = accounts.load(config["account"], password=os.environ.get("DEPLOY_PASSWORD"))
+    print(f"You are using: '{config['account']}' [{dev.address}]")
+
+    (original, vaults, strategies, tx, single_gas) = deploy(config, dev)
+    report(vaults, strategies, tx, single_gas)
+    register(config, dev, vaults, strategies)
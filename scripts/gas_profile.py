@@ -0,0 +1,216 @@
+import json
+import os
+import subprocess
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Gas of many transactions (every harvest of a test session or of a script) aggregated over their
+# call traces: internal functions of the strategy (through brownie's source maps) and the external
+# calls to Notional, each with the calls below it.
+#
+#   profile = GasProfile()
+#   with profile.collect(["Strategy.harvest"]):
+#       ...                                # every harvest sent in here is traced and added
+#   profile.write_folded("profile.folded")  # flamegraph.pl / speedscope / inferno input
+#   profile.save("profile.json")
+#   print(profile.table())
+#
+# Profiles saved at two commits are compared function by function with:
+#
+#   GAS_PROFILE_BASE=base.json GAS_PROFILE=profile.json brownie run gas_profile
+#
+# Gas is attributed to the opcode that spends it. A CALL is only charged what it costs outside the
+# callee, whose opcodes are charged to the callee's frames. Intrinsic gas and refunds are not in
+# the trace, they go to an "[intrinsic and refunds]" frame so that every stack adds up to gas_used.
+
+PROFILE_VERSION = 1
+INTRINSIC = "[intrinsic and refunds]"
+
+
+def step_costs(trace):
+    # Gas of every step, a CALL's excluding its callee
+    costs = [0] * len(trace)
+    # (index of the call step, gas charged before entering the callee)
+    pending = []
+    spent = 0
+    for (i, step) in enumerate(trace):
+        following = trace[i + 1] if i + 1 < len(trace) else None
+        if following is not None and following["depth"] > step["depth"]:
+            pending.append((i, spent))
+            continue
+        if following is not None and following["depth"] == step["depth"]:
+            cost = step["gas"] - following["gas"]
+        else:
+            cost = step["gasCost"]
+        costs[i] = cost
+        spent += cost
+        if following is not None and following["depth"] < step["depth"] and pending:
+            # Back in the caller: the call cost what it took from the caller minus the callee's opcodes
+            (call, before) = pending.pop()
+            costs[call] = max(0, trace[call]["gas"] - following["gas"] - (spent - before))
+            spent += costs[call]
+    return costs
+
+
+def stacks(trace):
+    # (stack of function names, gas, whether the step entered the function) of every step. A frame
+    # is a (call depth, jump depth) level
+    frames = []
+    costs = step_costs(trace)
+    for (step, cost) in zip(trace, costs):
+        level = (step["depth"], step.get("jumpDepth", 0))
+        fn = step.get("fn") or step.get("address") or "?"
+        while frames and frames[-1][0] > level:
+            frames.pop()
+        entered = True
+        if not frames or frames[-1][0] < level:
+            frames.append((level, fn))
+        elif frames[-1][1] != fn:
+            frames[-1] = (level, fn)
+        else:
+            entered = False
+        yield (tuple(name for (_, name) in frames), cost, entered)
+
+
+class GasProfile:
+    def __init__(self):
+        # stack => gas
+        self.folded = defaultdict(int)
+        # function => times entered
+        self.calls = defaultdict(int)
+        # name of the profiled function => (transactions, gas_used)
+        self.transactions = defaultdict(lambda: [0, 0])
+
+    def add(self, tx):
+        # tx: a TransactionReceipt, its trace is fetched (debug_traceTransaction) now
+        root = f"{tx.contract_name}.{tx.fn_name}"
+        traced = 0
+        for (stack, cost, entered) in stacks(tx.trace):
+            self.folded[stack] += cost
+            self.calls[stack[-1]] += entered
+            traced += cost
+        self.folded[(root, INTRINSIC)] += tx.gas_used - traced
+        entry = self.transactions[root]
+        entry[0] += 1
+        entry[1] += tx.gas_used
+
+    @contextmanager
+    def collect(self, functions):
+        # Adds every successful transaction sent to one of functions ("Contract.function") while inside
+        from brownie.network.contract import ContractTx
+
+        call = ContractTx.__call__
+        profile = self
+
+        def profiled_call(method, *args, **kwargs):
+            tx = call(method, *args, **kwargs)
+            if method._name in functions and tx.status == 1:
+                profile.add(tx)
+            return tx
+
+        ContractTx.__call__ = profiled_call
+        try:
+            yield self
+        finally:
+            ContractTx.__call__ = call
+
+    def functions(self):
+        # name => {"self", "total", "calls"}: gas spent in the function's own code, with everything it
+        # calls (recursion counted once), and times it was entered
+        functions = defaultdict(lambda: {"self": 0, "total": 0, "calls": 0})
+        for (stack, gas) in self.folded.items():
+            functions[stack[-1]]["self"] += gas
+            for name in set(stack):
+                functions[name]["total"] += gas
+        for (name, calls) in self.calls.items():
+            functions[name]["calls"] = calls
+        return dict(functions)
+
+    def table(self, top=30, base=None):
+        # Per function table by total gas per profiled transaction, with the change from a base profile
+        transactions = self.count() or 1
+        rows = sorted(self.functions().items(), key=lambda item: -item[1]["total"])[:top]
+        (base_functions, base_transactions) = ({}, 1) if base is None else (base.functions(), base.count() or 1)
+        lines = [f"{'total/tx':>12}{'self/tx':>12}{'calls/tx':>10}{'change':>12}  function"]
+        for (name, gas) in rows:
+            change = ""
+            if base_functions.get(name, {}).get("total"):
+                before = base_functions[name]["total"] / base_transactions
+                change = f"{(gas['total'] / transactions - before) / before:+.2%}"
+            lines.append(
+                f"{gas['total'] // transactions:>12}{gas['self'] // transactions:>12}"
+                f"{gas['calls'] / transactions:>10.1f}{change:>12}  {name}"
+            )
+        for (root, (n, gas_used)) in sorted(self.transactions.items()):
+            lines.append(f"{root}: {n} transactions, {gas_used // n} gas on average")
+        return "\n".join(lines)
+
+    def count(self):
+        return sum(n for (n, _) in self.transactions.values())
+
+    def write_folded(self, path):
+        # One "frame;frame;frame gas" line per stack
+        with open(path, "w") as fp:
+            for (stack, gas) in sorted(self.folded.items()):
+                if gas > 0:
+                    fp.write(f"{';'.join(name.replace(';', ':').replace(' ', '_') for name in stack)} {gas}\n")
+
+    def to_dict(self):
+        return {
+            "version": PROFILE_VERSION,
+            "commit": _commit(),
+            "transactions": {root: list(entry) for (root, entry) in self.transactions.items()},
+            "folded": {";".join(stack): gas for (stack, gas) in self.folded.items()},
+            "calls": dict(self.calls),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version") != PROFILE_VERSION:
+            raise ValueError("Unsupported gas profile version")
+        profile = cls()
+        for (stack, gas) in data["folded"].items():
+            profile.folded[tuple(stack.split(";"))] += gas
+        for (root, entry) in data["transactions"].items():
+            profile.transactions[root] = list(entry)
+        profile.calls.update(data["calls"])
+        return profile
+
+    def merge(self, other):
+        for (stack, gas) in other.folded.items():
+            self.folded[stack] += gas
+        for (name, calls) in other.calls.items():
+            self.calls[name] += calls
+        for (root, (n, gas_used)) in other.transactions.items():
+            self.transactions[root][0] += n
+            self.transactions[root][1] += gas_used
+        return self
+
+    def save(self, path):
+        with open(path, "w") as fp:
+            json.dump(self.to_dict(), fp, indent=1, sort_keys=True)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as fp:
+            return cls.from_dict(json.load(fp))
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    # Compares a profile (or the merged profiles of xdist workers) with a base one
+    paths = os.environ.get("GAS_PROFILE", "profile.json").split(",")
+    profile = GasProfile()
+    for path in paths:
+        profile.merge(GasProfile.load(path))
+    base_path = os.environ.get("GAS_PROFILE_BASE")
+    base = GasProfile.load(base_path) if base_path else None
+    print(profile.table(top=int(os.environ.get("GAS_PROFILE_TOP", 30)), base=base))
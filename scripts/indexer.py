@@ -0,0 +1,91 @@
+import os
+
+from brownie import web3
+from notional_sim import events
+
+# Incremental sync of the strategies' events into a notional_sim.events.EventStore.
+#
+#   INDEX_DIR=.events INDEX_STRATEGIES=0x...,0x... INDEX_FROM_BLOCK=14000000 brownie run indexer
+#
+# Every run resumes from the store's last block and fetches Harvested (from the strategies),
+# StrategyReported (from their vaults, filtered on the strategies) and LendBorrowTrade (from
+# Notional, filtered on the strategies as accounts) with one eth_getLogs per event and block range.
+# A range is halved whenever the node refuses it for having too many results.
+
+BATCH_SIZE = 10_000
+# Blocks behind the head left alone, so a reorg cannot rewrite what was indexed
+CONFIRMATIONS = 12
+
+STRATEGY_ABI = [
+    {"name": name, "type": "function", "stateMutability": "view", "inputs": [],
+     "outputs": [{"name": "", "type": output}]}
+    for (name, output) in (("vault", "address"), ("nProxy", "address"), ("currencyID", "uint16"))
+]
+
+
+def _topic(signature):
+    return web3.keccak(text=signature).hex()
+
+
+def _padded(address):
+    return "0x" + "0" * 24 + address[2:].lower()
+
+
+def _sources(strategies):
+    # table => (emitting contracts, topic filters), and {strategy: currency id}
+    contracts = [web3.eth.contract(address=s, abi=STRATEGY_ABI) for s in strategies]
+    vaults = sorted({c.functions.vault().call() for c in contracts})
+    proxies = sorted({c.functions.nProxy().call() for c in contracts})
+    currencies = {c.address: c.functions.currencyID().call() for c in contracts}
+    accounts = [_padded(s) for s in strategies]
+    sources = {
+        "harvested": (list(strategies), [_topic(events.TABLES["harvested"][0])]),
+        "strategy_reported": (vaults, [_topic(events.TABLES["strategy_reported"][0]), accounts]),
+        "lend_borrow_trade": (proxies, [_topic(events.TABLES["lend_borrow_trade"][0]), accounts]),
+    }
+    return sources, currencies
+
+
+def _get_logs(address, topics, start, end):
+    try:
+        return web3.eth.get_logs({"address": address, "topics": topics, "fromBlock": start, "toBlock": end})
+    except ValueError:
+        # Too many results for one response
+        if start == end:
+            raise
+        middle = (start + end) // 2
+        return _get_logs(address, topics, start, middle) + _get_logs(address, topics, middle + 1, end)
+
+
+def sync(store, strategies, from_block=0, to_block=None, batch_size=BATCH_SIZE, confirmations=CONFIRMATIONS):
+    # Indexes [last indexed block + 1, to_block] and commits after every batch, returns the number
+    # of events added per table
+    (sources, currencies) = _sources(strategies)
+    for (strategy, currency_id) in currencies.items():
+        store.set_currency(strategy, currency_id)
+    if to_block is None:
+        to_block = web3.eth.block_number - confirmations
+    start = from_block if store.last_block is None else store.last_block + 1
+    added = {table: 0 for table in sources}
+    timestamps = {}
+
+    while start <= to_block:
+        end = min(start + batch_size - 1, to_block)
+        logs = {table: _get_logs(address, topics, start, end) for (table, (address, topics)) in sources.items()}
+        for block in {log["blockNumber"] for table_logs in logs.values() for log in table_logs}:
+            if block not in timestamps:
+                timestamps[block] = web3.eth.get_block(block).timestamp
+        for (table, table_logs) in logs.items():
+            if table_logs:
+                store.append(table, events.decode_logs(table, table_logs, timestamps, store.address_book))
+                added[table] += len(table_logs)
+        store.commit(end)
+        start = end + 1
+    return added
+
+
+def main():
+    store = events.EventStore(os.environ.get("INDEX_DIR", ".events"))
+    strategies = [web3.toChecksumAddress(s) for s in os.environ["INDEX_STRATEGIES"].split(",")]
+    added = sync(store, strategies, int(os.environ.get("INDEX_FROM_BLOCK", 0)))
+    print(f"Indexed up to block {store.last_block}: {added}")
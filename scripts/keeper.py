@@ -0,0 +1,482 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+
+import aiohttp
+from eth_abi import decode_abi, encode_abi
+from eth_utils import function_signature_to_4byte_selector, to_checksum_address
+
+from notional_sim.constants import FCASH_SCALING, MAX_BPS
+from notional_sim.gas import max_harvest_gas
+from notional_sim.types import AccountContext, decode_markets
+
+# Keeper daemon for the Notional strategy clones (one per currency, see Strategy.cloneStrategy).
+#
+#   KEEPER_CONFIG=keeper.json brownie run keeper --network mainnet
+#
+# with keeper.json:
+#
+#   {"interval": 60, "metrics_port": 9100,
+#    "strategies": [{"address": "0x...", "signer": "keeper-alias"}, ...]}
+#
+# Every round reads the state of all strategies concurrently, one JSON-RPC batch per strategy
+# pinned to the same block, over a single pooled HTTP session. Whether to harvest is decided
+# locally by harvest_due, which mirrors Strategy.harvestTrigger, so no trigger call is simulated.
+# Transactions of a signer are sent one at a time through a NonceManager, and a strategy is not
+# considered again until its previous transaction was mined. Keeper.metrics() has the latency of
+# every strategy's reads and the backlog of transactions per signer.
+#
+# The daemon only speaks JSON-RPC, so it runs unchanged against a local chain (ganache with the
+# mocks of contracts/mocks, see tests/test_keeper.py) with unlocked accounts as signers.
+
+log = logging.getLogger("keeper")
+
+# Gas of a harvest used to price callCostInWei: the most expensive one, from the recorded gas
+# baselines shared with the sweep (see notional_sim.gas)
+HARVEST_GAS = max_harvest_gas()
+# Margin over eth_estimateGas for the gas limit of the transactions
+GAS_MARGIN = 1.2
+RECEIPT_INTERVAL = 2
+
+
+class RPCError(Exception):
+    pass
+
+
+class RPC:
+    # Async JSON-RPC client over one pooled aiohttp session
+
+    def __init__(self, url, pool_size=16, timeout=30):
+        self.url = url
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.ids = itertools.count()
+        self.session = None
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size), timeout=self.timeout
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def _post(self, payload):
+        async with self.session.post(self.url, json=payload) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def request(self, method, params):
+        response = await self._post({"jsonrpc": "2.0", "id": next(self.ids), "method": method, "params": params})
+        if "error" in response:
+            raise RPCError(f"{method}: {response['error']}")
+        return response["result"]
+
+    async def batch(self, requests):
+        # requests: list of (method, params), results in the same order
+        payload = [
+            {"jsonrpc": "2.0", "id": next(self.ids), "method": method, "params": params}
+            for (method, params) in requests
+        ]
+        responses = {r["id"]: r for r in await self._post(payload)}
+        results = []
+        for (request, (method, _)) in zip(payload, requests):
+            response = responses[request["id"]]
+            if "error" in response:
+                raise RPCError(f"{method}: {response['error']}")
+            results.append(response["result"])
+        return results
+
+
+class View:
+    # A view function: encodes its eth_call and decodes the result
+
+    def __init__(self, signature, outputs):
+        self.selector = function_signature_to_4byte_selector(signature)
+        self.inputs = signature[signature.index("(") + 1:-1].split(",") if not signature.endswith("()") else []
+        self.outputs = outputs
+
+    def call(self, to, args=(), block="latest"):
+        data = self.selector + encode_abi(self.inputs, list(args))
+        return ("eth_call", [{"to": to, "data": "0x" + data.hex()}, block])
+
+    def decode(self, result):
+        values = decode_abi(self.outputs, bytes.fromhex(result[2:]))
+        return values[0] if len(values) == 1 else values
+
+
+MARKET = "(bytes32,uint256,int256,int256,int256,uint256,uint256,uint256)"
+VIEWS = {
+    # Strategy
+    "want": View("want()", ["address"]),
+    "vault": View("vault()", ["address"]),
+    "nProxy": View("nProxy()", ["address"]),
+    "currencyID": View("currencyID()", ["uint16"]),
+    "minReportDelay": View("minReportDelay()", ["uint256"]),
+    "maxReportDelay": View("maxReportDelay()", ["uint256"]),
+    "debtThreshold": View("debtThreshold()", ["uint256"]),
+    "profitFactor": View("profitFactor()", ["uint256"]),
+    "maturity": View("getMaturity()", ["uint256"]),
+    "minTimeToMaturity": View("getMinTimeToMaturity()", ["uint256"]),
+    "minAmountWant": View("minAmountWant()", ["uint256"]),
+    "ethToWant": View("ethToWant(uint256)", ["uint256"]),
+    "tendTrigger": View("tendTrigger(uint256)", ["bool"]),
+    # Vault
+    "strategies": View(
+        "strategies(address)",
+        ["(uint256,uint256,uint256,uint256,uint256,uint256,uint256,uint256,uint256)"],
+    ),
+    "debtOutstanding": View("debtOutstanding(address)", ["uint256"]),
+    "creditAvailable": View("creditAvailable(address)", ["uint256"]),
+    # Want
+    "balanceOf": View("balanceOf(address)", ["uint256"]),
+    # Notional
+    "accountContext": View("getAccountContext(address)", ["(uint40,bytes1,uint8,uint16,bytes18)"]),
+    "activeMarkets": View("getActiveMarkets(uint16)", [MARKET + "[]"]),
+}
+HARVEST = function_signature_to_4byte_selector("harvest()")
+TEND = function_signature_to_4byte_selector("tend()")
+
+
+class Job:
+    # A strategy looked after by the keeper, its immutable settings are read once by Keeper.setup
+
+    def __init__(self, strategy, signer):
+        self.strategy = to_checksum_address(strategy)
+        self.signer = signer
+        self.vault = None
+        self.want = None
+        self.n_proxy = None
+        self.currency_id = None
+        # Hash of the transaction in flight ("queued" until it is sent), the strategy is skipped until
+        # it is mined
+        self.pending = None
+
+
+def _read_requests(job, block, call_cost):
+    strategy = job.strategy
+    return {
+        "minReportDelay": VIEWS["minReportDelay"].call(strategy, (), block),
+        "maxReportDelay": VIEWS["maxReportDelay"].call(strategy, (), block),
+        "debtThreshold": VIEWS["debtThreshold"].call(strategy, (), block),
+        "profitFactor": VIEWS["profitFactor"].call(strategy, (), block),
+        "maturity": VIEWS["maturity"].call(strategy, (), block),
+        "minTimeToMaturity": VIEWS["minTimeToMaturity"].call(strategy, (), block),
+        "minAmountWant": VIEWS["minAmountWant"].call(strategy, (), block),
+        "ethToWant": VIEWS["ethToWant"].call(strategy, (call_cost,), block),
+        "tendTrigger": VIEWS["tendTrigger"].call(strategy, (call_cost,), block),
+        "strategies": VIEWS["strategies"].call(job.vault, (strategy,), block),
+        "debtOutstanding": VIEWS["debtOutstanding"].call(job.vault, (strategy,), block),
+        "creditAvailable": VIEWS["creditAvailable"].call(job.vault, (strategy,), block),
+        "balanceOf": VIEWS["balanceOf"].call(job.want, (strategy,), block),
+        "accountContext": VIEWS["accountContext"].call(job.n_proxy, (strategy,), block),
+        "activeMarkets": VIEWS["activeMarkets"].call(job.n_proxy, (job.currency_id,), block),
+    }
+
+
+async def read_state(rpc, job, block_number, call_cost):
+    # Everything harvest_due looks at, in one batch pinned to block_number
+    requests = _read_requests(job, hex(block_number), call_cost)
+    results = await rpc.batch(list(requests.values()))
+    state = {name: VIEWS[name].decode(result) for (name, result) in zip(requests, results)}
+    params = state.pop("strategies")
+    state["activation"] = params[1]
+    state["lastReport"] = params[5]
+    state["totalDebt"] = params[6]
+    state["nextSettleTime"] = AccountContext.decode(state.pop("accountContext")).next_settle_time
+    state["activeMaturities"] = [market.maturity for market in decode_markets(state.pop("activeMarkets"))]
+    return state
+
+
+def harvest_due(state, timestamp):
+    # Strategy.harvestTrigger on a state read by read_state: the reason to harvest, None if it is
+    # not worth it. timestamp is the block timestamp the harvest is expected at
+    if state["activation"] == 0:
+        return None
+    since_report = timestamp - state["lastReport"]
+    if since_report < state["minReportDelay"]:
+        return None
+    if since_report >= state["maxReportDelay"]:
+        return "max_report_delay"
+    outstanding = state["debtOutstanding"]
+    if outstanding > state["debtThreshold"]:
+        return "debt_outstanding"
+
+    call_cost = state["profitFactor"] * state["ethToWant"]
+    next_settle_time = state["nextSettleTime"]
+    if 0 < next_settle_time < timestamp:
+        return "settlement" if call_cost < state["totalDebt"] else None
+
+    idle = state["balanceOf"] + state["creditAvailable"]
+    if idle <= outstanding:
+        return None
+    idle -= outstanding
+    if idle < state["minAmountWant"]:
+        return None
+
+    min_maturity = next(
+        (m for m in state["activeMaturities"] if m - timestamp >= state["minTimeToMaturity"]), 0
+    )
+    if 0 < state["maturity"] < min_maturity:
+        return "rollover" if call_cost < state["totalDebt"] else None
+    # The FCASH_SCALING remainder adjustPosition leaves idle
+    if idle <= state["totalDebt"] * (MAX_BPS - FCASH_SCALING + 1) // MAX_BPS:
+        return None
+    return "idle_funds" if call_cost < idle else None
+
+
+class Signer:
+    # An account sending the keeper's transactions. Without a private key it must be unlocked on
+    # the node (eth_sendTransaction), as the accounts of a local chain are
+
+    def __init__(self, address, private_key=None):
+        self.address = to_checksum_address(address)
+        self.private_key = private_key
+
+    async def send(self, rpc, tx):
+        if self.private_key is None:
+            return await rpc.request("eth_sendTransaction", [{k: v for (k, v) in tx.items() if k != "chainId"}])
+        from eth_account import Account
+
+        signed = Account.sign_transaction(
+            {k: int(v, 16) if k in ("gas", "gasPrice", "nonce", "value", "chainId") else v
+             for (k, v) in tx.items() if k != "from"},
+            self.private_key,
+        )
+        return await rpc.request("eth_sendRawTransaction", ["0x" + bytes(signed.rawTransaction).hex()])
+
+
+class NonceManager:
+    # Sends the transactions of every signer one at a time with consecutive nonces. The nonce is
+    # read from the node once and re-read after a failed send
+
+    def __init__(self, rpc):
+        self.rpc = rpc
+        self.nonces = {}
+        self.locks = defaultdict(asyncio.Lock)
+        # Transactions waiting for their signer, per signer
+        self.waiting = defaultdict(int)
+
+    async def send(self, signer, tx):
+        self.waiting[signer.address] += 1
+        try:
+            async with self.locks[signer.address]:
+                if signer.address not in self.nonces:
+                    nonce = await self.rpc.request("eth_getTransactionCount", [signer.address, "pending"])
+                    self.nonces[signer.address] = int(nonce, 16)
+                tx = dict(tx, nonce=hex(self.nonces[signer.address]))
+                try:
+                    tx_hash = await signer.send(self.rpc, tx)
+                except Exception:
+                    del self.nonces[signer.address]
+                    raise
+                self.nonces[signer.address] += 1
+                return tx_hash
+        finally:
+            self.waiting[signer.address] -= 1
+
+
+class StrategyMetrics:
+    def __init__(self):
+        self.polls = 0
+        self.errors = 0
+        self.last_latency = None
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+        self.last_reason = None
+        self.sent = defaultdict(int)
+        self.reverted = 0
+
+    def observe(self, latency):
+        self.polls += 1
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self.total_latency += latency
+
+    def as_dict(self):
+        return {
+            "polls": self.polls,
+            "errors": self.errors,
+            "last_latency": self.last_latency,
+            "mean_latency": self.total_latency / self.polls if self.polls else None,
+            "max_latency": self.max_latency,
+            "last_reason": self.last_reason,
+            "sent": dict(self.sent),
+            "reverted": self.reverted,
+        }
+
+
+class Keeper:
+    def __init__(self, rpc, jobs, harvest_gas=HARVEST_GAS):
+        self.rpc = rpc
+        self.jobs = jobs
+        self.harvest_gas = harvest_gas
+        self.nonces = NonceManager(rpc)
+        self.stats = {job.strategy: StrategyMetrics() for job in jobs}
+        self.tasks = set()
+        self.chain_id = None
+
+    async def setup(self):
+        self.chain_id = await self.rpc.request("eth_chainId", [])
+        await asyncio.gather(*(self._setup_job(job) for job in self.jobs))
+
+    async def _setup_job(self, job):
+        names = ("vault", "want", "nProxy", "currencyID")
+        results = await self.rpc.batch([VIEWS[name].call(job.strategy) for name in names])
+        (vault, want, n_proxy, job.currency_id) = (VIEWS[n].decode(r) for (n, r) in zip(names, results))
+        (job.vault, job.want, job.n_proxy) = map(to_checksum_address, (vault, want, n_proxy))
+
+    async def poll_once(self):
+        # Reads every strategy at the same block and sends the transactions that are due.
+        # Returns {strategy: reason} of the transactions sent
+        (block, gas_price) = await self.rpc.batch([("eth_getBlockByNumber", ["latest", False]), ("eth_gasPrice", [])])
+        block_number = int(block["number"], 16)
+        # The next block is at least one second later
+        timestamp = int(block["timestamp"], 16) + 1
+        call_cost = int(gas_price, 16) * self.harvest_gas
+
+        jobs = [job for job in self.jobs if job.pending is None]
+        states = await asyncio.gather(
+            *(self._read(job, block_number, call_cost) for job in jobs), return_exceptions=True
+        )
+        sent = {}
+        for (job, state) in zip(jobs, states):
+            if isinstance(state, BaseException):
+                self.stats[job.strategy].errors += 1
+                log.warning("%s: read failed: %s", job.strategy, state)
+                continue
+            reason = harvest_due(state, timestamp)
+            if reason is not None:
+                (selector, action) = (HARVEST, reason)
+            elif state["tendTrigger"]:
+                (selector, action) = (TEND, "tend")
+            else:
+                continue
+            self.stats[job.strategy].last_reason = action
+            job.pending = "queued"
+            self._spawn(self._execute(job, selector, action, gas_price))
+            sent[job.strategy] = action
+        return sent
+
+    async def _read(self, job, block_number, call_cost):
+        start = time.perf_counter()
+        state = await read_state(self.rpc, job, block_number, call_cost)
+        self.stats[job.strategy].observe(time.perf_counter() - start)
+        return state
+
+    def _spawn(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _execute(self, job, selector, action, gas_price):
+        stats = self.stats[job.strategy]
+        tx = {"from": job.signer.address, "to": job.strategy, "data": "0x" + selector.hex(), "chainId": self.chain_id}
+        try:
+            gas = int(await self.rpc.request("eth_estimateGas", [tx]), 16)
+            tx.update(gas=hex(int(gas * GAS_MARGIN)), gasPrice=gas_price)
+            job.pending = await self.nonces.send(job.signer, tx)
+            stats.sent[action] += 1
+            log.info("%s: %s sent in %s", job.strategy, action, job.pending)
+            receipt = await self._wait_receipt(job.pending)
+            if int(receipt["status"], 16) == 0:
+                stats.reverted += 1
+                log.warning("%s: %s reverted in %s", job.strategy, action, job.pending)
+        except Exception as exc:
+            stats.errors += 1
+            log.warning("%s: %s failed: %s", job.strategy, action, exc)
+        finally:
+            job.pending = None
+
+    async def _wait_receipt(self, tx_hash):
+        while True:
+            receipt = await self.rpc.request("eth_getTransactionReceipt", [tx_hash])
+            if receipt is not None:
+                return receipt
+            await asyncio.sleep(RECEIPT_INTERVAL)
+
+    async def drain(self):
+        # Waits for every transaction in flight to be mined
+        while self.tasks:
+            await asyncio.gather(*list(self.tasks))
+
+    async def run_once(self):
+        sent = await self.poll_once()
+        await self.drain()
+        return sent
+
+    async def run(self, interval):
+        while True:
+            start = time.perf_counter()
+            try:
+                await self.poll_once()
+            except Exception as exc:
+                log.warning("poll failed: %s", exc)
+            log.info("metrics %s", json.dumps(self.metrics()))
+            await asyncio.sleep(max(0, interval - (time.perf_counter() - start)))
+
+    def metrics(self):
+        backlog = defaultdict(int)
+        for job in self.jobs:
+            if job.pending is not None:
+                backlog[job.signer.address] += 1
+        return {
+            "strategies": {strategy: stats.as_dict() for (strategy, stats) in self.stats.items()},
+            "signers": {
+                signer: {"in_flight": backlog[signer], "waiting": self.nonces.waiting[signer]}
+                for signer in {job.signer.address for job in self.jobs}
+            },
+        }
+
+
+async def serve_metrics(keeper, port):
+    # Plain HTTP endpoint answering every request with Keeper.metrics() as JSON
+    async def handle(reader, writer):
+        await reader.readline()
+        body = json.dumps(keeper.metrics()).encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, "0.0.0.0", port)
+
+
+async def _main(url, jobs, config):
+    async with RPC(url, pool_size=config.get("pool_size", 16)) as rpc:
+        keeper = Keeper(rpc, jobs, config.get("harvest_gas", HARVEST_GAS))
+        await keeper.setup()
+        if config.get("metrics_port"):
+            await serve_metrics(keeper, config["metrics_port"])
+        await keeper.run(config.get("interval", 60))
+
+
+def main():
+    from brownie import accounts, web3
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    with open(os.environ.get("KEEPER_CONFIG", "keeper.json")) as fp:
+        config = json.load(fp)
+
+    signers = {}
+    jobs = []
+    for entry in config["strategies"]:
+        alias = entry["signer"]
+        if alias not in signers:
+            if alias in accounts:
+                # Unlocked account of the node (local chains)
+                signers[alias] = Signer(alias)
+            else:
+                account = accounts.load(alias, password=os.environ.get("KEEPER_PASSWORD"))
+                signers[alias] = Signer(account.address, account.private_key)
+        jobs.append(Job(entry["address"], signers[alias]))
+
+    asyncio.run(_main(web3.provider.endpoint_uri, jobs, config))
@@ -4,18 +4,16 @@ import datetime
 from brownie import Strategy, accounts, config, network, project, web3, Contract
 from eth_utils import is_checksum_address
 import click
+from scripts import abi_cache
 
 def main():
-    nProxy = Contract.from_explorer("0x1344A36A1B56144C3Bc62E7757377D288fDE0369")
+    nProxy = abi_cache.contract(abi_cache.NOTIONAL_PROXY)
 
-    # actionContract = Contract.from_explorer(nProxy.BATCH_ACTION())
-    # nProxy_batch = Contract.from_abi("BATCH", nProxy.address, actionContract.abi)
+    # nProxy_batch = abi_cache.router(nProxy, "BATCH_ACTION")
 
-    # accountContract = Contract.from_explorer(nProxy.ACCOUNT_ACTION())
-    # nProxy_account = Contract.from_abi("ACCOUNT", nProxy.address, accountContract.abi)
+    # nProxy_account = abi_cache.router(nProxy, "ACCOUNT_ACTION")
 
-    # viewsContract = Contract.from_explorer(nProxy.VIEWS())
-    # nProxy_views = Contract.from_abi("VIEWS", nProxy.address, viewsContract.abi)
+    # nProxy_views = abi_cache.router(nProxy, "VIEWS")
 
     # whale = accounts.at("0x28C6c06298d514Db089934071355E5743bf21d60", force=True)
 
@@ -33,7 +31,7 @@ def main():
     gov = accounts.at("0xFEB4acf3df3cDEA7399794D0869ef76A6EfAff52", force=True)
     # whale = accounts.at("0x28c6c06298d514db089934071355e5743bf21d60", force=True)
 
-    yVault = Contract.from_explorer("0xa258C4606Ca8206D8aA700cE2143D7db854D168c")
+    yVault = abi_cache.contract("0xa258C4606Ca8206D8aA700cE2143D7db854D168c")
 
     start = datetime.datetime.now()
     strategy = Strategy.deploy(
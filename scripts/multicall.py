@@ -0,0 +1,112 @@
+from brownie import Contract
+from hexbytes import HexBytes
+
+# Batched reads through Multicall2: any set of view calls is sent as a single eth_call, executed
+# at one pinned block, and every result is decoded with the ABI of the method that was called.
+#
+#   (account, markets) = multicall.read([
+#       (n_proxy_views.getAccount, strategy),
+#       (n_proxy_views.getActiveMarkets, currencyID),
+#   ])
+
+MULTICALL2 = "0x5BA1e12693Dc8F9c48aAD8770482f4739bEeD696"
+MULTICALL2_ABI = [
+    {
+        "name": "tryBlockAndAggregate",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [
+            {"name": "requireSuccess", "type": "bool"},
+            {
+                "name": "calls",
+                "type": "tuple[]",
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "callData", "type": "bytes"},
+                ],
+            },
+        ],
+        "outputs": [
+            {"name": "blockNumber", "type": "uint256"},
+            {"name": "blockHash", "type": "bytes32"},
+            {
+                "name": "returnData",
+                "type": "tuple[]",
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"},
+                ],
+            },
+        ],
+    },
+]
+
+_multicall = None
+
+
+def _contract():
+    global _multicall
+    if _multicall is None:
+        _multicall = Contract.from_abi("Multicall2", MULTICALL2, MULTICALL2_ABI, persist=False)
+    return _multicall
+
+
+class Multicall:
+    # Collects calls with add() and sends them all in execute(). Failed calls decode to None
+    # unless require_success is set, in which case the whole batch reverts
+
+    def __init__(self, block_identifier=None, require_success=True):
+        self.block_identifier = block_identifier
+        self.require_success = require_success
+        self.block_number = None
+        self.calls = []
+
+    def add(self, method, *args):
+        self.calls.append((method, args))
+        return len(self.calls) - 1
+
+    def execute(self):
+        if not self.calls:
+            return []
+        payload = [(method._address, method.encode_input(*args)) for (method, args) in self.calls]
+        (self.block_number, _, results) = _contract().tryBlockAndAggregate(
+            self.require_success, payload, block_identifier=self.block_identifier
+        )
+        return [
+            method.decode_output(HexBytes(data).hex()) if success else None
+            for ((method, _), (success, data)) in zip(self.calls, results)
+        ]
+
+
+def read(calls, block_identifier=None, require_success=True):
+    # calls: list of (method, *args) tuples, returns the decoded results in the same order
+    batch = Multicall(block_identifier, require_success)
+    for (method, *args) in calls:
+        batch.add(method, *args)
+    return batch.execute()
+
+
+def read_dict(calls, block_identifier=None, require_success=True):
+    # calls: {name: (method, *args)}, returns {name: decoded result}
+    return dict(zip(calls, read(list(calls.values()), block_identifier, require_success)))
+
+
+def strategy_snapshot(vault, strategy, token, n_proxy_views, currencyID, block_identifier=None):
+    # Everything the tests and status helpers look at for a strategy, in one round-trip
+    return read_dict(
+        {
+            "estimatedTotalAssets": (strategy.estimatedTotalAssets,),
+            "wantBalance": (token.balanceOf, strategy),
+            "maturity": (strategy.getMaturity,),
+            "minTimeToMaturity": (strategy.getMinTimeToMaturity,),
+            "toggleRealizeLosses": (strategy.getToggleRealizeLosses,),
+            "params": (vault.strategies, strategy),
+            "vaultTotalAssets": (vault.totalAssets,),
+            "vaultTotalSupply": (vault.totalSupply,),
+            "vaultBalance": (token.balanceOf, vault),
+            "pricePerShare": (vault.pricePerShare,),
+            "account": (n_proxy_views.getAccount, strategy),
+            "activeMarkets": (n_proxy_views.getActiveMarkets, currencyID),
+        },
+        block_identifier,
+    )
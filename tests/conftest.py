@@ -1,6 +1,33 @@
 import pytest
 from brownie import config
 from brownie import Contract, interface
+from utils import cassette, fork_pool, funding, gas_bench, gas_profile, mocks, rpc_profile, stress
+from scripts import abi_cache
+
+
+def pytest_addoption(parser):
+    cassette.add_options(parser)
+    fork_pool.add_options(parser)
+    gas_bench.add_options(parser)
+    gas_profile.add_options(parser)
+    rpc_profile.add_options(parser)
+    stress.add_options(parser)
+
+
+def pytest_configure(config):
+    cassette.configure(config)
+    fork_pool.configure(config)
+    gas_bench.configure(config)
+    gas_profile.configure(config)
+    # After the cassette, so that replayed requests are profiled too
+    rpc_profile.configure(config)
+    stress.configure(config)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(config, items):
+    fork_pool.group_by_currency(config, items)
+
 
 # Function scoped isolation fixture to enable xdist.
 # Snapshots the chain before each test and reverts after test completion.
@@ -19,8 +46,11 @@ def strat_ms(accounts):
     yield accounts.at("0x16388463d60FFE0661Cf7F1f31a7D658aC790ff7", force=True)
 
 @pytest.fixture
-def notional_proxy():
-    yield "0x1344A36A1B56144C3Bc62E7757377D288fDE0369"
+def notional_proxy(request):
+    if mocks.is_local():
+        yield request.getfixturevalue("mock_notional").address
+    else:
+        yield "0x1344A36A1B56144C3Bc62E7757377D288fDE0369"
 
 
 @pytest.fixture
@@ -52,24 +82,26 @@ def strategist(accounts):
 def keeper(accounts):
     yield accounts[5]
 
+# ABIs come from the on-disk cache in scripts/abi_cache.py, warm it with `brownie run abi_cache`
+# On a local chain every router is the mock proxy itself
 @pytest.fixture
-def n_proxy():
-    yield Contract.from_explorer("0x1344A36A1B56144C3Bc62E7757377D288fDE0369")
+def n_proxy(request, notional_proxy):
+    if mocks.is_local():
+        yield request.getfixturevalue("mock_notional")
+    else:
+        yield abi_cache.contract(notional_proxy)
 
 @pytest.fixture
 def n_proxy_views(n_proxy):
-    views_contract = Contract(n_proxy.VIEWS())
-    yield Contract.from_abi("VIEWS", n_proxy.address, views_contract.abi)
+    yield n_proxy if mocks.is_local() else abi_cache.router(n_proxy, "VIEWS")
 
 @pytest.fixture
 def n_proxy_batch(n_proxy):
-    batch_contract = Contract(n_proxy.BATCH_ACTION())
-    yield Contract.from_abi("BATCH", n_proxy.address, batch_contract.abi)
+    yield n_proxy if mocks.is_local() else abi_cache.router(n_proxy, "BATCH_ACTION")
 
 @pytest.fixture
 def n_proxy_account(n_proxy):
-    account_contract = Contract(n_proxy.ACCOUNT_ACTION())
-    yield Contract.from_abi("ACCOUNT", n_proxy.address, account_contract.abi)
+    yield n_proxy if mocks.is_local() else abi_cache.router(n_proxy, "ACCOUNT_ACTION")
 
 @pytest.fixture
 def n_proxy_implementation(n_proxy):
@@ -87,6 +119,8 @@ token_addresses = {
 }
 
 # TODO: uncomment those tokens you want to test as want
+# Function scoped: on a local chain the mocks are deployed inside every test's isolation snapshot,
+# a session scoped deployment would be reverted by fn_isolation or reset by module_isolation
 @pytest.fixture(
     params=[
         'WBTC', # WBTC
@@ -94,11 +128,16 @@ token_addresses = {
         'DAI', # DAI
         'USDC', # USDC
     ],
-    scope="session",
     autouse=True,
 )
-def token(request):
-    yield Contract(token_addresses[request.param])
+def token(request, accounts, MockERC20, MockWETH, MockMulticall2):
+    if mocks.is_local():
+        mocks.deploy_multicall(MockMulticall2, accounts[mocks.WHALE])
+        # around $10M worth of token for the local whale
+        whale_balance = round(10_000_000 / token_prices[request.param])
+        yield mocks.deploy_token(request.param, MockERC20, MockWETH, accounts[mocks.WHALE], whale_balance)
+    else:
+        yield Contract(token_addresses[request.param])
 
 currency_IDs = {
     "WETH": 1,
@@ -134,9 +173,21 @@ whale_addresses = {
 }
 
 
-@pytest.fixture(scope="session", autouse=True)
-def token_whale(token):
-    yield whale_addresses[token.symbol()]
+@pytest.fixture(autouse=True)
+def token_whale(token, accounts):
+    if mocks.is_local():
+        yield accounts[mocks.WHALE].address
+    else:
+        yield whale_addresses[token.symbol()]
+
+
+@pytest.fixture
+def mock_notional(token, accounts, MockNotionalProxy):
+    symbol = token.symbol()
+    yield mocks.deploy_notional(
+        MockNotionalProxy, token, currency_IDs[symbol], token_prices[symbol] / token_prices["WETH"],
+        accounts[mocks.WHALE]
+    )
 
 
 token_prices = {
@@ -151,25 +202,33 @@ token_prices = {
 
 
 @pytest.fixture(autouse=True)
-def amount(token, token_whale, user):
+def amount(token, user):
     # this will get the number of tokens (around $100k worth of token)
     amillion = round(100_000 / token_prices[token.symbol()])
     amount = amillion * 10 ** token.decimals()
-    # In order to get some funds for the token you are about to use,
-    # it impersonate a whale address
-    if amount > token.balanceOf(token_whale):
-        amount = token.balanceOf(token_whale)
-    token.transfer(user, amount, {"from": token_whale})
+    # The balance is written to the token's storage, see utils/funding.py
+    funding.fund(token, user, amount)
     yield amount
 
+
+# The whale moves the markets (actions.whale_drop_rates, buy_residuals), give it enough for the
+# thresholds instead of depending on its real balance
+@pytest.fixture(autouse=True)
+def whale_funds(token, token_whale, balance_threshold, million_in_token, currencyID):
+    needed = int(balance_threshold[0]) * 2 + 20 * million_in_token
+    funding.top_up(token, token_whale, needed)
+    if currencyID == 1:
+        funding.top_up_eth(token_whale, needed)
+
+
 @pytest.fixture(autouse=True)
 def million_in_token(token):
     yield round(1e6 / token_prices[token.symbol()]) * 10 ** token.decimals()
 
 @pytest.fixture
-def weth():
+def weth(MockWETH):
     token_address = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
-    yield Contract(token_address)
+    yield MockWETH.at(token_address) if mocks.is_local() else Contract(token_address)
 
 
 @pytest.fixture
@@ -196,7 +255,7 @@ def registry():
     yield Contract("0x50c1a2eA0a861A967D9d0FFE2AE4012c2E053804")
 
 
-@pytest.fixture(scope="session")
+@pytest.fixture
 def live_vault(registry, token):
     yield registry.latestVault(token)
 
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+from scripts import abi_cache
+
+ABI = [
+    {"name": "VIEWS", "type": "function", "stateMutability": "view", "inputs": [],
+     "outputs": [{"name": "", "type": "address"}]},
+]
+PROXY = "0x1344A36A1B56144C3Bc62E7757377D288fDE0369"
+IMPLEMENTATION = "0x" + "22" * 20
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    # An empty store, and fetches counted
+    monkeypatch.setattr(abi_cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(abi_cache, "_loaded", {})
+    fetches = []
+
+    def fetch(abi=ABI):
+        fetches.append(abi)
+        return ("NotionalProxy", abi)
+
+    return fetches, fetch
+
+
+def test_same_abi_same_key(cache, tmp_path):
+    (_, fetch) = cache
+    abi_cache.load(PROXY, IMPLEMENTATION, fetch)
+    # The same ABI with its keys in another order, under another address
+    reordered = [dict(reversed(list(entry.items()))) for entry in ABI]
+    abi_cache.load("0x" + "33" * 20, IMPLEMENTATION, lambda: fetch(reordered))
+    assert abi_cache._digest(reordered) == abi_cache._digest(ABI)
+    assert [path.name for path in (tmp_path / "abis").iterdir()] == [f"{abi_cache._digest(ABI)}.json"]
+    entries = [json.loads(path.read_text()) for path in (tmp_path / "index").iterdir()]
+    assert len(entries) == 2 and {entry["abi"] for entry in entries} == {abi_cache._digest(ABI)}
+
+
+def test_hit_on_second_load(cache, monkeypatch):
+    (fetches, fetch) = cache
+    assert abi_cache.load(PROXY, IMPLEMENTATION, fetch) == ("NotionalProxy", ABI)
+    # From memory, then from disk in a new session
+    assert abi_cache.load(PROXY, IMPLEMENTATION, fetch) == ("NotionalProxy", ABI)
+    monkeypatch.setattr(abi_cache, "_loaded", {})
+    assert abi_cache.load(PROXY, IMPLEMENTATION, fetch) == ("NotionalProxy", ABI)
+    assert len(fetches) == 1
+
+
+@pytest.mark.parametrize("content", ['[{"name": "VIEWS"', '[{"name": "BATCH_ACTION"}]'], ids=["truncated", "modified"])
+def test_corrupted_entry_fetched_again(cache, monkeypatch, tmp_path, content):
+    (fetches, fetch) = cache
+    abi_cache.load(PROXY, IMPLEMENTATION, fetch)
+    abi_path = tmp_path / "abis" / f"{abi_cache._digest(ABI)}.json"
+    abi_path.write_text(content)
+
+    monkeypatch.setattr(abi_cache, "_loaded", {})
+    assert abi_cache.load(PROXY, IMPLEMENTATION, fetch) == ("NotionalProxy", ABI)
+    assert len(fetches) == 2
+    # and the entry is repaired
+    assert json.loads(abi_path.read_text()) == ABI
@@ -0,0 +1,89 @@
+import pytest
+from utils import actions
+from notional_sim import MarketModel
+from notional_sim.backtest import SimulatedMarkets, SimulatedStrategy, SimulatedVault, run_backtest
+
+# checks that the simulated strategy replays the first harvest of the real one
+@pytest.mark.require_network("mainnet-fork")
+def test_simulated_harvest_matches_strategy(
+    chain, token, vault, strategy, user, amount, n_proxy_views, currencyID, RELATIVE_APPROX
+):
+    actions.user_deposit(user, vault, token, amount)
+    model = MarketModel.from_views(n_proxy_views, [currencyID])
+
+    sim_vault = SimulatedVault()
+    sim_vault.deposit(amount)
+    sim_strategy = SimulatedStrategy.for_cash_group(
+        sim_vault, model.cash_groups[currencyID], min_time_to_maturity=strategy.getMinTimeToMaturity()
+    )
+    assert sim_strategy.decimals_difference == strategy.DECIMALS_DIFFERENCE()
+
+    chain.sleep(1)
+    tx = strategy.harvest()
+    markets = SimulatedMarkets.from_model(model, currencyID)
+    assert sim_strategy.harvest(markets, tx.timestamp) is not None
+
+    account = n_proxy_views.getAccount(strategy)
+    (maturity, notional) = (account["portfolio"][0][1], account["portfolio"][0][3])
+    assert sim_strategy.maturity == strategy.getMaturity() == maturity
+    assert pytest.approx(sim_strategy.portfolio[maturity], rel=RELATIVE_APPROX) == notional
+    assert sim_vault.total_debt == vault.strategies(strategy)["totalDebt"]
+    assert pytest.approx(sim_strategy.estimated_total_assets(), rel=RELATIVE_APPROX) == strategy.estimatedTotalAssets()
+
+
+# A DAI-like cash group with two markets, no chain needed
+QUARTER = 90 * 86400
+START = 80 * QUARTER + 86400
+SYNTHETIC = {
+    "markets": {2: [
+        (b"\0" * 32, 81 * QUARTER, 10 ** 14, 5 * 10 ** 15, 10 ** 14, 50_000_000, 50_000_000, 0),
+        (b"\0" * 32, 82 * QUARTER, 2 * 10 ** 14, 10 ** 16, 10 ** 14, 60_000_000, 60_000_000, 0),
+    ]},
+    "cash_groups": {2: {"rate_scalars": [21, 21], "total_fee_bps": 30, "reserve_fee_share": 50,
+                        "asset_rate": 2 * 10 ** 26, "underlying_decimals": 10 ** 18}},
+}
+
+
+# checks the process pool runs every path, and the same seed gives the same results in and out of it
+def test_run_backtest_process_pool():
+    model = MarketModel.from_dict(SYNTHETIC)
+    kwargs = dict(n_quarters=2, withdraw_probability=0.2, realize_losses=True, chunk_size=3, seed=7)
+    pooled = run_backtest(model, 2, 8, 10 ** 22, START, processes=2, **kwargs)
+    assert all(len(values) == 8 for values in pooled.values())
+    assert (pooled["harvests"] > 0).all()
+    assert (pooled["total_gain"] > 0).any()
+
+    again = run_backtest(model, 2, 8, 10 ** 22, START, processes=2, **kwargs)
+    serial = run_backtest(model, 2, 8, 10 ** 22, START, processes=1, **kwargs)
+    for key in pooled:
+        assert (pooled[key] == again[key]).all()
+        assert (pooled[key] == serial[key]).all()
+    other = run_backtest(model, 2, 8, 10 ** 22, START, processes=2, **dict(kwargs, seed=8))
+    assert not (other["pnl"] == pooled["pnl"]).all()
+
+
+# checks a settlement is only counted when a matured position is settled
+def test_settlements_counted_at_maturity():
+    model = MarketModel.from_dict(SYNTHETIC)
+    rates = [50_000_000, 60_000_000]
+    vault = SimulatedVault()
+    vault.deposit(10 ** 22)
+    strategy = SimulatedStrategy.for_cash_group(vault, model.cash_groups[2], min_time_to_maturity=0)
+
+    # An empty portfolio has nothing to settle
+    assert strategy.harvest(SimulatedMarkets.at_time(model, 2, START, rates), START) is not None
+    assert strategy.settlements == 0 and strategy.trades == 1
+    maturity = strategy.maturity
+    assert maturity == 81 * QUARTER
+    for time in (START + 86400, maturity - 86400):
+        assert strategy.harvest(SimulatedMarkets.at_time(model, 2, time, rates), time) is not None
+    assert strategy.settlements == 0
+
+    vault.debt_ratio = 0
+    time = maturity + 86400
+    assert strategy.harvest(SimulatedMarkets.at_time(model, 2, time, rates), time) is not None
+    assert strategy.settlements == 1
+    assert strategy.portfolio == {}
+    time += 86400
+    assert strategy.harvest(SimulatedMarkets.at_time(model, 2, time, rates), time) is not None
+    assert strategy.settlements == 1
@@ -0,0 +1,26 @@
+from utils import actions
+from notional_sim import calendar
+from notional_sim.constants import QUARTER
+
+# checks the offline settlement calendar against Notional's active markets
+def test_calendar_matches_active_markets(
+    chain, token, currencyID, n_proxy_views, n_proxy_implementation, n_proxy_batch, user, token_whale,
+    million_in_token
+):
+    active_markets = n_proxy_views.getActiveMarkets(currencyID)
+    maturities = calendar.active_maturities(chain.time(), len(active_markets))
+    assert [market[1] for market in active_markets] == maturities
+
+    # Two quarters ahead: one intermediary settlement, then markets initialized on arrival
+    height = chain.height
+    jumps = calendar.plan(chain.time(), maturities[1] + 1)
+    assert len(jumps) == 2
+    actions.settle_until(maturities[1], currencyID, n_proxy_implementation, user, n_proxy_batch,
+        token, token_whale, million_in_token)
+
+    active_markets = n_proxy_views.getActiveMarkets(currencyID)
+    assert [market[1] for market in active_markets] == calendar.active_maturities(chain.time(), len(active_markets))
+    assert active_markets[0][1] == maturities[1] + QUARTER
+    # A block per jump and per initializeMarkets, plus approve, jump and trade for the residuals
+    residuals = 3 if currencyID == 2 or currencyID == 3 else 0
+    assert chain.height - height <= len(jumps) * 2 + residuals
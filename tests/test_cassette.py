@@ -0,0 +1,87 @@
+import gzip
+import json
+
+import pytest
+from brownie.network.state import Chain
+from web3.providers.rpc import HTTPProvider
+from notional_sim import rpc
+from utils import cassette
+
+
+def _node(monkeypatch):
+    # Stands in for the node behind HTTPProvider, its block number goes up on every request. The
+    # plugin patches HTTPProvider, Chain and rpc, monkeypatch restores them after the test
+    sent = []
+
+    def make_request(provider, method, params):
+        sent.append((method, params))
+        return {"jsonrpc": "2.0", "id": len(sent), "result": hex(len(sent))}
+
+    monkeypatch.setattr(HTTPProvider, "make_request", make_request)
+    monkeypatch.setattr(Chain, "time", Chain.time)
+    monkeypatch.setattr(rpc, "batch", rpc.batch)
+    return sent
+
+
+REQUESTS = [
+    ("eth_blockNumber", []),
+    ("eth_call", [{"to": "0x" + "11" * 20, "data": "0x70a08231"}, "0x10"]),
+    ("eth_blockNumber", []),
+]
+
+
+def _record(monkeypatch, path):
+    sent = _node(monkeypatch)
+    plugin = cassette.CassettePlugin(None, path, "record")
+    provider = HTTPProvider("http://127.0.0.1:8545")
+    responses = [provider.make_request(method, params) for (method, params) in REQUESTS]
+    plugin.pytest_sessionfinish(None)
+    assert sent == REQUESTS
+    return responses
+
+
+def test_record_replay_round_trip(monkeypatch, tmp_path):
+    path = str(tmp_path / "suite.json.gz")
+    recorded = _record(monkeypatch, path)
+
+    sent = _node(monkeypatch)
+    plugin = cassette.CassettePlugin(None, path, "replay")
+    provider = HTTPProvider("http://127.0.0.1:8545")
+    replayed = [provider.make_request(method, params) for (method, params) in REQUESTS]
+    # Nothing reaches the node, identical requests get their responses back in recorded order
+    assert sent == []
+    assert [r["result"] for r in replayed] == [r["result"] for r in recorded] == ["0x1", "0x2", "0x3"]
+    assert plugin.requests == len(REQUESTS)
+
+
+def test_replay_miss(monkeypatch, tmp_path):
+    path = str(tmp_path / "suite.json.gz")
+    _record(monkeypatch, path)
+
+    _node(monkeypatch)
+    cassette.CassettePlugin(None, path, "replay")
+    provider = HTTPProvider("http://127.0.0.1:8545")
+    # A request that was never recorded, then one more than recorded
+    with pytest.raises(cassette.CassetteMiss):
+        provider.make_request("eth_getBalance", ["0x" + "11" * 20, "latest"])
+    for _ in range(2):
+        provider.make_request("eth_blockNumber", [])
+    with pytest.raises(cassette.CassetteMiss):
+        provider.make_request("eth_blockNumber", [])
+
+
+def test_cassette_version(tmp_path):
+    path = str(tmp_path / "suite.json.gz")
+    recorded = cassette.Cassette(path)
+    recorded.record("eth_chainId", [], {"jsonrpc": "2.0", "id": 1, "result": "0x1"})
+    recorded.save()
+    with gzip.open(path, "rt") as fp:
+        data = json.load(fp)
+    assert data["version"] == cassette.CASSETTE_VERSION
+    assert cassette.Cassette(path).load().next("eth_chainId", [])["result"] == "0x1"
+
+    data["version"] = cassette.CASSETTE_VERSION + 1
+    with gzip.open(path, "wt") as fp:
+        json.dump(data, fp)
+    with pytest.raises(ValueError, match="Unsupported cassette version"):
+        cassette.Cassette(path).load()
@@ -1,4 +1,4 @@
-from utils import actions, checks, utils
+from utils import actions, utils
 import pytest
 
 # tests changing the minAmountToMaturity state variable
@@ -33,12 +33,8 @@ def test_change_maturity(
     assert len(account["portfolio"]) == 1
     assert account["portfolio"][0][1] > next_settlement
     
-    actions.initialize_intermediary_markets(n_proxy_views, currencyID, n_proxy_implementation, user, 
-        account["portfolio"][0][1], n_proxy_batch, token, token_whale, n_proxy_account, million_in_token)
-    chain.sleep(account["portfolio"][0][1] - chain.time() +1)
-    chain.mine(1)
-    
-    checks.check_active_markets(n_proxy_views, currencyID, n_proxy_implementation, user)
+    actions.settle_until(account["portfolio"][0][1], currencyID, n_proxy_implementation, user,
+        n_proxy_batch, token, token_whale, million_in_token)
 
     account = n_proxy_views.getAccount(strategy)
     vault.updateStrategyDebtRatio(strategy, 0, {"from":vault.governance()})
@@ -1,3 +1,4 @@
+import brownie
 from utils import actions, checks, utils
 import pytest
 
@@ -25,3 +26,26 @@ def test_clone(
     # Sleep until maturity so the user can withdraw without reaching max_loss from the vault
     chain.sleep(account[0][0] - chain.time() + 1)
     chain.mine(1)
+
+
+# tests cloning several strategies in one transaction
+def test_clone_batch(Strategy, vault, strategy, strategist, rewards, keeper, guardian, notional_proxy, currencyID, gov):
+    params = [(vault, currencyID, keeper), (vault, currencyID, guardian)]
+    tx = strategy.cloneStrategies(params, strategist, rewards, notional_proxy, {"from": strategist})
+
+    clones = [Strategy.at(address) for address in tx.return_value]
+    assert [event["clone"] for event in tx.events["Cloned"]] == list(tx.return_value)
+    for (clone, (_, _, clone_keeper)) in zip(clones, params):
+        assert clone.vault() == vault
+        assert clone.currencyID() == currencyID
+        assert clone.keeper() == clone_keeper
+        assert clone.strategist() == strategist
+        assert clone.DECIMALS_DIFFERENCE() == strategy.DECIMALS_DIFFERENCE()
+
+    # Clones are initialized only once
+    with brownie.reverts():
+        clones[0].initialize(vault, strategist, rewards, keeper, notional_proxy, currencyID, {"from": strategist})
+
+    vault.revokeStrategy(strategy, {"from": gov})
+    vault.addStrategy(clones[0], 10_000, 0, 2 ** 256 - 1, 0, {"from": gov})
+    assert vault.strategies(clones[0])["activation"] > 0
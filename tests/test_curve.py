@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from notional_sim.constants import DAY
+from notional_sim import rpc
+from notional_sim.curve import CurveCache, YieldCurves
+
+
+def test_curve_interpolation():
+    curves = YieldCurves([[90 * DAY, 180 * DAY, 360 * DAY], [90 * DAY, 360 * DAY, np.nan]],
+                         [[50e6, 60e6, 70e6], [40e6, 80e6, np.nan]])
+    rates = curves.rates([30 * DAY, 90 * DAY, 135 * DAY, 360 * DAY, 720 * DAY])
+    # Flat before the first and after the last market, through every market
+    assert rates[0].tolist() == pytest.approx([50e6, 50e6, (50e6 * 90 + 60e6 * 180) / 2 / 135, 70e6, 70e6])
+    between = (40e6 * 90 + (80e6 * 360 - 40e6 * 90) * 45 / 270) / 135
+    assert rates[1].tolist() == pytest.approx([40e6, 40e6, between, 80e6, 80e6])
+    # Forwards are constant between markets and compound back to the rates
+    assert curves.forward_rates(90 * DAY, 180 * DAY)[0, 0] == pytest.approx(70e6)
+    assert curves.discount_factors(360 * DAY)[0, 0] == pytest.approx(np.exp(-0.07))
+
+
+# checks the curves go through the markets of every block
+def test_curves_match_markets(chain, n_proxy_views, currencyID, monkeypatch):
+    blocks = [chain.height]
+    chain.sleep(10 * DAY)
+    chain.mine(1)
+    blocks.append(chain.height)
+
+    # Every missing block is fetched in one batch
+    batches = []
+    batch = rpc.batch
+    monkeypatch.setattr(rpc, "batch", lambda provider, requests: batches.append(requests) or batch(provider, requests))
+    cache = CurveCache(n_proxy_views)
+    curves = cache.curves(currencyID, blocks)
+    assert [len(requests) for requests in batches] == [2 * len(blocks)]
+    times = [chain[block].timestamp for block in blocks]
+    for (i, block) in enumerate(blocks):
+        markets = n_proxy_views.getActiveMarkets(currencyID, block_identifier=block)
+        rates = curves.rates_at_maturities([m[1] for m in markets], times)[i]
+        assert rates == pytest.approx([m[6] for m in markets])
+
+    cache.curves(currencyID, blocks)
+    assert cache.entries.hits == len(blocks)
+    assert len(batches) == 1
@@ -0,0 +1,25 @@
+from brownie._config import CONFIG
+from utils import fork_pool
+
+
+class _Config:
+    def getoption(self, name, default=None):
+        return {"network": "pool-fork"}.get(name, default)
+
+
+# checks that every worker connects to the port brownie launches its fork on
+def test_configure_fork_ports(monkeypatch):
+    upstream = "https://eth.example/rpc"
+    ports = {}
+    for worker in range(3):
+        networks = {"pool-fork": {"host": "http://127.0.0.1", "cmd_settings": {"port": 8545, "fork": upstream}}}
+        monkeypatch.setattr(CONFIG, "networks", networks)
+        port = fork_pool.configure_fork(_Config(), f"gw{worker}", 14_000_000)
+        # PytestBrownieXdistRunner offsets the launch port by the worker index
+        cmd_settings = networks["pool-fork"]["cmd_settings"]
+        cmd_settings["port"] += worker
+        assert port == cmd_settings["port"]
+        assert networks["pool-fork"]["host"] == f"http://127.0.0.1:{port}"
+        assert cmd_settings["fork"] == f"{upstream}@14000000"
+        ports[worker] = port
+    assert ports == {0: 8545, 1: 8546, 2: 8547}
@@ -0,0 +1,86 @@
+from utils import actions
+import pytest
+
+# Gas of every harvest path, per currency (WETH also covers the ETH wrap / unwrap of currencyID 1).
+# Only runs with --gas-benchmark, see tests/utils/gas_bench.py
+pytestmark = pytest.mark.gas
+
+
+def lend(chain, token, vault, strategy, user, strategist, amount):
+    actions.user_deposit(user, vault, token, amount)
+    chain.sleep(1)
+    return strategy.harvest({"from": strategist})
+
+
+def test_gas_lend(chain, token, vault, strategy, user, strategist, amount, gas_benchmark):
+    # adjustPosition: deposit the want balance and lend
+    gas_benchmark("lend", lend(chain, token, vault, strategy, user, strategist, amount))
+
+
+def test_gas_idle_harvest(chain, token, vault, strategy, user, strategist, amount, gas_benchmark):
+    # Nothing matured, nothing to repay and no want to invest: the FCASH_SCALING remainder the lend
+    # leaves in the strategy is under minAmountWant
+    lend(chain, token, vault, strategy, user, strategist, amount)
+    strategy.setMinAmountWant(token.balanceOf(strategy) + 1, {"from": strategist})
+    chain.sleep(1)
+    tx = gas_benchmark("idle", strategy.harvest({"from": strategist}))
+    assert "LendBorrowTrade" not in tx.events
+
+
+def test_gas_settle_and_withdraw(
+    chain, token, vault, strategy, user, strategist, amount, n_proxy_views, currencyID,
+    n_proxy_implementation, n_proxy_batch, token_whale, million_in_token, gas_benchmark
+):
+    # _checkPositionsAndWithdraw: settle the matured position and return everything to the vault
+    lend(chain, token, vault, strategy, user, strategist, amount)
+    maturity = n_proxy_views.getAccount(strategy)[0][0]
+    actions.settle_until(maturity, currencyID, n_proxy_implementation, user, n_proxy_batch,
+        token, token_whale, million_in_token)
+    vault.updateStrategyDebtRatio(strategy, 0, {"from": vault.governance()})
+    gas_benchmark("settle_withdraw", strategy.harvest({"from": strategist}))
+    chain.sleep(3600 * 6)
+    chain.mine(1)
+
+
+def test_gas_rollover(chain, token, vault, strategy, user, strategist, amount, n_proxy_views, gas_benchmark):
+    # _rollOverTrade: the position's market is now too short, it is closed and re-lent with new want
+    strategy.setMinTimeToMaturity(0, {"from": vault.governance()})
+    lend(chain, token, vault, strategy, user, strategist, int(amount / 2))
+    next_settlement = n_proxy_views.getAccount(strategy)[0][0]
+    actions.user_deposit(user, vault, token, int(amount / 2))
+    strategy.setMinTimeToMaturity(30 * 86400, {"from": vault.governance()})
+    actions.wait_until_settlement(next_settlement)
+    gas_benchmark("rollover", strategy.harvest({"from": strategist}))
+
+
+@pytest.mark.parametrize("debt_ratio,path", [(5_000, "partial_liquidation"), (0, "full_liquidation")])
+def test_gas_liquidation(
+    chain, token, vault, strategy, user, strategist, gov, amount, debt_ratio, path, gas_benchmark
+):
+    # liquidatePosition before maturity, realizing losses
+    lend(chain, token, vault, strategy, user, strategist, amount)
+    chain.sleep(1)
+    vault.updateStrategyDebtRatio(strategy, debt_ratio, {"from": vault.governance()})
+    strategy.setToggleRealizeLosses(True, {"from": gov})
+    gas_benchmark(path, strategy.harvest({"from": strategist}))
+    vault.withdraw(vault.balanceOf(user), user, 10_000, {"from": user})
+
+
+@pytest.mark.parametrize("weights", [[5_000, 5_000], [4_000, 3_000, 3_000]], ids=["2", "3"])
+def test_gas_lend_ladder(chain, token, vault, strategy, user, strategist, gov, amount, weights, gas_benchmark):
+    # adjustPosition lending into one market per weight in one batch action, compare with "lend"
+    strategy.setLadderWeights(weights, {"from": gov})
+    gas_benchmark(f"lend_ladder_{len(weights)}", lend(chain, token, vault, strategy, user, strategist, amount))
+
+
+def test_gas_ladder_rollover(chain, token, vault, strategy, user, strategist, gov, amount, n_proxy_views,
+    gas_benchmark):
+    # _rollOverTrade: the shortest leg of a two market ladder is closed and re-lent over the ladder
+    strategy.setLadderWeights([5_000, 5_000], {"from": gov})
+    strategy.setMinTimeToMaturity(0, {"from": vault.governance()})
+    lend(chain, token, vault, strategy, user, strategist, int(amount / 2))
+    next_settlement = n_proxy_views.getAccount(strategy)[0][0]
+    actions.user_deposit(user, vault, token, int(amount / 2))
+    strategy.setMinTimeToMaturity(30 * 86400, {"from": vault.governance()})
+    actions.wait_until_settlement(next_settlement)
+    gas_benchmark("ladder_rollover", strategy.harvest({"from": strategist}))
@@ -0,0 +1,32 @@
+from utils import actions
+import pytest
+from scripts.gas_profile import INTRINSIC, GasProfile
+
+
+# checks every harvest's gas is attributed once, to the strategy's internal functions and Notional's calls
+@pytest.mark.require_network("mainnet-fork")
+def test_gas_profile_harvests(chain, token, vault, strategy, user, gov, amount, tmp_path):
+    profile = GasProfile()
+    with profile.collect(["Strategy.harvest"]):
+        actions.user_deposit(user, vault, token, amount)
+        chain.sleep(1)
+        tx = strategy.harvest({"from": gov})
+        chain.sleep(1)
+        tx2 = strategy.harvest({"from": gov})
+    # Only harvests are profiled
+    assert profile.count() == 2
+    assert sum(profile.folded.values()) == tx.gas_used + tx2.gas_used
+
+    functions = profile.functions()
+    assert functions["Strategy.harvest"]["total"] == tx.gas_used + tx2.gas_used
+    assert functions["Strategy.adjustPosition"]["calls"] >= 2
+    assert functions[INTRINSIC]["self"] > 0
+    # Notional's calls are frames under the strategy's
+    assert any(len(stack) > 2 and not stack[-1].startswith("Strategy.") for stack in profile.folded)
+
+    profile.write_folded(tmp_path / "profile.folded")
+    profile.save(tmp_path / "profile.json")
+    loaded = GasProfile.load(tmp_path / "profile.json")
+    assert loaded.functions() == functions
+    lines = (tmp_path / "profile.folded").read_text().splitlines()
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) == tx.gas_used + tx2.gas_used
@@ -0,0 +1,51 @@
+from collections import Counter
+
+from utils import actions
+
+# The harvest values the strategy's positions once (PortfolioSnapshot in Strategy.sol): each Notional
+# view used to value the portfolio is called once per harvest, whatever the path. adjustPosition, which
+# BaseStrategy.harvest calls after the vault's report, reads the active markets once more
+
+
+def notional_calls(tx, notional_proxy, vault):
+    # Calls to every Notional function made by the transaction, before and after the vault's report
+    (before, after) = (Counter(), Counter())
+    calls = before
+    for call in tx.subcalls:
+        if call["to"] == vault.address and call.get("function", "").split(".")[-1].startswith("report"):
+            calls = after
+        if call["to"] == notional_proxy and "function" in call:
+            calls[call["function"].split(".")[-1].split("(")[0]] += 1
+    return (before, after)
+
+
+def test_lend_harvest_calls(chain, token, vault, strategy, user, strategist, amount, notional_proxy):
+    actions.user_deposit(user, vault, token, amount)
+    chain.sleep(1)
+    tx = strategy.harvest({"from": strategist})
+
+    (before, after) = notional_calls(tx, notional_proxy, vault)
+    assert before["getAccountPortfolio"] + after["getAccountPortfolio"] == 1
+    # One snapshot in prepareReturn, one for the markets adjustPosition enters
+    assert before["getActiveMarkets"] == 1
+    assert after["getActiveMarkets"] == 1
+
+
+def test_liquidating_harvest_calls(chain, token, vault, strategy, user, strategist, amount, notional_proxy, gov):
+    actions.user_deposit(user, vault, token, amount)
+    chain.sleep(1)
+    strategy.harvest({"from": strategist})
+
+    # Harvest 2: close the position early, the liquidation reuses prepareReturn's snapshot
+    chain.sleep(1)
+    vault.updateStrategyDebtRatio(strategy, 0, {"from": vault.governance()})
+    strategy.setToggleRealizeLosses(True, {"from": gov})
+    tx = strategy.harvest({"from": strategist})
+
+    (before, after) = notional_calls(tx, notional_proxy, vault)
+    assert before["getAccountContext"] == 1
+    assert before["getAccountPortfolio"] == 1
+    assert before["getCashAmountGivenfCashAmount"] == 1
+    assert before["getActiveMarkets"] == 1
+    # adjustPosition only reads the markets if want is left over the debt outstanding after the report
+    assert after["getActiveMarkets"] == (1 if token.balanceOf(strategy) > vault.debtOutstanding(strategy) else 0)
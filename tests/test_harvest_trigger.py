@@ -0,0 +1,53 @@
+from utils import actions
+
+
+def test_trigger_idle_funds(chain, token, vault, strategy, user, strategist, amount):
+    strategy.setMaxReportDelay(2 ** 64, {"from": strategist})
+    assert strategy.harvestTrigger(0) == False
+
+    # Vault credit over minAmountWant is invested by the harvest, if it is worth its cost
+    actions.user_deposit(user, vault, token, amount)
+    assert strategy.harvestTrigger(0) == True
+    assert strategy.harvestTrigger(10 ** 30) == False
+
+    chain.sleep(1)
+    strategy.harvest({"from": strategist})
+    chain.sleep(1)
+    chain.mine(1)
+    assert strategy.harvestTrigger(0) == False
+
+
+def test_trigger_settlement(
+    chain, token, vault, strategy, user, strategist, amount, n_proxy_views, currencyID,
+    n_proxy_implementation, n_proxy_batch, token_whale, million_in_token
+):
+    strategy.setMaxReportDelay(2 ** 64, {"from": strategist})
+    actions.user_deposit(user, vault, token, amount)
+    chain.sleep(1)
+    strategy.harvest({"from": strategist})
+
+    # Before maturity there is nothing to do
+    maturity = n_proxy_views.getAccount(strategy)[0][0]
+    actions.wait_half_until_settlement(maturity)
+    assert strategy.harvestTrigger(0) == False
+
+    # Once it matured the harvest settles the position
+    actions.settle_until(maturity, currencyID, n_proxy_implementation, user, n_proxy_batch,
+        token, token_whale, million_in_token)
+    assert strategy.harvestTrigger(0) == True
+    assert strategy.harvestTrigger(10 ** 30) == False
+
+    strategy.harvest({"from": strategist})
+    chain.sleep(1)
+    chain.mine(1)
+    assert strategy.harvestTrigger(0) == False
+
+
+def test_trigger_debt_outstanding(chain, token, vault, strategy, user, strategist, amount):
+    strategy.setMaxReportDelay(2 ** 64, {"from": strategist})
+    actions.user_deposit(user, vault, token, amount)
+    chain.sleep(1)
+    strategy.harvest({"from": strategist})
+
+    vault.updateStrategyDebtRatio(strategy, 0, {"from": vault.governance()})
+    assert strategy.harvestTrigger(10 ** 30) == True
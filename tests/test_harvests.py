@@ -1,4 +1,5 @@
 from utils import actions, checks, utils
+from scripts import multicall
 import pytest
 
 # tests harvesting a strategy that returns profits correctly
@@ -20,7 +21,8 @@ def test_profitable_harvest(
     chain.sleep(1)
     strategy.harvest({"from": strategist})
 
-    account = n_proxy_views.getAccount(strategy)
+    snapshot = multicall.strategy_snapshot(vault, strategy, token, n_proxy_views, currencyID)
+    account = snapshot["account"]
     next_settlement = account[0][0]
 
     assert pytest.approx(account[2][0][3], rel=RELATIVE_APPROX) == amount_fcash
@@ -31,7 +33,7 @@ def test_profitable_harvest(
         min_market_index,
         chain.time()+1
         )[1] * strategy.DECIMALS_DIFFERENCE() / MAX_BPS
-    total_assets = strategy.estimatedTotalAssets()
+    total_assets = snapshot["estimatedTotalAssets"]
     
     assert pytest.approx(total_assets, rel=RELATIVE_APPROX) == position_cash
     
@@ -70,18 +72,16 @@ def test_profitable_harvest(
     strategy.setToggleRealizeLosses(True, {"from":gov})
     tx2 = strategy.harvest()
 
-    account = n_proxy_views.getAccount(strategy)
+    snapshot = multicall.strategy_snapshot(vault, strategy, token, n_proxy_views, currencyID)
+    account = snapshot["account"]
 
-    assert amount == (tx2.events["Harvested"]["loss"] + token.balanceOf(vault))
-    assert (token.balanceOf(vault) + account[2][0][3] * strategy.DECIMALS_DIFFERENCE() / MAX_BPS) > amount
+    assert amount == (tx2.events["Harvested"]["loss"] + snapshot["vaultBalance"])
+    assert (snapshot["vaultBalance"] + account[2][0][3] * strategy.DECIMALS_DIFFERENCE() / MAX_BPS) > amount
     
 
     # Harvest 3: wait until maturity to settle and withdraw profits
-    actions.initialize_intermediary_markets(n_proxy_views, currencyID, n_proxy_implementation, user, 
-        account[0][0], n_proxy_batch, token, token_whale, n_proxy_account, million_in_token)
-    chain.sleep(account[0][0] - chain.time() + 1)
-    chain.mine(1)
-    checks.check_active_markets(n_proxy_views, currencyID, n_proxy_implementation, user)
+    actions.settle_until(account[0][0], currencyID, n_proxy_implementation, user,
+        n_proxy_batch, token, token_whale, million_in_token)
 
     account = n_proxy_views.getAccount(strategy)
     
@@ -93,14 +93,16 @@ def test_profitable_harvest(
     
     chain.sleep(3600 * 6)  # 6 hrs needed for profits to unlock
     chain.mine(1)
-    balance = token.balanceOf(vault.address)  # Profits go to vault
+    snapshot = multicall.strategy_snapshot(vault, strategy, token, n_proxy_views, currencyID)
+    balance = snapshot["vaultBalance"]  # Profits go to vault
     print("ETH Balance is ", vault.balance())
-    print("Vault assets 2: ", vault.totalAssets())
+    print("Vault assets 2: ", snapshot["vaultTotalAssets"])
     assert balance >= amount
-    assert vault.pricePerShare() > before_pps
+    assert snapshot["pricePerShare"] > before_pps
 
 
 # # tests harvesting a strategy that reports losses
+@pytest.mark.require_network("mainnet-fork")
 def test_lossy_harvest(
     chain, accounts, token, vault, strategy, user, strategist, amount, RELATIVE_APPROX, MAX_BPS,
     n_proxy_views, n_proxy_batch, token_whale, currencyID, balance_threshold, n_proxy_implementation, gov
@@ -153,9 +155,10 @@ def test_lossy_harvest(
 
 # tests harvesting a strategy twice, once with loss and another with profit
 # it checks that even with previous profit and losses, accounting works as expected
+@pytest.mark.require_network("mainnet-fork")
 def test_choppy_harvest(
     chain, accounts, token, vault, strategy, user, strategist, amount, RELATIVE_APPROX, MAX_BPS,
-    n_proxy_views, n_proxy_batch, token_whale, currencyID, n_proxy_account, n_proxy_implementation,
+    n_proxy_views, n_proxy_batch, token_whale, currencyID, n_proxy_implementation,
     balance_threshold, gov, million_in_token
 ):
     # Deposit to the vault
@@ -189,10 +192,9 @@ def test_choppy_harvest(
 
     # Harvest 3: Realize profit on the rest of the position
     print("TA 1: ", strategy.estimatedTotalAssets())
-    actions.initialize_intermediary_markets(n_proxy_views, currencyID, n_proxy_implementation, user,
-        account[0][0], n_proxy_batch, token, token_whale, n_proxy_account, million_in_token)
-    chain.sleep(next_settlement - chain.time() - 100)
-    chain.mine(1)
+    actions.initialize_intermediary_markets(currencyID, n_proxy_implementation, user,
+        account[0][0], n_proxy_batch, token, token_whale, million_in_token)
+    actions.jump_to(next_settlement - 100)
     checks.check_active_markets(n_proxy_views, currencyID, n_proxy_implementation, user)
     print("TA 2: ", strategy.estimatedTotalAssets())
     position_cash = strategy.estimatedTotalAssets()
@@ -206,8 +208,9 @@ def test_choppy_harvest(
 
     chain.sleep(3600 * 6)  # 6 hrs needed for profits to unlock
     chain.mine(1)
-    assert pytest.approx(vault.strategies(strategy)["totalLoss"], rel=RELATIVE_APPROX) == loss_amount
-    assert pytest.approx(vault.strategies(strategy)["totalGain"], rel=RELATIVE_APPROX) == realized_profit
+    params = multicall.strategy_snapshot(vault, strategy, token, n_proxy_views, currencyID)["params"]
+    assert pytest.approx(params["totalLoss"], rel=RELATIVE_APPROX) == loss_amount
+    assert pytest.approx(params["totalGain"], rel=RELATIVE_APPROX) == realized_profit
 
     vault.withdraw({"from": user})
 
@@ -249,16 +252,13 @@ def test_maturity_harvest(
     
     # Add some code before harvest #2 to simulate earning yield
     actions.wait_until_settlement(next_settlement)
-    actions.initialize_intermediary_markets(n_proxy_views, currencyID, n_proxy_implementation, user, 
-        account[0][0], n_proxy_batch, token, token_whale, n_proxy_account, million_in_token)
-    checks.check_active_markets(n_proxy_views, currencyID, n_proxy_implementation, user)
-    chain.sleep(next_settlement - chain.time() + 1)
-    chain.mine(1)
-    checks.check_active_markets(n_proxy_views, currencyID, n_proxy_implementation, user)
-    totalAssets = strategy.estimatedTotalAssets()
+    actions.settle_until(next_settlement, currencyID, n_proxy_implementation, user,
+        n_proxy_batch, token, token_whale, million_in_token)
+    snapshot = multicall.strategy_snapshot(vault, strategy, token, n_proxy_views, currencyID)
+    totalAssets = snapshot["estimatedTotalAssets"]
     position_cash = account[2][0][3] * strategy.DECIMALS_DIFFERENCE() / MAX_BPS
 
-    assert pytest.approx(position_cash+token.balanceOf(strategy), rel=RELATIVE_APPROX) == totalAssets
+    assert pytest.approx(position_cash+snapshot["wantBalance"], rel=RELATIVE_APPROX) == totalAssets
     profit_amount = totalAssets - amount
     assert profit_amount > 0
     
@@ -268,8 +268,9 @@ def test_maturity_harvest(
 
     chain.sleep(3600 * 6)  # 6 hrs needed for profits to unlock
     chain.mine(1)
-    assert vault.strategies(strategy)["totalLoss"] == 0
-    assert vault.strategies(strategy)["totalGain"] >= profit_amount
+    params = multicall.strategy_snapshot(vault, strategy, token, n_proxy_views, currencyID)["params"]
+    assert params["totalLoss"] == 0
+    assert params["totalGain"] >= profit_amount
     
     vault.withdraw({"from": user})
 
@@ -0,0 +1,52 @@
+from brownie import chain
+import numpy as np
+from notional_sim import events
+from scripts import indexer
+from utils import actions
+import pytest
+
+
+def test_incremental_sync(tmp_path, token, vault, strategy, user, strategist, amount):
+    start = chain.height
+    actions.user_deposit(user, vault, token, amount)
+    chain.sleep(1)
+    first = strategy.harvest({"from": strategist})
+
+    store = events.EventStore(tmp_path)
+    added = indexer.sync(store, [strategy.address], from_block=start, confirmations=0)
+    assert added["harvested"] == 1 and added["strategy_reported"] == 1
+    # The harvest lent the deposit
+    assert added["lend_borrow_trade"] == 1
+    assert store.select("lend_borrow_trade", strategy=strategy.address)["net_fcash"][0] > 0
+
+    # Resumes from the last indexed block, from disk
+    chain.sleep(3600)
+    second = strategy.harvest({"from": strategist})
+    store = events.EventStore(tmp_path)
+    added = indexer.sync(store, [strategy.address], confirmations=0)
+    assert added["harvested"] == 1
+    assert indexer.sync(store, [strategy.address], confirmations=0)["harvested"] == 0
+
+    harvested = store.select("harvested", currency=strategy.currencyID())
+    assert harvested["block"].tolist() == [first.block_number, second.block_number]
+    for (i, tx) in enumerate((first, second)):
+        assert harvested["profit"][i] == pytest.approx(tx.events["Harvested"]["profit"])
+        assert harvested["debt_payment"][i] == pytest.approx(tx.events["Harvested"]["debtPayment"])
+
+    (timestamps, total_debt) = store.series("strategy_reported", "total_debt", strategy=strategy.address)
+    assert total_debt[-1] == pytest.approx(vault.strategies(strategy)["totalDebt"])
+    assert len(store.realised_returns(strategy=strategy.address)["apr"]) == 2
+
+
+# checks several appends to a table before one commit are all kept
+def test_append_before_commit(tmp_path):
+    store = events.EventStore(tmp_path)
+    columns = events.schema("harvested")
+
+    def batch(n, block):
+        return {column: np.full(n, block if column == "block" else 0) for column in columns}
+
+    store.append("harvested", batch(2, 1))
+    store.append("harvested", batch(3, 2))
+    store.commit(2)
+    assert list(events.EventStore(tmp_path).table("harvested")["block"]) == [1, 1, 2, 2, 2]
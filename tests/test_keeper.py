@@ -0,0 +1,60 @@
+import asyncio
+
+from brownie import web3
+from scripts import keeper as daemon
+from utils import actions
+
+
+async def _poll(strategy, signer, rounds):
+    # Runs the keeper for a few rounds, returns what every round sent and the final metrics
+    async with daemon.RPC(web3.provider.endpoint_uri) as rpc:
+        # No harvest gas: callCost is 0 whatever the node's gas price
+        k = daemon.Keeper(rpc, [daemon.Job(strategy.address, daemon.Signer(signer.address))], harvest_gas=0)
+        await k.setup()
+        sent = [await k.run_once() for _ in range(rounds)]
+        return sent, k.metrics()
+
+
+async def _state(strategy, call_cost):
+    async with daemon.RPC(web3.provider.endpoint_uri) as rpc:
+        job = daemon.Job(strategy.address, None)
+        await daemon.Keeper(rpc, [job]).setup()
+        block = web3.eth.block_number
+        return await daemon.read_state(rpc, job, block, call_cost), web3.eth.get_block(block).timestamp
+
+
+def test_keeper_harvests_idle_funds(chain, token, vault, strategy, user, strategist, keeper, amount):
+    strategy.setMaxReportDelay(2 ** 64, {"from": strategist})
+    actions.user_deposit(user, vault, token, amount)
+    chain.sleep(1)
+    chain.mine(1)
+
+    (sent, metrics) = asyncio.run(_poll(strategy, keeper, 2))
+
+    # Invested on the first round, nothing left to do on the second
+    assert sent == [{strategy.address: "idle_funds"}, {}]
+    assert strategy.getMaturity() > 0
+    stats = metrics["strategies"][strategy.address]
+    assert stats["polls"] == 2
+    assert stats["sent"] == {"idle_funds": 1}
+    assert stats["errors"] == 0 and stats["reverted"] == 0
+    assert metrics["signers"][keeper.address] == {"in_flight": 0, "waiting": 0}
+
+
+def test_harvest_due_matches_trigger(chain, token, vault, strategy, user, strategist, amount):
+    strategy.setMaxReportDelay(2 ** 64, {"from": strategist})
+    actions.user_deposit(user, vault, token, amount)
+    chain.sleep(1)
+    chain.mine(1)
+
+    for call_cost in (0, 10 ** 30):
+        (state, timestamp) = asyncio.run(_state(strategy, call_cost))
+        due = daemon.harvest_due(state, timestamp)
+        assert (due is not None) == strategy.harvestTrigger(call_cost)
+
+    strategy.harvest({"from": strategist})
+    chain.sleep(1)
+    chain.mine(1)
+    (state, timestamp) = asyncio.run(_state(strategy, 0))
+    assert daemon.harvest_due(state, timestamp) is None
+    assert strategy.harvestTrigger(0) == False
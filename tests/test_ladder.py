@@ -0,0 +1,51 @@
+from utils import actions
+import brownie
+import pytest
+from notional_sim.types import Account
+
+
+# tests lending over several markets with setLadderWeights
+def test_ladder_weights(strategy, gov, user):
+    assert strategy.getLadderWeights() == []
+    with brownie.reverts("Weights must sum MAX_BPS"):
+        strategy.setLadderWeights([5_000, 4_000], {"from": gov})
+    with brownie.reverts():
+        strategy.setLadderWeights([5_000, 5_000], {"from": user})
+    strategy.setLadderWeights([5_000, 5_000], {"from": gov})
+    assert strategy.getLadderWeights() == [5_000, 5_000]
+    strategy.setLadderWeights([], {"from": gov})
+    assert strategy.getLadderWeights() == []
+
+
+@pytest.mark.require_network("mainnet-fork")
+def test_ladder_lend_and_roll(
+    chain, token, vault, strategy, user, gov, amount, RELATIVE_APPROX, n_proxy_views, currencyID
+):
+    active_markets = n_proxy_views.getActiveMarkets(currencyID)
+    strategy.setMinTimeToMaturity(0, {"from": vault.governance()})
+    strategy.setLadderWeights([5_000, 5_000], {"from": gov})
+
+    # Half of the deposit in each of the two shortest markets, in one harvest
+    actions.user_deposit(user, vault, token, int(amount / 2))
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+    portfolio = Account.decode(n_proxy_views.getAccount(strategy)).portfolio
+    assert [a.maturity for a in portfolio] == [active_markets[0][1], active_markets[1][1]]
+    assert pytest.approx(portfolio[0].notional, rel=5e-2) == portfolio[1].notional
+    assert pytest.approx(strategy.estimatedTotalAssets(), rel=RELATIVE_APPROX) == int(amount / 2)
+
+    # The first market is now too short: its leg is rolled, the second one is kept and new want is laddered
+    actions.user_deposit(user, vault, token, int(amount / 2))
+    strategy.setMinTimeToMaturity(30 * 86400, {"from": vault.governance()})
+    actions.wait_until_settlement(active_markets[0][1])
+    strategy.harvest({"from": gov})
+    portfolio = Account.decode(n_proxy_views.getAccount(strategy)).portfolio
+    assert [a.maturity for a in portfolio] == [active_markets[1][1], active_markets[2][1]]
+    assert pytest.approx(strategy.estimatedTotalAssets(), rel=RELATIVE_APPROX) == amount
+
+    # Every leg is closed when the vault takes the funds back
+    vault.updateStrategyDebtRatio(strategy, 0, {"from": vault.governance()})
+    strategy.setToggleRealizeLosses(True, {"from": gov})
+    strategy.harvest({"from": gov})
+    assert Account.decode(n_proxy_views.getAccount(strategy)).portfolio == []
+    vault.withdraw(vault.balanceOf(user), user, 10_000, {"from": user})
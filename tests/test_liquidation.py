@@ -0,0 +1,41 @@
+import pytest
+from utils import actions
+from notional_sim import MarketModel
+from notional_sim.liquidation import compare
+from notional_sim.types import Account
+
+
+# checks the greedy plan trades what liquidatePosition would, and the optimal plan never realises more slippage
+@pytest.mark.require_network("mainnet-fork")
+def test_liquidation_plans(chain, token, vault, strategy, user, amount, n_proxy_views, currencyID):
+    actions.user_deposit(user, vault, token, amount)
+    chain.sleep(1)
+    strategy.harvest()
+
+    model = MarketModel.from_views(n_proxy_views, [currencyID])
+    account = Account.decode(n_proxy_views.getAccount(strategy))
+    portfolio = list(account.fcash(currencyID).items())
+    decimals_difference = strategy.DECIMALS_DIFFERENCE()
+    market_index = [m.maturity for m in model.getActiveMarkets(currencyID)].index(portfolio[0][0]) + 1
+    now = chain.time()
+
+    needed = amount // 2
+    plans = compare(portfolio, model, currencyID, now, needed, decimals_difference)
+    fcash = -n_proxy_views.getfCashAmountGivenCashAmount(
+        currencyID, needed * 10_000 // decimals_difference + 1, market_index, now
+    )
+    assert pytest.approx(plans["greedy"]["fcash"][0], rel=1e-6) == fcash
+    for plan in (plans["greedy"], plans["optimal"]):
+        assert plan["feasible"]
+        assert pytest.approx(plan["cash"], rel=1e-4) == needed
+    # A single position leaves nothing to choose
+    assert plans["gap"] == pytest.approx(0, abs=needed * 1e-4)
+
+    # The same notional split over the first two markets
+    maturities = [m.maturity for m in model.getActiveMarkets(currencyID)][:2]
+    notional = portfolio[0][1]
+    split = [(maturities[0], notional // 2), (maturities[1], notional // 2)]
+    plans = compare(split, model, currencyID, now, needed, decimals_difference)
+    assert plans["optimal"]["feasible"]
+    assert plans["optimal"]["cash"] >= needed * (1 - 1e-4)
+    assert plans["gap"] >= -needed * 1e-4
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from notional_sim import MarketModel
+
+# checks the off-chain market model against the answers of the on-chain views
+@pytest.mark.require_network("mainnet-fork")
+def test_market_model_matches_views(
+    chain, token, n_proxy_views, currencyID, n_proxy_implementation, user, million_in_token, MAX_BPS
+):
+    # NOTE: the model prices against a snapshot so it should be taken at the same block as the views
+    model = MarketModel.from_views(n_proxy_views, [currencyID])
+    block_time = chain.time() + 5
+    decimals_difference = 10 ** token.decimals() / 1e8
+
+    active_markets = n_proxy_views.getActiveMarkets(currencyID)
+    amounts = [int(million_in_token * f / decimals_difference) for f in (0.001, 0.01, 0.1)]
+    for market_index in range(1, len(active_markets) + 1):
+        for amount in amounts:
+            fcash = n_proxy_views.getfCashAmountGivenCashAmount(currencyID, -amount, market_index, block_time)
+            assert pytest.approx(
+                model.getfCashAmountGivenCashAmount(currencyID, -amount, market_index, block_time), rel=1e-6
+            ) == fcash
+
+            (_, cash) = n_proxy_views.getCashAmountGivenfCashAmount(currencyID, -fcash, market_index, block_time)
+            assert pytest.approx(
+                model.getCashAmountGivenfCashAmount(currencyID, -fcash, market_index, block_time)[1], rel=1e-6
+            ) == cash
+
+    # Batched pricing answers the same as one call per tuple
+    market_indexes = np.repeat(np.arange(1, len(active_markets) + 1), len(amounts))
+    cash_amounts = -np.tile(amounts, len(active_markets))
+    batch = model.batch_fcash_given_cash(currencyID, cash_amounts, market_indexes, block_time)
+    for (i, market_index) in enumerate(market_indexes):
+        assert pytest.approx(batch[i], rel=1e-9) == model.getfCashAmountGivenCashAmount(
+            currencyID, int(cash_amounts[i]), int(market_index), block_time
+        )
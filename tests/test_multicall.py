@@ -0,0 +1,64 @@
+from brownie import Contract
+from eth_abi import encode_abi
+from scripts import multicall
+
+VIEWS_ABI = [
+    {
+        "name": "balanceOf", "type": "function", "stateMutability": "view",
+        "inputs": [{"name": "account", "type": "address"}],
+        "outputs": [{"name": "", "type": "uint256"}],
+    },
+    {
+        "name": "getSettings", "type": "function", "stateMutability": "view",
+        "inputs": [],
+        "outputs": [{"name": "currencyId", "type": "uint16"}, {"name": "enabled", "type": "bool"}],
+    },
+]
+
+
+class _Multicall2:
+    # Answers tryBlockAndAggregate with the given return data in call order, None for a failed call
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.requests = []
+
+    def tryBlockAndAggregate(self, require_success, calls, block_identifier=None):
+        self.requests.append((require_success, calls, block_identifier))
+        results = [(data is not None, data or b"") for data in self.answers[:len(calls)]]
+        return (100, b"\x00" * 32, results)
+
+
+# checks every result is decoded with the ABI of its method, and a failed call is None
+def test_read_decodes_results(monkeypatch, user):
+    views = Contract.from_abi("Views", "0x" + "11" * 20, VIEWS_ABI, persist=False)
+    stub = _Multicall2([encode_abi(["uint256"], [10 ** 18]), encode_abi(["uint16", "bool"], [3, True]), None])
+    monkeypatch.setattr(multicall, "_multicall", stub)
+
+    (balance, settings, failed) = multicall.read(
+        [(views.balanceOf, user), (views.getSettings,), (views.balanceOf, views)],
+        block_identifier=99, require_success=False,
+    )
+    assert balance == 10 ** 18
+    assert settings == (3, True) and settings["currencyId"] == 3
+    assert failed is None
+
+    (require_success, calls, block_identifier) = stub.requests[0]
+    assert (require_success, block_identifier) == (False, 99)
+    assert calls == [
+        (views.address, views.balanceOf.encode_input(user)),
+        (views.address, views.getSettings.encode_input()),
+        (views.address, views.balanceOf.encode_input(views)),
+    ]
+
+
+def test_read_dict(monkeypatch, user):
+    views = Contract.from_abi("Views", "0x" + "11" * 20, VIEWS_ABI, persist=False)
+    monkeypatch.setattr(multicall, "_multicall", _Multicall2([encode_abi(["uint256"], [7]), None]))
+
+    status = multicall.read_dict(
+        {"balance": (views.balanceOf, user), "settings": (views.getSettings,)}, require_success=False
+    )
+    assert status == {"balance": 7, "settings": None}
+    # Nothing to read, nothing sent
+    assert multicall.read([]) == []
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+from web3.providers.rpc import HTTPProvider
+from utils import cassette, funding, rpc_profile
+
+TOKEN = "0x" + "11" * 20
+BALANCE_OF = "0x70a08231" + "00" * 32
+
+
+class _Config:
+    def getoption(self, name):
+        return {"rpc_profile_sort": "time", "rpc_profile_top": 15}[name]
+
+
+@pytest.fixture
+def plugin(monkeypatch, tmp_path):
+    # The plugin wraps HTTPProvider.make_request, monkeypatch restores it after the test
+    monkeypatch.setattr(HTTPProvider, "make_request", HTTPProvider.make_request)
+    return rpc_profile.RpcProfilePlugin(_Config(), str(tmp_path / "profile" / "rpc.json"))
+
+
+def _in_module(module):
+    # A function of a tests/utils module calling record, as its patched requests do
+    namespace = {}
+    exec(compile("def call(record, *args):\n    return record(*args)\n", module.__file__, "exec"), namespace)
+    return namespace["call"]
+
+
+def test_bucket():
+    assert [rpc_profile._bucket(s) for s in (0.0002, 0.001, 0.0015, 0.003, 0.004, 0.0041)] == [0, 0, 1, 2, 2, 3]
+    assert rpc_profile._bucket(100) == len(rpc_profile.BUCKETS) - 1
+
+
+def test_target():
+    assert rpc_profile._target("eth_call", [{"to": TOKEN, "data": BALANCE_OF}, "latest"]) == (TOKEN, "0x70a08231")
+    assert rpc_profile._target("eth_call", [{"to": TOKEN, "data": bytes.fromhex(BALANCE_OF[2:])}, "0x1"]) == (
+        TOKEN, "0x70a08231")
+    assert rpc_profile._target("eth_sendTransaction", [{"to": TOKEN, "input": BALANCE_OF}]) == (TOKEN, "0x70a08231")
+    # No call, or no selector in the call data
+    assert rpc_profile._target("eth_getBalance", [TOKEN, "latest"]) == (None, None)
+    assert rpc_profile._target("eth_call", [{"to": TOKEN, "data": "0x"}, "latest"]) == (TOKEN, None)
+    assert rpc_profile._target("eth_estimateGas", []) == (None, None)
+
+
+def test_group():
+    rows = [
+        {"method": "eth_call", "helper": "a", "count": 2, "total": 0.2, "max": 0.15},
+        {"method": "eth_call", "helper": "b", "count": 1, "total": 0.1, "max": 0.1},
+        {"method": "eth_chainId", "helper": "a", "count": 10, "total": 0.05, "max": 0.01},
+    ]
+    assert rpc_profile.group(rows, ("method",)) == [
+        {"method": "eth_call", "count": 3, "total": pytest.approx(0.3), "max": 0.15},
+        {"method": "eth_chainId", "count": 10, "total": 0.05, "max": 0.01},
+    ]
+    assert [row["method"] for row in rpc_profile.group(rows, ("method",), sort="count")] == ["eth_chainId", "eth_call"]
+    assert [row["helper"] for row in rpc_profile.group(rows, ("helper",), sort="mean")] == ["b", "a"]
+
+
+def fetch_balance(plugin, module):
+    # A helper of this file whose request goes through a tests/utils plugin
+    _in_module(module)(plugin.record, "eth_call", [{"to": TOKEN, "data": BALANCE_OF}, "latest"], 0.003)
+
+
+@pytest.mark.parametrize("module", [cassette, funding], ids=["cassette", "funding"])
+def test_helper_skips_plugins(plugin, module):
+    fetch_balance(plugin, module)
+    ((key, _),) = plugin.calls.items()
+    assert key[3] == "test_rpc_profile.fetch_balance"
+
+
+def test_profile_json(plugin):
+    plugin.test = "tests/test_a.py::test_a"
+    plugin.phase = "call"
+    plugin.fixtures.append("vault")
+    plugin.record("eth_call", [{"to": TOKEN, "data": BALANCE_OF}, "latest"], 0.003)
+    plugin.fixtures.pop()
+    for _ in range(2):
+        plugin.record("eth_blockNumber", [], 0.0005)
+    plugin.pytest_sessionfinish(None)
+
+    with open(plugin.path) as fp:
+        profile = json.load(fp)
+    assert profile["version"] == rpc_profile.PROFILE_VERSION
+    assert profile["buckets_ms"] == rpc_profile.BUCKETS
+    assert profile["histograms"]["eth_call"][2] == 1 and sum(profile["histograms"]["eth_call"]) == 1
+    assert profile["histograms"]["eth_blockNumber"][0] == 2
+    (call, block_number) = profile["calls"]
+    assert call["method"] == "eth_call" and call["fixture"] == "vault" and call["selector"] == "0x70a08231"
+    assert (call["count"], call["total"], call["max"]) == (1, 0.003, 0.003)
+    assert call["helper"] == "test_rpc_profile.test_profile_json"
+    assert block_number["method"] == "eth_blockNumber" and block_number["fixture"] is None
+    assert (block_number["count"], block_number["total"]) == (2, 0.001)
+    assert block_number["test"] == "tests/test_a.py::test_a" and block_number["phase"] == "call"
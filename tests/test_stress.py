@@ -0,0 +1,45 @@
+import pytest
+from utils import actions
+from utils.stress import (
+    borrow, exit_positions, half_to_maturity, harvest, initialize_markets, lend, shard_of, sleep, to_maturity,
+    withdraw,
+)
+from notional_sim.constants import DAY
+
+# Rate shocks on the strategy's first position, see tests/utils/stress.py
+#   brownie test tests/test_stress.py -n 4 --dist loadgroup
+SCENARIOS = {
+    "hold": [half_to_maturity(), harvest()],
+    "rates_drop": [lend(1), half_to_maturity(), harvest()],
+    "rates_drop_realise": [lend(1), half_to_maturity(), harvest(debt_ratio=0, realize_losses=True)],
+    "rates_drop_withdraw": [lend(1), sleep(7 * DAY), withdraw(0.5)],
+    "rates_drop_exit": [
+        lend(1), half_to_maturity(), exit_positions(), harvest(debt_ratio=0, realize_losses=True),
+    ],
+    "rates_spike": [borrow(1, size=0.5), sleep(7 * DAY), harvest(debt_ratio=5_000)],
+    "rates_spike_withdraw": [borrow(1, size=0.5), withdraw(1.0)],
+    "drop_then_settle": [lend(1), to_maturity(), initialize_markets(), harvest()],
+    "settle_and_roll": [to_maturity(), harvest(), lend(1), harvest()],
+}
+SHARDS = 4
+
+
+@pytest.mark.fan_out
+@pytest.mark.require_network("mainnet-fork")
+@pytest.mark.parametrize("shard", range(SHARDS))
+def test_stress(chain, token, vault, strategy, user, strategist, amount, stress, shard):
+    actions.user_deposit(user, vault, token, amount)
+    chain.sleep(1)
+    strategy.harvest({"from": strategist})
+
+    scenarios = shard_of(SCENARIOS, shard, SHARDS)
+    rows = stress.run(scenarios)
+
+    assert [row["scenario"] for row in rows] == list(scenarios)
+    by_name = {row["scenario"]: row for row in rows}
+    # Without shocks the position only accrues
+    if "hold" in by_name:
+        assert by_name["hold"]["reverted"] is None and by_name["hold"]["loss"] == 0
+    # Every scenario was reverted, the strategy is back to its first position
+    assert vault.strategies(strategy)["totalLoss"] == 0
+    assert vault.balanceOf(user) > 0
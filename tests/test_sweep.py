@@ -0,0 +1,42 @@
+import pytest
+from notional_sim import MarketModel, gas
+from notional_sim.constants import DAY, HARVEST_GAS, SETTLE_GAS, TRADE_GAS
+from notional_sim.sweep import format_table, run_sweep, simulated_scenario
+
+
+# runs a small grid on the current markets and checks the ranking
+@pytest.mark.require_network("mainnet-fork")
+def test_sweep_ranks_grid(chain, amount, n_proxy_views, currencyID):
+    model = MarketModel.from_views(n_proxy_views, [currencyID])
+    scenarios = {currencyID: {
+        "calm": simulated_scenario(model, currencyID, 2, n_quarters=1, volatility=0.005),
+        "shock": simulated_scenario(model, currencyID, 2, n_quarters=1, volatility=0.05, seed=1),
+    }}
+    rows = run_sweep(
+        model, scenarios, amount, chain.time(), min_time_to_maturity=[0, 30 * DAY],
+        fcash_scaling=[9_990, 9_995], withdraw_probability=0.2, realize_losses=True, processes=1,
+    )
+    print(format_table(rows))
+
+    assert len(rows) == 2 * 2 * 2
+    net_yields = [row["net_yield"] for row in rows]
+    assert net_yields == sorted(net_yields, reverse=True)
+    # Without a gas price the net yield is the vault's yield
+    assert all(row["net_yield"] == row["yield"] and row["gas"] > 0 for row in rows)
+
+
+def test_gas_from_baselines():
+    # Without baselines the sweep and the keeper share the defaults
+    assert gas.harvest_costs({}) == {"harvest": HARVEST_GAS, "trade": TRADE_GAS, "settle": SETTLE_GAS}
+    assert gas.max_harvest_gas({}) == HARVEST_GAS + SETTLE_GAS + 2 * TRADE_GAS
+    baselines = {
+        "idle": {"DAI": 100_000, "USDC": 110_000},
+        "lend": {"DAI": 300_000, "USDC": 290_000},
+        "settle_withdraw": {"DAI": 250_000},
+        "ladder_rollover": {"DAI": 900_000},
+    }
+    assert gas.harvest_costs(baselines) == {"harvest": 110_000, "trade": 200_000, "settle": 150_000}
+    assert gas.max_harvest_gas(baselines) == 900_000
+    assert gas.max_harvest_gas({"idle": {"DAI": 100_000}}) == 100_000 + SETTLE_GAS + 2 * TRADE_GAS
+    # A trade cheaper than valuing the position in "idle" is floored at 0
+    assert gas.harvest_costs({"idle": {"DAI": 300_000}, "lend": {"DAI": 280_000}})["trade"] == 0
@@ -0,0 +1,53 @@
+from brownie.test import given, strategy
+from eth_abi.packed import encode_abi_packed
+from notional_sim import trades
+
+# checks the vectorized trade packing bit for bit against Strategy.getTradeFrom's layout
+@given(
+    trade_type=strategy("uint8", max_value=1),
+    market_index=strategy("uint8"),
+    fcash=strategy("uint64", max_value=2 ** 63 - 1),
+    min_slippage=strategy("uint32"),
+)
+def test_lend_borrow_packing(trade_type, market_index, fcash, min_slippage):
+    packed = encode_abi_packed(
+        ["uint8", "uint8", "uint88", "uint32", "uint120"],
+        [trade_type, market_index, fcash, min_slippage, 0]
+    )
+    words = trades.encode(trade_type, market_index, fcash, min_slippage)
+    assert trades.to_bytes(words) == [packed]
+
+    decoded = trades.decode(trades.from_bytes([packed]))
+    assert decoded["trade_type"][0] == trade_type
+    assert decoded["market_index"][0] == market_index
+    assert decoded["fcash"][0] == fcash
+    assert decoded["min_slippage"][0] == min_slippage
+
+
+@given(maturity=strategy("uint32"), fcash=strategy("int64"))
+def test_ntoken_residual_packing(maturity, fcash):
+    packed = encode_abi_packed(["uint8", "uint32", "int88", "uint128"], [4, maturity, fcash, 0])
+    assert trades.to_bytes(trades.encode_ntoken_residual(maturity, fcash)) == [packed]
+
+    decoded = trades.decode(trades.from_bytes(["0x" + packed.hex()]))
+    assert decoded["maturity"][0] == maturity
+    assert decoded["fcash"][0] == fcash
+
+
+def test_batch_matches_single_trades():
+    # Whole arrays encode to the same bytes as one trade at a time
+    market_indexes = [1, 2, 3, 1]
+    fcash = [10 ** 8, 0, 2 ** 62, 123456789]
+    batch = trades.to_bytes(trades.encode_lend(market_indexes, fcash))
+    assert batch == [trades.get_trade_from(0, i, f) for (i, f) in zip(market_indexes, fcash)]
+    # trade from scripts/useful_commands.py
+    decoded = trades.decode(trades.from_bytes(["0x01020000000000000005fbf6440209b341000000000000000000000000000000"]))
+    assert (decoded["trade_type"][0], decoded["market_index"][0], decoded["fcash"][0]) == (1, 2, 0x05fbf644)
+
+
+def test_get_trade_from_uint88():
+    # Amounts past int64, and past uint88 where getTradeFrom truncates
+    for amount in (2 ** 63, 2 ** 70 + 12345, 2 ** 88 - 1):
+        packed = encode_abi_packed(["uint8", "uint8", "uint88", "uint152"], [0, 2, amount, 0])
+        assert trades.get_trade_from(0, 2, amount) == packed
+    assert trades.get_trade_from(1, 1, 2 ** 88 + 5) == trades.get_trade_from(1, 1, 5)
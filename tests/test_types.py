@@ -0,0 +1,39 @@
+import pytest
+from notional_sim.types import Account, AccountArrays, MarketArrays, decode_markets
+
+
+# checks the records read the same fields as the raw view tuples, and the arrays keep every snapshot
+@pytest.mark.require_network("mainnet-fork")
+def test_decoded_views(chain, token, vault, strategy, user, amount, n_proxy_views, currencyID):
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest()
+
+    raw = n_proxy_views.getAccount(strategy)
+    account = Account.decode(raw)
+    assert account.context.next_settle_time == raw[0][0] == account[0][0]
+    assert account.portfolio[0].maturity == raw[2][0][1] == strategy.getMaturity()
+    assert account.portfolio[0].notional == raw[2][0][3]
+    assert account.fcash(currencyID) == {raw[2][0][1]: raw[2][0][3]}
+
+    raw_markets = n_proxy_views.getActiveMarkets(currencyID)
+    markets = decode_markets(raw_markets)
+    assert [m.maturity for m in markets] == [m[1] for m in raw_markets]
+    assert [m.oracle_rate for m in markets] == [m[6] for m in raw_markets]
+
+    blocks = [chain.height - 1, chain.height]
+    history = MarketArrays.decode([n_proxy_views.getActiveMarkets(currencyID, block_identifier=b) for b in blocks])
+    assert history.maturity.shape == (2, len(markets))
+    # storage_slot is not kept, and the market totals are float64
+    assert len(history[1]) == len(markets)
+    for (row, market) in zip(history[1], markets):
+        assert row.storage_slot is None
+        for name in MarketArrays.fields:
+            if name in MarketArrays.float_fields:
+                assert getattr(row, name) == pytest.approx(getattr(market, name), rel=1e-12)
+            else:
+                assert getattr(row, name) == getattr(market, name)
+    accounts = AccountArrays.decode([n_proxy_views.getAccount(strategy, block_identifier=b) for b in blocks])
+    assert accounts.contexts.next_settle_time.tolist() == [0, account.context.next_settle_time]
+    assert accounts.portfolios.valid.sum(axis=1).tolist() == [0, 1]
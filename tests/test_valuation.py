@@ -0,0 +1,31 @@
+from brownie import chain
+from notional_sim.valuation import ValuationService
+from utils import actions
+import pytest
+
+
+# checks the off-chain valuation against estimatedTotalAssets, live and at past blocks
+@pytest.mark.require_network("mainnet-fork")
+def test_valuation_matches_strategy(token, vault, strategy, user, strategist, amount, n_proxy_views):
+    actions.user_deposit(user, vault, token, amount)
+    chain.sleep(1)
+    strategy.harvest({"from": strategist})
+    invested = chain.height
+    chain.sleep(30 * 86400)
+    chain.mine(1)
+
+    service = ValuationService(n_proxy_views)
+    service.register(strategy, token)
+    blocks = [invested, chain.height]
+    values = service.estimated_total_assets([strategy], blocks)
+    for (j, block) in enumerate(blocks):
+        assert pytest.approx(values[0, j], rel=1e-6) == strategy.estimatedTotalAssets(block_identifier=block)
+
+    # Answered from the cache the second time
+    hits = service.values.hits
+    assert (service.estimated_total_assets([strategy], blocks) == values).all()
+    assert service.values.hits == hits + 2
+
+    # The position gains value as its maturity approaches
+    later = service.estimated_total_asset(strategy, chain.height, chain.time() + 30 * 86400)
+    assert later > values[0, 1]
@@ -1,7 +1,9 @@
 import pytest
 from brownie import chain, accounts
 import utils
-from eth_abi.packed import encode_abi_packed
+from notional_sim import calendar, trades
+from notional_sim.constants import DAY, DEPOSIT_NONE, DEPOSIT_UNDERLYING
+from notional_sim.types import Account, decode_portfolio
 
 # This file is reserved for standard actions like deposits
 def user_deposit(user, vault, token, amount):
@@ -11,19 +13,22 @@ def user_deposit(user, vault, token, amount):
     assert token.balanceOf(vault.address) == amount
 
 
+def jump_to(timestamp):
+    # A single evm_mine at timestamp, instead of chain.sleep + chain.mine
+    chain.mine(1, timestamp=timestamp)
+
+
 def wait_until_settlement(next_settlement):
     delta = next_settlement - chain.time()
-    if (delta > 86400):
-        chain.sleep(delta - 86400)
+    if (delta > DAY):
+        jump_to(next_settlement - DAY)
     else:
-        chain.sleep(delta)
-    chain.mine(1)
+        jump_to(next_settlement)
     return
 
 def wait_half_until_settlement(next_settlement):
-    delta = next_settlement - chain.time()
-    chain.sleep(int(delta / 2))
-    chain.mine(1)
+    now = chain.time()
+    jump_to(now + int((next_settlement - now) / 2))
     return
 
 
@@ -38,21 +43,15 @@ def whale_drop_rates(n_proxy_batch, whale, token, n_proxy_views, currencyID, bal
         fcash_amount = n_proxy_views.getfCashAmountGivenCashAmount(currencyID, balance_threshold[1],
          market_index, 
          chain.time()+5)
-        trade = encode_abi_packed(
-            ["uint8", "uint8", "uint88", "uint32", "uint120"], 
-            [0, market_index, fcash_amount, 0, 0]
-        )
+        action = trades.balance_action(currencyID, trades.encode_lend(market_index, fcash_amount),
+            DEPOSIT_UNDERLYING, balance_threshold[0], 0, True, True)
         if(currencyID == 1):
-            n_proxy_batch.batchBalanceAndTradeAction(whale, \
-            [(2, currencyID, balance_threshold[0], 0, 1, 1,\
-                [trade])], \
+            n_proxy_batch.batchBalanceAndTradeAction(whale, [action], \
                     {"from": whale,\
                         "value":balance_threshold[0]})
         else:
             token.approve(n_proxy_views.address, balance_threshold[0], {"from": whale})
-            n_proxy_batch.batchBalanceAndTradeAction(whale, \
-            [(2, currencyID, balance_threshold[0], 0, 1, 1,\
-                [trade])], \
+            n_proxy_batch.batchBalanceAndTradeAction(whale, [action], \
                     {"from": whale,\
                         "value":0})
     else:
@@ -61,14 +60,10 @@ def whale_drop_rates(n_proxy_batch, whale, token, n_proxy_views, currencyID, bal
     return
 
 def whale_exit(n_proxy_batch, whale, n_proxy_views, currencyID, market_index):
-    fcash_position = n_proxy_views.getAccount(whale)[2][0][3]
-    trade = encode_abi_packed(
-            ["uint8", "uint8", "uint88", "uint32", "uint120"], 
-            [1, 1, fcash_position, 0, 0]
-        )
-    n_proxy_batch.batchBalanceAndTradeAction(whale, \
-        [(0, currencyID, 0, 0, 1, 1,\
-            [trade])], \
+    fcash_position = Account.decode(n_proxy_views.getAccount(whale)).portfolio[0].notional
+    action = trades.balance_action(currencyID, trades.encode_borrow(1, fcash_position),
+        DEPOSIT_NONE, 0, 0, True, True)
+    n_proxy_batch.batchBalanceAndTradeAction(whale, [action], \
                 {"from": whale,\
                      "value":0})
     return
@@ -85,26 +80,42 @@ def first_deposit_and_harvest(
     utils.sleep()
     assert pytest.approx(strategy.estimatedTotalAssets(), rel=RELATIVE_APPROX) == amount
 
-def initialize_intermediary_markets(n_proxy_views, currencyID, n_proxy_implementation, user, 
-    next_settlement, n_proxy_batch, token, token_whale, n_proxy_account, million_in_token):
-    if next_settlement - chain.time() > 86400 * 90:
-        for (i, market) in enumerate(n_proxy_views.getActiveMarkets(currencyID)):
-            if market[1] < next_settlement:
-                chain.sleep(market[1] - chain.time() + 1)
-                chain.mine(1)
-                n_proxy_implementation.initializeMarkets(currencyID, 0, {"from": user})
-                if currencyID == 2 or currencyID == 3:
-                    buy_residuals(n_proxy_batch, n_proxy_implementation, currencyID, million_in_token, token, token_whale)
+def initialize_intermediary_markets(currencyID, n_proxy_implementation, user, next_settlement, n_proxy_batch,
+    token, token_whale, million_in_token):
+    # Every quarter boundary before next_settlement comes from the calendar, no need to query the
+    # active markets: jump right past it, initialize the markets and buy the nToken residuals
+    for (timestamp, _) in calendar.plan(chain.time(), next_settlement)[:-1]:
+        jump_to(timestamp)
+        n_proxy_implementation.initializeMarkets(currencyID, 0, {"from": user})
+        if currencyID == 2 or currencyID == 3:
+            buy_residuals(n_proxy_batch, n_proxy_implementation, currencyID, million_in_token, token, token_whale)
+
+def settle_until(maturity, currencyID, n_proxy_implementation, user, n_proxy_batch, token, token_whale,
+    million_in_token, offset=1):
+    # Moves to maturity + offset settling every quarter on the way, markets are initialized on arrival
+    # if the last jump crossed a quarter boundary
+    target = maturity + offset
+    initialize_intermediary_markets(currencyID, n_proxy_implementation, user, target, n_proxy_batch,
+        token, token_whale, million_in_token)
+    (timestamp, settlement) = calendar.plan(chain.time(), target)[-1]
+    jump_to(timestamp)
+    if settlement is not None:
+        n_proxy_implementation.initializeMarkets(currencyID, 0, {"from": user})
+
+# nToken address by (proxy, currency), it never changes
+_ntoken_addresses = {}
 
 def buy_residuals(n_proxy_batch, n_proxy_implementation, currencyID, million_in_token, token, token_whale):
-    token_whale_balance = token.balanceOf(token_whale)
-    token.approve(n_proxy_implementation.address, 2 ** 256 - 1, {"from":token_whale})
-    (liquidityTokens, fCash) = n_proxy_implementation.getNTokenPortfolio(n_proxy_implementation.nTokenAddress(currencyID))
-    chain.mine(1, timestamp=chain.time() + 86400)
-    trade = encode_abi_packed(["uint8", "uint32", "int88", "uint128"],[4, fCash[2][1], fCash[2][3], 0])
-    n_proxy_batch.batchBalanceAndTradeAction(token_whale, \
-        [(2,currencyID,million_in_token,0,0,0,\
-            [trade])], \
+    if token.allowance(token_whale, n_proxy_implementation.address) < million_in_token:
+        token.approve(n_proxy_implementation.address, 2 ** 256 - 1, {"from":token_whale})
+    key = (n_proxy_implementation.address, currencyID)
+    if key not in _ntoken_addresses:
+        _ntoken_addresses[key] = n_proxy_implementation.nTokenAddress(currencyID)
+    (liquidityTokens, fCash) = n_proxy_implementation.getNTokenPortfolio(_ntoken_addresses[key])
+    residual = decode_portfolio(fCash)[2]
+    jump_to(chain.time() + DAY)
+    action = trades.balance_action(currencyID, trades.encode_ntoken_residual(residual.maturity, residual.notional),
+        DEPOSIT_UNDERLYING, million_in_token)
+    n_proxy_batch.batchBalanceAndTradeAction(token_whale, [action], \
                 {"from": token_whale,\
                      "value":0})
-    
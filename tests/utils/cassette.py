@@ -0,0 +1,227 @@
+import gzip
+import hashlib
+import json
+import os
+import socket
+from urllib.parse import urlparse
+
+import pytest
+
+# Record-and-replay of every JSON-RPC request the suite makes.
+#
+#   brownie test --rpc-cassette cassettes/suite.json.gz --rpc-cassette-mode record
+#   brownie test --rpc-cassette cassettes/suite.json.gz --rpc-cassette-mode replay
+#   brownie test --rpc-cassette cassettes/suite.json.gz --rpc-cassette-mode mismatch
+#
+# Requests are keyed by method and params (which include the block identifier and call data of
+# eth_calls). Identical requests made at different points of a test get their responses back in
+# the order they were recorded. In replay mode no request leaves the process: the plugin listens
+# on the network's port so brownie attaches to it instead of launching a forked node. In mismatch
+# mode requests go to the node and responses that differ from the cassette are reported.
+
+CASSETTE_VERSION = 1
+MODES = ("auto", "record", "replay", "mismatch")
+# Params of these methods depend on the wall clock (chain.sleep), they are replayed in call order
+ORDERED_METHODS = {"evm_increaseTime", "evm_mine", "evm_snapshot", "evm_revert"}
+
+
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    return str(value)
+
+
+class Cassette:
+    def __init__(self, path):
+        self.path = path
+        # key => {"method", "params", "responses"}
+        self.calls = {}
+        # values returned by chain.time(), so that wall clock based params are reproducible
+        self.clock = []
+        self._cursor = {}
+        self._clock_cursor = 0
+
+    @staticmethod
+    def key(method, params):
+        if method in ORDERED_METHODS:
+            return method
+        payload = json.dumps([method, params], sort_keys=True, default=_json_default)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def load(self):
+        with gzip.open(self.path, "rt") as fp:
+            data = json.load(fp)
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version in {self.path}")
+        self.calls = data["calls"]
+        self.clock = data["clock"]
+        return self
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with gzip.open(self.path, "wt") as fp:
+            json.dump(
+                {"version": CASSETTE_VERSION, "clock": self.clock, "calls": self.calls},
+                fp, separators=(",", ":"), default=_json_default,
+            )
+
+    def record(self, method, params, response):
+        entry = self.calls.setdefault(
+            self.key(method, params), {"method": method, "params": params, "responses": []}
+        )
+        entry["responses"].append({k: v for k, v in response.items() if k in ("result", "error")})
+
+    def next(self, method, params):
+        # Next recorded response for this request, None if the cassette has no more of them
+        key = self.key(method, params)
+        entry = self.calls.get(key)
+        cursor = self._cursor.get(key, 0)
+        if entry is None or cursor >= len(entry["responses"]):
+            return None
+        self._cursor[key] = cursor + 1
+        return dict(entry["responses"][cursor], jsonrpc="2.0", id=0)
+
+    def record_time(self, value):
+        self.clock.append(value)
+
+    def next_time(self):
+        if self._clock_cursor >= len(self.clock):
+            return None
+        self._clock_cursor += 1
+        return self.clock[self._clock_cursor - 1]
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+class CassettePlugin:
+    def __init__(self, config, path, mode):
+        self.config = config
+        self.cassette = Cassette(path)
+        if mode == "auto":
+            mode = "replay" if os.path.exists(path) else "record"
+        self.mode = mode
+        if mode in ("replay", "mismatch"):
+            self.cassette.load()
+        self.divergences = []
+        self.requests = 0
+        self._socket = None
+        self._patch()
+
+    def _replay(self, method, params):
+        response = self.cassette.next(method, params)
+        if response is None:
+            raise CassetteMiss(f"No recorded response for {method} {params}")
+        return response
+
+    def _observe(self, method, params, response):
+        # Records the node's response, or compares it with the cassette's
+        if self.mode == "record":
+            self.cassette.record(method, params, response)
+            return
+        expected = self.cassette.next(method, params)
+        actual = {k: v for k, v in response.items() if k in ("result", "error")}
+        if expected is None or {k: expected[k] for k in actual if k in expected} != actual:
+            self.divergences.append((method, params, expected, actual))
+
+    def _patch(self):
+        from web3.providers.rpc import HTTPProvider
+        from brownie.network.state import Chain
+        from notional_sim import rpc
+
+        plugin = self
+        make_request = HTTPProvider.make_request
+        batch = rpc.batch
+        chain_time = Chain.time
+
+        def patched_make_request(provider, method, params):
+            plugin.requests += 1
+            if plugin.mode == "replay":
+                return plugin._replay(method, params)
+            response = make_request(provider, method, params)
+            plugin._observe(method, params, response)
+            return response
+
+        def patched_batch(provider, requests, *args, **kwargs):
+            # Batches are recorded and replayed request by request
+            plugin.requests += len(requests)
+            if plugin.mode == "replay":
+                return [plugin._replay(method, params) for (method, params) in requests]
+            responses = batch(provider, requests, *args, **kwargs)
+            for ((method, params), response) in zip(requests, responses):
+                plugin._observe(method, params, response)
+            return responses
+
+        def patched_time(chain):
+            if plugin.mode == "record":
+                value = chain_time(chain)
+                plugin.cassette.record_time(value)
+                return value
+            value = plugin.cassette.next_time()
+            return chain_time(chain) if value is None else value
+
+        HTTPProvider.make_request = patched_make_request
+        rpc.batch = patched_batch
+        Chain.time = patched_time
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_sessionstart(self, session):
+        if self.mode != "replay":
+            return
+        # Listen on the network's port: brownie finds a process there, attaches to it and every
+        # request is then answered from the cassette
+        from brownie._config import CONFIG
+
+        network = self.config.getoption("network", None) or CONFIG.settings["networks"]["default"]
+        host = urlparse(CONFIG.networks[network]["host"])
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((socket.gethostbyname(host.hostname), host.port or 8545))
+        self._socket.listen()
+
+    def pytest_sessionfinish(self, session):
+        if self.mode == "record":
+            self.cassette.save()
+        if self._socket is not None:
+            self._socket.close()
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.write_sep("-", f"rpc cassette ({self.mode}): {self.cassette.path}")
+        terminalreporter.write_line(f"{self.requests} JSON-RPC requests")
+        if self.mode != "mismatch":
+            return
+        terminalreporter.write_line(f"{len(self.divergences)} diverging responses")
+        for (method, params, expected, actual) in self.divergences:
+            terminalreporter.write_line(
+                f"  {method} {json.dumps(params, default=_json_default)[:120]}\n"
+                f"    recorded: {json.dumps(expected, default=_json_default)[:120]}\n"
+                f"    actual:   {json.dumps(actual, default=_json_default)[:120]}"
+            )
+
+
+def add_options(parser):
+    group = parser.getgroup("rpc cassette")
+    group.addoption("--rpc-cassette", default=None, help="Path of the JSON-RPC cassette (.json.gz)")
+    group.addoption(
+        "--rpc-cassette-mode",
+        default="auto",
+        choices=MODES,
+        help="record, replay, or mismatch (run against the node and flag responses differing from "
+        "the cassette). auto replays if the cassette exists and records it otherwise",
+    )
+
+
+def configure(config):
+    path = config.getoption("rpc_cassette")
+    if path is None:
+        return
+    worker = os.environ.get("PYTEST_XDIST_WORKER")
+    if worker is not None:
+        # One cassette per xdist worker
+        directory, name = os.path.split(path)
+        stem, _, ext = name.partition(".")
+        path = os.path.join(directory, f"{stem}.{worker}.{ext or 'json.gz'}")
+    config.pluginmanager.register(
+        CassettePlugin(config, path, config.getoption("rpc_cassette_mode")), "rpc-cassette"
+    )
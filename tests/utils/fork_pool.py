@@ -0,0 +1,165 @@
+import json
+import os
+import time
+import urllib.request
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import pytest
+
+# One forked node per xdist worker, all pinned to the same block.
+#
+#   brownie test -n 4 --dist loadgroup [--fork-block 14000000]
+#
+# Every worker gets its own port (the network's port + worker index) and brownie launches,
+# or attaches to an already running, fork on it. The controller picks the fork block once (the
+# upstream head unless --fork-block is given) and hands it to every worker, so all of them see the
+# same chain. Tests are grouped by their `token` param, so each currency runs on a single worker
+# (`fan_out` tests are spread over the workers instead, see tests/utils/stress.py). The run ends with the wall time of every worker and
+# currency.
+
+
+def add_options(parser):
+    group = parser.getgroup("fork pool")
+    group.addoption("--fork-block", type=int, default=None, help="Block number every fork is pinned to")
+
+
+def _fork_settings(config):
+    # (network name, network config) of the network brownie is about to connect to
+    from brownie._config import CONFIG
+
+    network = config.getoption("network", None) or CONFIG.settings["networks"]["default"]
+    return network, CONFIG.networks[network]
+
+
+def _fork_url(network_config):
+    from brownie._config import CONFIG
+
+    fork = network_config.get("cmd_settings", {}).get("fork")
+    if fork is None:
+        return None
+    if fork in CONFIG.networks:
+        fork = CONFIG.networks[fork]["host"]
+    return os.path.expandvars(fork.split("@")[0])
+
+
+def _upstream_block(url):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_blockNumber", "params": []}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return int(json.load(response)["result"], 16)
+
+
+def _worker_index(worker_id):
+    # "gw3" => 3
+    return int(worker_id[2:])
+
+
+def configure_fork(config, worker_id, fork_block):
+    # Points the active network to this worker's port and pins the fork block
+    _, network_config = _fork_settings(config)
+    url = _fork_url(network_config)
+    cmd_settings = network_config.setdefault("cmd_settings", {})
+    if url is not None and fork_block is not None:
+        cmd_settings["fork"] = f"{url}@{fork_block}"
+    if worker_id is None:
+        return None
+    # Brownie's xdist runner adds the worker index to cmd_settings["port"] itself and launches the
+    # fork there, so only the host is moved to that port
+    host = urlparse(network_config["host"])
+    port = cmd_settings.get("port", host.port or 8545) + _worker_index(worker_id)
+    network_config["host"] = f"{host.scheme}://{host.hostname}:{port}"
+    return port
+
+
+class WorkerPlugin:
+    # Runs in every xdist worker, times the session and each currency
+
+    def __init__(self, config, port, fork_block):
+        self.config = config
+        self.port = port
+        self.fork_block = fork_block
+        self.start = time.time()
+        self.currencies = defaultdict(float)
+
+    def pytest_runtest_logreport(self, report):
+        token = getattr(report, "fork_pool_token", None)
+        if token is not None:
+            self.currencies[token] += report.duration
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        outcome = yield
+        callspec = getattr(item, "callspec", None)
+        if callspec is not None:
+            outcome.get_result().fork_pool_token = callspec.params.get("token")
+
+    def pytest_sessionfinish(self, session):
+        self.config.workeroutput["fork_pool"] = json.dumps({
+            "port": self.port,
+            "fork_block": self.fork_block,
+            "wall_time": time.time() - self.start,
+            "currencies": dict(self.currencies),
+        })
+
+
+class ControllerPlugin:
+    # Runs in the xdist controller: picks the fork block and reports every worker's wall time
+
+    def __init__(self, config):
+        self.config = config
+        self.start = time.time()
+        self.fork_block = config.getoption("fork_block")
+        if self.fork_block is None:
+            url = _fork_url(_fork_settings(config)[1])
+            if url is not None:
+                self.fork_block = _upstream_block(url)
+        self.workers = {}
+
+    def pytest_configure_node(self, node):
+        node.workerinput["fork_block"] = self.fork_block
+
+    def pytest_testnodedown(self, node, error):
+        output = getattr(node, "workeroutput", {}).get("fork_pool")
+        if output is not None:
+            self.workers[node.gateway.id] = json.loads(output)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.write_sep("-", f"fork pool (block {self.fork_block})")
+        for worker_id in sorted(self.workers, key=_worker_index):
+            worker = self.workers[worker_id]
+            currencies = ", ".join(f"{k} {v:.1f}s" for (k, v) in sorted(worker["currencies"].items()))
+            terminalreporter.write_line(
+                f"{worker_id} (port {worker['port']}): {worker['wall_time']:.1f}s  [{currencies}]"
+            )
+        terminalreporter.write_line(f"total wall time: {time.time() - self.start:.1f}s")
+
+
+def group_by_currency(config, items):
+    # Must run before xdist's loadgroup scheduling reads the xdist_group marks
+    if not config.pluginmanager.hasplugin("xdist"):
+        return
+    for item in items:
+        callspec = getattr(item, "callspec", None)
+        if callspec is not None and "token" in callspec.params:
+            name = callspec.params["token"]
+            # fan_out tests get a group per param set, the stress shards run on every worker
+            if item.get_closest_marker("fan_out") is not None:
+                name = f"{name}-{callspec.id}"
+            item.add_marker(pytest.mark.xdist_group(name=name))
+
+
+def configure(config):
+    workerinput = getattr(config, "workerinput", None)
+    if workerinput is not None:
+        worker_id = workerinput["workerid"]
+        fork_block = workerinput.get("fork_block", config.getoption("fork_block"))
+        port = configure_fork(config, worker_id, fork_block)
+        config.pluginmanager.register(WorkerPlugin(config, port, fork_block), "fork-pool-worker")
+    elif config.pluginmanager.hasplugin("xdist") and getattr(config.option, "numprocesses", None):
+        config.pluginmanager.register(ControllerPlugin(config), "fork-pool-controller")
+    else:
+        configure_fork(config, None, config.getoption("fork_block"))
@@ -0,0 +1,122 @@
+import json
+
+from brownie import chain, network, web3
+from eth_utils import keccak
+from scripts import abi_cache
+
+# Funds accounts by writing ERC20 balances straight into the token's storage, instead of
+# transferring from a whale: no transaction and no dependency on someone else's balance.
+#
+#   funding.fund(token, user, amount)
+#
+# A token's balances live in a mapping at some storage slot, so the balance of an account is at
+# keccak256(account . slot) for Solidity layouts and keccak256(slot . account) for Vyper ones. The
+# slots of the tokens the suite uses are known, others are discovered once by writing a marker to
+# every candidate slot until balanceOf returns it, and cached under .abi_cache/balance_slots/.
+
+# Token address => (balances slot, layout), on mainnet
+KNOWN_SLOTS = {
+    "0x2260fac5e5542a773aa44fbcfedf7c193bc2c599": (0, "solidity"),  # WBTC
+    "0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2": (3, "solidity"),  # WETH
+    "0x6b175474e89094c44da98b954eedeac495271d0f": (2, "solidity"),  # DAI
+    "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48": (9, "solidity"),  # USDC (FiatTokenV2 behind its proxy)
+    "0xdac17f958d2ee523a2206206994597c13d831ec7": (2, "solidity"),  # USDT
+    "0x514910771af9ca656af840dff83e8264ecf986ca": (1, "solidity"),  # LINK
+    "0x0bc529c00c6401aef6d220be8c6ea1667f6ad93e": (0, "solidity"),  # YFI
+}
+MAX_SLOT = 100
+MARKER = 0x5EED
+
+# In-process memo: (chain id, token) => (slot, layout)
+_slots = {}
+
+
+def _word(value):
+    return "0x" + value.to_bytes(32, "big").hex()
+
+
+def _set_storage(address, position, value):
+    # Each node names the RPC method, and formats the position, differently
+    requests = (
+        ("hardhat_setStorageAt", hex(position)),
+        ("anvil_setStorageAt", hex(position)),
+        ("evm_setAccountStorageAt", _word(position)),
+    )
+    for (method, key) in requests:
+        response = web3.provider.make_request(method, [address, key, _word(value)])
+        if "error" not in response:
+            return
+    raise ValueError(f"{network.show_active()} does not support writing storage")
+
+
+def _get_storage(address, position):
+    return int.from_bytes(bytes(web3.eth.get_storage_at(address, position)), "big")
+
+
+def balance_position(account, slot, layout):
+    account = bytes.fromhex(str(account)[2:].rjust(64, "0"))
+    slot = slot.to_bytes(32, "big")
+    key = account + slot if layout == "solidity" else slot + account
+    return int.from_bytes(keccak(key), "big")
+
+
+def _cache_path(token):
+    return abi_cache.CACHE_DIR / "balance_slots" / f"{chain.id}-{str(token).lower()}.json"
+
+
+def discover(token, max_slot=MAX_SLOT):
+    # (slot, layout) of the token's balances mapping, restoring every probed slot
+    probe = "0x000000000000000000000000000000000000dEaD"
+    for slot in range(max_slot):
+        for layout in ("solidity", "vyper"):
+            position = balance_position(probe, slot, layout)
+            original = _get_storage(token.address, position)
+            _set_storage(token.address, position, MARKER)
+            found = token.balanceOf(probe) == MARKER
+            _set_storage(token.address, position, original)
+            if found:
+                return (slot, layout)
+    raise ValueError(f"No balances mapping found in the first {max_slot} slots of {token.address}")
+
+
+def balance_slot(token):
+    key = (chain.id, token.address.lower())
+    if key in _slots:
+        return _slots[key]
+    path = _cache_path(token.address)
+    if key[1] in KNOWN_SLOTS and chain.id == 1:
+        _slots[key] = KNOWN_SLOTS[key[1]]
+    elif path.exists():
+        _slots[key] = tuple(json.loads(path.read_text()))
+    else:
+        _slots[key] = discover(token)
+        abi_cache._write_atomic(path, list(_slots[key]))
+    return _slots[key]
+
+
+def set_balance(token, account, balance):
+    (slot, layout) = balance_slot(token)
+    _set_storage(token.address, balance_position(account, slot, layout), balance)
+    assert token.balanceOf(account) == balance, f"{token.address} balance was not written"
+
+
+def fund(token, account, amount):
+    # Adds amount to the account's balance (totalSupply is left as is)
+    set_balance(token, account, token.balanceOf(account) + amount)
+    return amount
+
+
+def top_up(token, account, minimum):
+    # Raises the balance to at least minimum
+    if token.balanceOf(account) < minimum:
+        set_balance(token, account, minimum)
+
+
+def top_up_eth(account, minimum):
+    if web3.eth.get_balance(str(account)) >= minimum:
+        return
+    for method in ("hardhat_setBalance", "anvil_setBalance", "evm_setAccountBalance"):
+        response = web3.provider.make_request(method, [str(account), hex(minimum)])
+        if "error" not in response:
+            return
+    raise ValueError(f"{network.show_active()} does not support setting balances")
@@ -0,0 +1,149 @@
+import json
+import os
+from collections import defaultdict
+
+import pytest
+
+from scripts.gas_profile import step_costs
+
+# Gas benchmarks of the harvest paths, per network and currency, against the baselines in a
+# versioned JSON.
+#
+#   brownie test tests/test_gas.py --gas-benchmark [--gas-margin 0.02] [--gas-trace]
+#   brownie test tests/test_gas.py --gas-benchmark --gas-update
+#
+# Tests marked `gas` only run with --gas-benchmark. They record transactions with the
+# `gas_benchmark(path, tx)` fixture, which fails the test when gas_used is above the path's
+# baseline for the currency by more than the margin. A path without a baseline yet is skipped.
+# --gas-update records the baselines with the gas of this run instead (run it without xdist,
+# every worker would write its own subset).
+# --gas-trace adds the gas spent in every contract function, from the transaction's trace.
+
+BASELINES_VERSION = 1
+DEFAULT_BASELINES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gas_baselines.json")
+DEFAULT_MARGIN = 0.02
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {"version": BASELINES_VERSION, "margin": DEFAULT_MARGIN, "baselines": {}}
+    with open(path) as fp:
+        data = json.load(fp)
+    if data.get("version") != BASELINES_VERSION:
+        raise ValueError(f"Unsupported gas baselines version in {path}")
+    return data
+
+
+def save_baselines(path, data):
+    with open(path, "w") as fp:
+        json.dump(data, fp, indent=2, sort_keys=True)
+        fp.write("\n")
+
+
+def function_breakdown(tx):
+    # Gas spent inside every contract function (excluding the functions it calls), highest first.
+    # A CALL's gasCost includes the gas forwarded to the callee, step_costs charges it once
+    totals = defaultdict(int)
+    trace = tx.trace
+    for (step, cost) in zip(trace, step_costs(trace)):
+        totals[step["fn"]] += cost
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+class GasBenchmarkPlugin:
+    def __init__(self, config):
+        self.path = config.getoption("gas_baselines")
+        self.data = load_baselines(self.path)
+        margin = config.getoption("gas_margin")
+        self.margin = self.data.get("margin", DEFAULT_MARGIN) if margin is None else margin
+        self.update = config.getoption("gas_update")
+        self.trace = config.getoption("gas_trace")
+        # (path, currency) => {"gas_used", "baseline", "functions"}
+        self.results = {}
+
+    @property
+    def network(self):
+        # Baselines are kept per network, the mock Notional proxy costs less gas than the real one
+        from brownie import network
+
+        return network.show_active()
+
+    def record(self, path, currency, tx):
+        baseline = self.data["baselines"].get(self.network, {}).get(path, {}).get(currency)
+        self.results[(path, currency)] = {
+            "gas_used": tx.gas_used,
+            "baseline": baseline,
+            "functions": function_breakdown(tx) if self.trace else None,
+        }
+        if self.update:
+            return
+        if baseline is None:
+            pytest.skip(
+                f"{path} ({currency}) has no gas baseline on {self.network} yet, record it with --gas-update"
+            )
+        limit = int(baseline * (1 + self.margin))
+        if tx.gas_used > limit:
+            pytest.fail(
+                f"{path} ({currency}) used {tx.gas_used} gas, over its baseline of {baseline} "
+                f"by more than {self.margin:.1%}"
+            )
+
+    @pytest.fixture
+    def gas_benchmark(self, token):
+        currency = token.symbol()
+
+        def record(path, tx):
+            self.record(path, currency, tx)
+            return tx
+
+        return record
+
+    def pytest_collection_modifyitems(self, config, items):
+        if config.getoption("gas_benchmark"):
+            return
+        skip = pytest.mark.skip(reason="gas benchmark, run with --gas-benchmark")
+        for item in items:
+            if item.get_closest_marker("gas") is not None:
+                item.add_marker(skip)
+
+    def pytest_sessionfinish(self, session):
+        if not self.update or not self.results:
+            return
+        for ((path, currency), result) in self.results.items():
+            self.data["baselines"].setdefault(self.network, {}).setdefault(path, {})[currency] = result["gas_used"]
+        save_baselines(self.path, self.data)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if not self.results:
+            return
+        terminalreporter.write_sep("-", f"gas benchmark (margin {self.margin:.1%})")
+        for ((path, currency), result) in sorted(self.results.items()):
+            baseline = result["baseline"]
+            if baseline is None:
+                delta = "no baseline"
+            else:
+                delta = f"baseline {baseline} ({(result['gas_used'] - baseline) / baseline:+.2%})"
+            terminalreporter.write_line(f"{path:<24}{currency:<8}{result['gas_used']:>10}  {delta}")
+            for (fn, gas) in list((result["functions"] or {}).items())[:10]:
+                terminalreporter.write_line(f"    {gas:>10}  {fn}")
+        if self.update:
+            terminalreporter.write_line(f"baselines written to {self.path}")
+
+
+def add_options(parser):
+    group = parser.getgroup("gas benchmark")
+    group.addoption("--gas-benchmark", action="store_true", default=False, help="Run the gas benchmarks")
+    group.addoption("--gas-baselines", default=DEFAULT_BASELINES, help="Path of the gas baselines JSON")
+    group.addoption(
+        "--gas-margin", type=float, default=None,
+        help="Relative gas increase over the baseline that fails a benchmark (default from the baselines file)",
+    )
+    group.addoption("--gas-update", action="store_true", default=False, help="Rewrite the gas baselines")
+    group.addoption(
+        "--gas-trace", action="store_true", default=False, help="Report the gas of every contract function"
+    )
+
+
+def configure(config):
+    config.addinivalue_line("markers", "gas: gas benchmark, only runs with --gas-benchmark")
+    config.pluginmanager.register(GasBenchmarkPlugin(config), "gas-benchmark")
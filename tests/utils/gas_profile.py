@@ -0,0 +1,63 @@
+import os
+
+from scripts.gas_profile import GasProfile
+
+# Gas profile of every harvest sent during the session, fixtures and stress scenarios included,
+# aggregated over their call traces (see scripts/gas_profile.py).
+#
+#   brownie test tests/test_harvests.py --gas-profile gas_profile [--gas-profile-fn Strategy.harvest]
+#
+# writes gas_profile/profile.folded (flamegraph input) and gas_profile/profile.json, and prints the
+# per function table. Compare the JSON with one from another commit with
+# GAS_PROFILE_BASE=... GAS_PROFILE=... brownie run gas_profile. With xdist every worker writes
+# profile.<worker>.json and .folded, GAS_PROFILE takes them comma separated.
+
+DEFAULT_FUNCTIONS = ["Strategy.harvest"]
+
+
+class GasProfilePlugin:
+    def __init__(self, config, directory):
+        self.directory = directory
+        self.functions = config.getoption("gas_profile_fn") or DEFAULT_FUNCTIONS
+        self.top = config.getoption("gas_profile_top")
+        self.profile = GasProfile()
+        self._collecting = None
+
+    def pytest_sessionstart(self, session):
+        self._collecting = self.profile.collect(self.functions)
+        self._collecting.__enter__()
+
+    def pytest_sessionfinish(self, session):
+        self._collecting.__exit__(None, None, None)
+        if not self.profile.count():
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        worker = os.environ.get("PYTEST_XDIST_WORKER")
+        stem = os.path.join(self.directory, "profile" if worker is None else f"profile.{worker}")
+        self.profile.write_folded(f"{stem}.folded")
+        self.profile.save(f"{stem}.json")
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if not self.profile.count():
+            return
+        terminalreporter.write_sep("-", f"gas profile of {', '.join(self.functions)} ({self.directory})")
+        terminalreporter.write_line(self.profile.table(top=self.top))
+
+
+def add_options(parser):
+    group = parser.getgroup("gas profile")
+    group.addoption(
+        "--gas-profile", default=None, help="Profile the gas of every harvest into this directory"
+    )
+    group.addoption(
+        "--gas-profile-fn", action="append", default=None,
+        help="Contract.function to profile instead of Strategy.harvest, can be repeated",
+    )
+    group.addoption("--gas-profile-top", type=int, default=30, help="Rows of the gas profile table")
+
+
+def configure(config):
+    directory = config.getoption("gas_profile")
+    if directory is None:
+        return
+    config.pluginmanager.register(GasProfilePlugin(config, directory), "gas-profile")
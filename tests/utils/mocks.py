@@ -0,0 +1,71 @@
+from brownie import network, web3
+
+# Local chain stand-ins for the mainnet contracts the suite needs (contracts/mocks), so that
+#
+#   brownie test --network development
+#
+# runs the strategy against MockNotionalProxy and mock tokens instead of a mainnet fork. Tests that
+# depend on mainnet liquidity (whales moving the markets, Notional's own pricing) are marked with
+# require_network("mainnet-fork") and skipped there.
+
+# Strategy.sol wraps and unwraps ETH with WETH at its mainnet address
+WETH = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+# The helpers batch their reads through Multicall2 at its mainnet address (scripts/multicall.py)
+MULTICALL2 = "0x5BA1e12693Dc8F9c48aAD8770482f4739bEeD696"
+TOKENS = {
+    "WBTC": ("Wrapped BTC", 8),
+    "DAI": ("Dai Stablecoin", 18),
+    "USDC": ("USD Coin", 6),
+}
+# Annualized rate of each of the 3 mock markets, in RATE_PRECISION
+RATES = [30_000_000, 35_000_000, 40_000_000]
+# Local account standing in for the token whales
+WHALE = 9
+# Share of the whale's balance that funds the mock proxy's interest payments
+RESERVE_SHARE = 10
+
+
+def is_local():
+    return "fork" not in network.show_active()
+
+
+def set_code(address, code):
+    # Each local node names the RPC method differently
+    for method in ("evm_setAccountCode", "hardhat_setCode", "anvil_setCode"):
+        response = web3.provider.make_request(method, [address, code])
+        if "error" not in response:
+            return
+    raise ValueError(f"{network.show_active()} does not support setting account code")
+
+
+def deploy_token(symbol, MockERC20, MockWETH, whale, whale_balance):
+    # Deploys the token and gives whale_balance of it (in units) to the whale
+    if symbol == "WETH":
+        weth = MockWETH.deploy({"from": whale})
+        set_code(WETH, web3.eth.get_code(weth.address).hex())
+        token = MockWETH.at(WETH)
+        token.deposit({"from": whale, "value": min(whale_balance * 10 ** 18, whale.balance() // 2)})
+        return token
+    (name, decimals) = TOKENS[symbol]
+    token = MockERC20.deploy(name, symbol, decimals, {"from": whale})
+    token.mint(whale, whale_balance * 10 ** decimals, {"from": whale})
+    return token
+
+
+def deploy_multicall(MockMulticall2, deployer):
+    multicall = MockMulticall2.deploy({"from": deployer})
+    set_code(MULTICALL2, web3.eth.get_code(multicall.address).hex())
+
+
+def deploy_notional(MockNotionalProxy, token, currency_id, price_in_eth, whale):
+    # Lists the token's currency and funds the interest the proxy pays out
+    n_proxy = MockNotionalProxy.deploy({"from": whale})
+    decimals = token.decimals()
+    underlying = "0x0000000000000000000000000000000000000000" if currency_id == 1 else token.address
+    eth_rate = int(price_in_eth * 10 ** 18)
+    n_proxy.listCurrency(currency_id, underlying, decimals, eth_rate, RATES, {"from": whale})
+    if currency_id == 1:
+        whale.transfer(n_proxy, whale.balance() // RESERVE_SHARE)
+    else:
+        token.transfer(n_proxy, token.balanceOf(whale) // RESERVE_SHARE, {"from": whale})
+    return n_proxy
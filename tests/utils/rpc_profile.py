@@ -0,0 +1,245 @@
+import json
+import math
+import os
+import sys
+import time
+from collections import defaultdict
+
+import pytest
+
+# Count and latency of every JSON-RPC request of the suite, attributed to the test, the phase
+# (setup, call, teardown), the fixture being set up and the test helper that made it.
+#
+#   brownie test --rpc-profile rpc_profile.json [--rpc-profile-sort time|count|mean] [--rpc-profile-top 20]
+#
+# The summary ranks the requests by fixture, helper, test, method and contract function, with a
+# latency histogram per method. The JSON profile keeps every (test, phase, fixture, helper, method,
+# contract, selector) row, one file per xdist worker. Contract and function names are resolved at the
+# end of the session from the contracts brownie knows; selectors of unknown contracts stay raw.
+
+PROFILE_VERSION = 1
+SORTS = {
+    "time": lambda row: -row["total"],
+    "count": lambda row: -row["count"],
+    "mean": lambda row: -row["total"] / row["count"],
+}
+# Latency buckets in ms, powers of two from 1 ms, the last one is open
+BUCKETS = [2 ** i for i in range(12)]
+# Requests carrying a call: (method, index of the call in params)
+CALL_METHODS = {"eth_call": 0, "eth_estimateGas": 0, "eth_sendTransaction": 0}
+UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+TESTS_DIR = os.path.dirname(UTILS_DIR)
+# Plugins of tests/utils: their requests go to the helper or fixture that called into them
+PLUGINS = {"cassette", "fork_pool", "funding", "gas_bench", "gas_profile", "rpc_profile"}
+# co_filename => module name if it is a test file or helper, None otherwise
+_modules = {}
+
+
+def _bucket(seconds):
+    ms = seconds * 1000
+    return min(len(BUCKETS) - 1, max(0, math.ceil(math.log2(ms)))) if ms > 1 else 0
+
+
+def _target(method, params):
+    # (address, selector) of the call a request carries
+    index = CALL_METHODS.get(method)
+    if index is None or not params or not isinstance(params[index], dict):
+        return (None, None)
+    call = params[index]
+    data = call.get("data") or call.get("input") or ""
+    if isinstance(data, (bytes, bytearray)):
+        data = "0x" + bytes(data).hex()
+    return (call.get("to"), data[:10] if len(data) >= 10 else None)
+
+
+def _module(filename):
+    if filename not in _modules:
+        path = os.path.abspath(filename)
+        name = os.path.splitext(os.path.basename(path))[0]
+        plugin = os.path.dirname(path) == UTILS_DIR and name in PLUGINS
+        _modules[filename] = name if path.startswith(TESTS_DIR) and not plugin else None
+    return _modules[filename]
+
+
+def _helper():
+    # Innermost function of the test files, conftest or tests/utils (other than the plugins) on the stack
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = _module(frame.f_code.co_filename)
+        if module is not None:
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def _names(address, selector):
+    # (contract, function) as brownie knows them
+    try:
+        from brownie.network.contract import _find_contract
+
+        contract = _find_contract(address)
+    except Exception:
+        contract = None
+    if contract is None:
+        return (address, selector)
+    return (contract._name, contract.selectors.get(selector, selector))
+
+
+def group(rows, key, sort="time"):
+    # Rows summed by key (a tuple of row fields), sorted
+    totals = {}
+    for row in rows:
+        k = tuple(row[name] for name in key)
+        total = totals.setdefault(k, {"count": 0, "total": 0.0, "max": 0.0})
+        total["count"] += row["count"]
+        total["total"] += row["total"]
+        total["max"] = max(total["max"], row["max"])
+    grouped = [dict(zip(key, k), **total) for (k, total) in totals.items()]
+    return sorted(grouped, key=SORTS[sort])
+
+
+class RpcProfilePlugin:
+    def __init__(self, config, path):
+        self.path = path
+        self.sort = config.getoption("rpc_profile_sort")
+        self.top = config.getoption("rpc_profile_top")
+        # (test, phase, fixture, helper, method, address, selector) => [count, total, max]
+        self.calls = defaultdict(lambda: [0, 0.0, 0.0])
+        # method => requests per latency bucket
+        self.histograms = defaultdict(lambda: [0] * len(BUCKETS))
+        self.test = None
+        self.phase = None
+        self.fixtures = []
+        self._patch()
+
+    def _patch(self):
+        # Wraps whatever make_request is in place, the cassette's included
+        from web3.providers.rpc import HTTPProvider
+
+        plugin = self
+        make_request = HTTPProvider.make_request
+
+        def profiled_make_request(provider, method, params):
+            start = time.perf_counter()
+            try:
+                return make_request(provider, method, params)
+            finally:
+                plugin.record(method, params, time.perf_counter() - start)
+
+        HTTPProvider.make_request = profiled_make_request
+
+    def record(self, method, params, elapsed):
+        (address, selector) = _target(method, params)
+        fixture = self.fixtures[-1] if self.fixtures else None
+        entry = self.calls[(self.test, self.phase, fixture, _helper(), method, address, selector)]
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] = max(entry[2], elapsed)
+        self.histograms[method][_bucket(elapsed)] += 1
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        self.test = item.nodeid
+        yield
+        self.test = None
+        self.phase = None
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item):
+        self.phase = "setup"
+        yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        self.phase = "call"
+        yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item, nextitem):
+        self.phase = "teardown"
+        yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        self.fixtures.append(fixturedef.argname)
+        try:
+            yield
+        finally:
+            self.fixtures.pop()
+
+    def rows(self):
+        names = {}
+        rows = []
+        for ((test, phase, fixture, helper, method, address, selector), (count, total, max_)) in self.calls.items():
+            if address is not None and (address, selector) not in names:
+                names[(address, selector)] = _names(address, selector)
+            (contract, function) = names.get((address, selector), (None, None))
+            rows.append({
+                "test": test, "phase": phase, "fixture": fixture, "helper": helper, "method": method,
+                "address": address, "selector": selector, "contract": contract, "function": function,
+                "count": count, "total": total, "max": max_,
+            })
+        return rows
+
+    def pytest_sessionfinish(self, session):
+        if not self.calls:
+            # xdist controller, the workers make the requests
+            return
+        self._rows = self.rows()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "w") as fp:
+            json.dump({
+                "version": PROFILE_VERSION,
+                "buckets_ms": BUCKETS,
+                "histograms": self.histograms,
+                "calls": sorted(self._rows, key=SORTS["time"]),
+            }, fp, indent=1)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        rows = getattr(self, "_rows", None)
+        if not rows:
+            return
+        total = sum(row["total"] for row in rows)
+        count = sum(row["count"] for row in rows)
+        terminalreporter.write_sep("-", f"rpc profile: {count} requests, {total:.2f}s ({self.path})")
+        for (title, key) in [
+            ("fixture", ("fixture",)),
+            ("helper", ("helper",)),
+            ("test", ("test", "phase")),
+            ("method", ("method",)),
+            ("contract function", ("contract", "function")),
+        ]:
+            terminalreporter.write_line(f"\nby {title} (top {self.top}, by {self.sort})")
+            terminalreporter.write_line(f"{'count':>8}{'total s':>10}{'mean ms':>10}{'max ms':>10}  {title}")
+            for row in group(rows, key, self.sort)[:self.top]:
+                label = " ".join(str(row[name]) for name in key)
+                terminalreporter.write_line(
+                    f"{row['count']:>8}{row['total']:>10.2f}{row['total'] / row['count'] * 1000:>10.1f}"
+                    f"{row['max'] * 1000:>10.1f}  {label}"
+                )
+        terminalreporter.write_line("\nlatency (ms, requests per bucket)")
+        terminalreporter.write_line(f"{'method':<28}" + "".join(f"{'<=' + str(b):>8}" for b in BUCKETS[:-1])
+                                    + f"{'>' + str(BUCKETS[-2]):>8}")
+        for (method, histogram) in sorted(self.histograms.items(), key=lambda item: -sum(item[1])):
+            terminalreporter.write_line(f"{method:<28}" + "".join(f"{n:>8}" for n in histogram))
+
+
+def add_options(parser):
+    group = parser.getgroup("rpc profile")
+    group.addoption("--rpc-profile", default=None, help="Profile the JSON-RPC requests into this JSON file")
+    group.addoption(
+        "--rpc-profile-sort", default="time", choices=sorted(SORTS), help="Order of the rpc profile summary"
+    )
+    group.addoption("--rpc-profile-top", type=int, default=15, help="Rows of every rpc profile summary table")
+
+
+def configure(config):
+    path = config.getoption("rpc_profile")
+    if path is None:
+        return
+    worker = os.environ.get("PYTEST_XDIST_WORKER")
+    if worker is not None:
+        # One profile per xdist worker
+        (stem, ext) = os.path.splitext(path)
+        path = f"{stem}.{worker}{ext or '.json'}"
+    config.pluginmanager.register(RpcProfilePlugin(config, path), "rpc-profile")
@@ -0,0 +1,272 @@
+import json
+
+import pytest
+from brownie import chain, web3
+from brownie.exceptions import VirtualMachineError
+from notional_sim import trades
+from notional_sim.constants import DEPOSIT_NONE, DEPOSIT_UNDERLYING, INTERNAL_TOKEN_PRECISION
+from notional_sim.types import Account, decode_markets
+from utils import actions
+
+# Stress scenarios for the strategy: declarative sequences of market shocks, time jumps and
+# strategy calls, fanned out from one chain snapshot.
+#
+#   SCENARIOS = {
+#       "rates_drop": [lend(1, size=1.0), half_to_maturity(), harvest()],
+#       "drop_and_exit": [lend(1, size=1.0), half_to_maturity(), exit_positions(), harvest(debt_ratio=0, realize_losses=True)],
+#   }
+#
+#   @pytest.mark.fan_out
+#   @pytest.mark.parametrize("shard", range(4))
+#   def test_stress(stress, shard, ...):
+#       ...  # deposit and harvest, the state every scenario starts from
+#       stress.run(shard_of(SCENARIOS, shard, 4))
+#
+# A step is a (name, kwargs) tuple. Whale trade sizes are in units of the currency's whale size
+# (the `thresholds` table of conftest.py), so one scenario fits every currency. The runner takes
+# an evm snapshot, runs every scenario and reverts to it after each one; a step that reverts ends
+# its scenario. `fan_out` tests are spread over the fork pool workers one shard each, instead of
+# running on their currency's worker (see fork_pool.group_by_currency). Every scenario's outcome
+# is reported in one table at the end of the run:
+#
+#   brownie test tests/test_stress.py -n 4 --dist loadgroup [--stress-report stress.json]
+
+
+# Steps
+
+
+def lend(market_index, size=1.0):
+    # The whale lends `size` whale sizes of cash, dropping the market's rate
+    return ("lend", {"market_index": market_index, "size": size})
+
+
+def borrow(market_index, size=0.5, collateral=2.0):
+    # The whale borrows `size` whale sizes of cash against `collateral` times as much deposited
+    return ("borrow", {"market_index": market_index, "size": size, "collateral": collateral})
+
+
+def exit_positions():
+    # The whale closes every fCash position it holds in the active markets
+    return ("exit_positions", {})
+
+
+def initialize_markets():
+    return ("initialize_markets", {})
+
+
+def sleep(seconds):
+    return ("sleep", {"seconds": seconds})
+
+
+def half_to_maturity():
+    # Halfway to the strategy's next settlement
+    return ("half_to_maturity", {})
+
+
+def to_maturity(offset=1):
+    # Past the strategy's maturity, settling every quarter on the way
+    return ("to_maturity", {"offset": offset})
+
+
+def harvest(debt_ratio=None, realize_losses=None):
+    return ("harvest", {"debt_ratio": debt_ratio, "realize_losses": realize_losses})
+
+
+def withdraw(fraction=1.0, max_loss=10_000):
+    # The user redeems `fraction` of their shares
+    return ("withdraw", {"fraction": fraction, "max_loss": max_loss})
+
+
+def shard_of(scenarios, shard, n_shards):
+    # Every n_shards-th scenario, starting at shard
+    return {name: steps for (i, (name, steps)) in enumerate(scenarios.items()) if i % n_shards == shard}
+
+
+# Runner
+
+
+class StressRunner:
+    def __init__(self, node, token, vault, strategy, user, strategist, gov, whale, whale_size,
+        n_proxy_views, n_proxy_batch, n_proxy_implementation, currency_id, million_in_token):
+        self.node = node
+        self.token = token
+        self.vault = vault
+        self.strategy = strategy
+        self.user = user
+        self.strategist = strategist
+        self.gov = gov
+        self.whale = whale
+        self.whale_size = whale_size
+        self.n_proxy_views = n_proxy_views
+        self.n_proxy_batch = n_proxy_batch
+        self.n_proxy_implementation = n_proxy_implementation
+        self.currency_id = currency_id
+        self.million_in_token = million_in_token
+        self.units = 10 ** token.decimals()
+
+    def _to_internal(self, amount):
+        return amount * INTERNAL_TOKEN_PRECISION // self.units
+
+    def _whale_trade(self, trade, deposit):
+        action = trades.balance_action(self.currency_id, trade, DEPOSIT_UNDERLYING if deposit else DEPOSIT_NONE,
+            deposit, 0, False, True)
+        if self.currency_id == 1:
+            return self.n_proxy_batch.batchBalanceAndTradeAction(self.whale, [action],
+                {"from": self.whale, "value": deposit})
+        if deposit > 0 and self.token.allowance(self.whale, self.n_proxy_batch.address) < deposit:
+            self.token.approve(self.n_proxy_batch.address, 2 ** 256 - 1, {"from": self.whale})
+        return self.n_proxy_batch.batchBalanceAndTradeAction(self.whale, [action], {"from": self.whale})
+
+    def _lend(self, market_index, size):
+        deposit = int(self.whale_size * size)
+        fcash = self.n_proxy_views.getfCashAmountGivenCashAmount(
+            self.currency_id, -self._to_internal(deposit), market_index, chain.time() + 5
+        )
+        self._whale_trade(trades.encode_lend(market_index, fcash), deposit)
+
+    def _borrow(self, market_index, size, collateral):
+        cash = int(self.whale_size * size)
+        fcash = -self.n_proxy_views.getfCashAmountGivenCashAmount(
+            self.currency_id, self._to_internal(cash), market_index, chain.time() + 5
+        )
+        self._whale_trade(trades.encode_borrow(market_index, fcash), int(cash * collateral))
+
+    def _exit_positions(self):
+        maturities = [m.maturity for m in decode_markets(self.n_proxy_views.getActiveMarkets(self.currency_id))]
+        encoded = []
+        whale = Account.decode(self.n_proxy_views.getAccount(self.whale))
+        for (maturity, notional) in whale.fcash(self.currency_id).items():
+            if maturity not in maturities or notional == 0:
+                continue
+            market_index = maturities.index(maturity) + 1
+            if notional > 0:
+                encoded.append(trades.encode_borrow(market_index, notional))
+            else:
+                encoded.append(trades.encode_lend(market_index, -notional))
+        # Lending back a borrow is paid from the cash balance it left
+        for trade in encoded:
+            self._whale_trade(trade, 0)
+
+    def _initialize_markets(self):
+        self.n_proxy_implementation.initializeMarkets(self.currency_id, 0, {"from": self.user})
+
+    def _sleep(self, seconds):
+        actions.jump_to(chain.time() + seconds)
+
+    def _half_to_maturity(self):
+        account = Account.decode(self.n_proxy_views.getAccount(self.strategy))
+        actions.wait_half_until_settlement(account.context.next_settle_time)
+
+    def _to_maturity(self, offset):
+        maturity = self.strategy.getMaturity()
+        if maturity == 0:
+            return
+        actions.settle_until(maturity, self.currency_id, self.n_proxy_implementation, self.user,
+            self.n_proxy_batch, self.token, self.whale, self.million_in_token, offset)
+
+    def _harvest(self, debt_ratio, realize_losses):
+        if debt_ratio is not None:
+            self.vault.updateStrategyDebtRatio(self.strategy, debt_ratio, {"from": self.gov})
+        if realize_losses is not None and realize_losses != self.strategy.getToggleRealizeLosses():
+            self.strategy.setToggleRealizeLosses(realize_losses, {"from": self.gov})
+        chain.sleep(1)
+        self.strategy.harvest({"from": self.strategist})
+
+    def _withdraw(self, fraction, max_loss):
+        shares = int(self.vault.balanceOf(self.user) * fraction)
+        if shares == 0:
+            return 0
+        value = shares * self.vault.pricePerShare() // 10 ** self.vault.decimals()
+        before = self.token.balanceOf(self.user)
+        self.vault.withdraw(shares, self.user, max_loss, {"from": self.user})
+        return value - (self.token.balanceOf(self.user) - before)
+
+    def run_scenario(self, name, steps):
+        row = {"currency_id": self.currency_id, "scenario": name, "steps": len(steps), "reverted": None,
+               "withdraw_loss": 0}
+        params = self.vault.strategies(self.strategy).dict()
+        (gain, loss) = (params["totalGain"], params["totalLoss"])
+        for (i, (step, kwargs)) in enumerate(steps):
+            try:
+                result = getattr(self, f"_{step}")(**kwargs)
+            except VirtualMachineError as error:
+                row["reverted"] = f"{i}:{step} {error.revert_msg}"
+                break
+            if step == "withdraw":
+                row["withdraw_loss"] += result
+        params = self.vault.strategies(self.strategy).dict()
+        row["gain"] = params["totalGain"] - gain
+        row["loss"] = params["totalLoss"] - loss
+        row["unrealised"] = self.strategy.estimatedTotalAssets() - params["totalDebt"]
+        row["pnl"] = row["gain"] - row["loss"] + row["unrealised"]
+        for key in ("gain", "loss", "unrealised", "pnl", "withdraw_loss"):
+            row[key] /= self.units
+        return row
+
+    def run(self, scenarios):
+        # brownie's own snapshot is the test's isolation point, the runner keeps its own evm snapshot
+        # and reverts through chain._revert, which also resyncs brownie's view of the chain
+        snapshot = web3.provider.make_request("evm_snapshot", [])["result"]
+        rows = []
+        for (name, steps) in scenarios.items():
+            try:
+                rows.append(self.run_scenario(name, steps))
+            finally:
+                snapshot = chain._revert(snapshot)
+        self.node.user_properties.append(("stress", json.dumps(rows)))
+        return rows
+
+
+def format_table(rows):
+    columns = ("currency_id", "scenario", "pnl", "gain", "loss", "unrealised", "withdraw_loss", "reverted")
+    lines = ["  ".join(f"{c:>16}" for c in columns)]
+    for row in sorted(rows, key=lambda row: (row["currency_id"], row["scenario"])):
+        values = []
+        for c in columns:
+            value = row[c]
+            values.append(f"{value:>16.4f}" if isinstance(value, float) else f"{str(value or '-'):>16}")
+        lines.append("  ".join(values))
+    return "\n".join(lines)
+
+
+class StressPlugin:
+    # Collects the rows of every stress test, from the workers' reports under xdist
+
+    def __init__(self, config):
+        self.path = config.getoption("stress_report")
+        self.rows = []
+
+    @pytest.fixture
+    def stress(self, request, token, vault, strategy, user, strategist, gov, token_whale, balance_threshold,
+        n_proxy_views, n_proxy_batch, n_proxy_implementation, currencyID, million_in_token):
+        yield StressRunner(request.node, token, vault, strategy, user, strategist, gov, token_whale,
+            balance_threshold[0], n_proxy_views, n_proxy_batch, n_proxy_implementation, currencyID,
+            million_in_token)
+
+    def pytest_runtest_logreport(self, report):
+        if report.when != "call":
+            return
+        for (key, value) in report.user_properties:
+            if key == "stress":
+                self.rows.extend(json.loads(value))
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if not self.rows:
+            return
+        terminalreporter.write_sep("-", f"stress scenarios ({len(self.rows)})")
+        for line in format_table(self.rows).split("\n"):
+            terminalreporter.write_line(line)
+        if self.path is not None:
+            with open(self.path, "w") as fp:
+                json.dump(self.rows, fp, indent=2)
+            terminalreporter.write_line(f"rows written to {self.path}")
+
+
+def add_options(parser):
+    group = parser.getgroup("stress scenarios")
+    group.addoption("--stress-report", default=None, help="Write the stress scenario rows to this JSON file")
+
+
+def configure(config):
+    config.addinivalue_line("markers", "fan_out: spread the test's params over the fork pool workers")
+    config.pluginmanager.register(StressPlugin(config), "stress")
@@ -1,23 +1,40 @@
 import brownie
 from brownie import interface, chain
+from notional_sim.types import decode_markets
+from scripts import multicall
 
 
 def vault_status(vault):
-    print(f"--- Vault {vault.name()} ---")
-    print(f"API: {vault.apiVersion()}")
-    print(f"TotalAssets: {to_units(vault, vault.totalAssets())}")
-    print(f"PricePerShare: {to_units(vault, vault.pricePerShare())}")
-    print(f"TotalSupply: {to_units(vault, vault.totalSupply())}")
+    status = multicall.read_dict({
+        "name": (vault.name,),
+        "apiVersion": (vault.apiVersion,),
+        "decimals": (vault.decimals,),
+        "totalAssets": (vault.totalAssets,),
+        "pricePerShare": (vault.pricePerShare,),
+        "totalSupply": (vault.totalSupply,),
+    })
+    units = 10 ** status["decimals"]
+    print(f"--- Vault {status['name']} ---")
+    print(f"API: {status['apiVersion']}")
+    print(f"TotalAssets: {status['totalAssets'] / units}")
+    print(f"PricePerShare: {status['pricePerShare'] / units}")
+    print(f"TotalSupply: {status['totalSupply'] / units}")
 
 
 def strategy_status(vault, strategy):
-    status = vault.strategies(strategy).dict()
-    print(f"--- Strategy {strategy.name()} ---")
+    (name, decimals, params) = multicall.read([
+        (strategy.name,),
+        (vault.decimals,),
+        (vault.strategies, strategy),
+    ])
+    status = params.dict()
+    units = 10 ** decimals
+    print(f"--- Strategy {name} ---")
     print(f"Performance fee {status['performanceFee']}")
     print(f"Debt Ratio {status['debtRatio']}")
-    print(f"Total Debt {to_units(vault, status['totalDebt'])}")
-    print(f"Total Gain {to_units(vault, status['totalGain'])}")
-    print(f"Total Loss {to_units(vault, status['totalLoss'])}")
+    print(f"Total Debt {status['totalDebt'] / units}")
+    print(f"Total Gain {status['totalGain'] / units}")
+    print(f"Total Loss {status['totalLoss'] / units}")
 
 
 def to_units(token, amount):
@@ -34,8 +51,10 @@ def sleep(seconds=6 * 60 * 60):
     chain.mine(1)
 
 def get_min_market_index(strategy, currencyID, n_proxy_views):
-    min_time = strategy.getMinTimeToMaturity()
-    active_markets = n_proxy_views.getActiveMarkets(currencyID)
-    for i, am in enumerate(active_markets):
-        if am[1] - chain.time() >= min_time:
+    (min_time, active_markets) = multicall.read([
+        (strategy.getMinTimeToMaturity,),
+        (n_proxy_views.getActiveMarkets, currencyID),
+    ])
+    for i, am in enumerate(decode_markets(active_markets)):
+        if am.maturity - chain.time() >= min_time:
             return i+1